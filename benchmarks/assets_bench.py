@@ -0,0 +1,52 @@
+# Measures the asset build for a theme directory of N stylesheets and scripts (fresh and unchanged
+# rebuilds), Router.asset_url, and a static request for a plain and a fingerprinted asset, which
+# also checks the manifest for changes.
+# Usage: python benchmarks/assets_bench.py [--files N] [--lookups N]
+
+import argparse, logging, os, tempfile, time, timeit
+
+from sapphirecms.routing import Router
+from sapphirecms.networking import Request
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the asset pipeline")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    static_dir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(static_dir, "css"))
+    os.makedirs(os.path.join(static_dir, "js"))
+    for i in range(args.files // 2):
+        with open(os.path.join(static_dir, "css", "part%d.css" % i), "w") as f:
+            f.write("".join("/* rule %d */\n.block-%d-%d {\n  color : #%06x ;\n}\n" % (j, i, j, j) for j in range(100)))
+        with open(os.path.join(static_dir, "js", "part%d.js" % i), "w") as f:
+            f.write("".join("// step %d\nfunction f%d_%d(a, b) {\n    return a / b + %d;\n}\n" % (j, i, j, j) for j in range(100)))
+    router = Router(static_dir=static_dir)
+    bundles = {"bundle.css": ["css/part%d.css" % i for i in range(args.files // 2)], "bundle.js": ["js/part%d.js" % i for i in range(args.files // 2)]}
+
+    print("%-28s %12s" % ("build", "ms"))
+    for label in ["fresh", "unchanged"]:
+        start = time.perf_counter()
+        manifest = router.build_assets(bundles, minify=True)
+        print("%-28s %12.1f" % (label, (time.perf_counter() - start) * 1e3))
+    sizes = [sum(os.path.getsize(os.path.join(static_dir, part)) for part in bundles[name]) for name in ["bundle.css", "bundle.js"]]
+    minified = [os.path.getsize(os.path.join(static_dir, manifest[name])) for name in ["bundle.css", "bundle.js"]]
+    print("%-28s %12s" % ("bundle.css bytes", "%d -> %d" % (sizes[0], minified[0])))
+    print("%-28s %12s" % ("bundle.js bytes", "%d -> %d" % (sizes[1], minified[1])))
+
+    print()
+    print("%-28s %12s" % ("lookup", "us"))
+    elapsed = min(timeit.repeat(lambda: router.asset_url("bundle.css"), number=args.lookups, repeat=5))
+    print("%-28s %12.2f" % ("asset_url", elapsed / args.lookups * 1e6))
+    for label, path in [("static plain", "/static/css/part0.css"), ("static fingerprinted", router.asset_url("css/part0.css"))]:
+        request = Request(f"GET {path} HTTP/1.1\r\n\r\n")
+        handler, _, _, params = router.route(request)
+        elapsed = min(timeit.repeat(lambda: handler(request, **params), number=args.lookups // 4, repeat=5))
+        print("%-28s %12.2f" % (label, elapsed / (args.lookups // 4) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
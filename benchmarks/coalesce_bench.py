@@ -0,0 +1,47 @@
+# Measures a burst of concurrent requests for one uncached page whose handler waits on the database
+# and renders HTML, with and without request coalescing: handler executions and wall-clock time.
+# Usage: python benchmarks/coalesce_bench.py [--clients N] [--bursts N] [--query SECONDS]
+
+import argparse, logging, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from sapphirecms.routing import Router
+from sapphirecms.networking import Request
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request coalescing")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--query", type=float, default=0.02)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print("%-12s %12s %12s" % ("mode", "executions", "ms/burst"))
+    for coalesce in [False, True]:
+        router = Router()
+        executions = []
+        lock = threading.Lock()
+
+        @router.add_route("/posts/<slug>", "GET", coalesce=coalesce)
+        def post(request, slug):
+            with lock:
+                executions.append(slug)
+            time.sleep(args.query)
+            return "".join("<p>%s %d</p>" % (slug, i) for i in range(2000))
+
+        def get(_):
+            request = Request("GET /posts/new-post HTTP/1.1\r\n\r\n")
+            handler, _, _, params = router.route(request)
+            return handler(request, **params)
+
+        with ThreadPoolExecutor(args.clients) as executor:
+            start = time.perf_counter()
+            for _ in range(args.bursts):
+                list(executor.map(get, range(args.clients)))
+            elapsed = time.perf_counter() - start
+        print("%-12s %12d %12.2f" % ("coalesced" if coalesce else "independent", len(executions), elapsed / args.bursts * 1e3))
+
+
+if __name__ == "__main__":
+    main()
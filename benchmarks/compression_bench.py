@@ -0,0 +1,53 @@
+# Measures the bytes sent and the time per request for a rendered HTML page through the Compression
+# middleware at several levels, then for a theme stylesheet served from its prebuilt gzip sidecar, compared
+# with compressing the file on every request.
+# Usage: python benchmarks/compression_bench.py [--requests N] [--posts N] [--levels 1,6,9]
+
+import argparse, logging, os, tempfile, timeit, zlib
+
+from sapphirecms.routing import Router, Compression
+from sapphirecms.routing.assets import compress_assets
+from sapphirecms.networking import Request
+
+
+def measure(router, request, number):
+    response = router.dispatch(request)
+    size = len(b"".join(response.iter_body()))
+    elapsed = min(timeit.repeat(lambda: b"".join(router.dispatch(request).iter_body()), number=number, repeat=5))
+    return size, elapsed / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response compression")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--levels", default="1,6,9")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    page = "".join(f"<article class=\"post\"><h2><a href=\"/posts/{i}\">Post {i}</a></h2><p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p></article>" for i in range(args.posts))
+    request = Request("GET / HTTP/1.1\r\nAccept-Encoding: gzip, deflate\r\n\r\n")
+    print("%-16s %12s %12s" % ("page", "bytes", "us/request"))
+    for label, level in [("identity", None)] + [(f"gzip level {level}", int(level)) for level in args.levels.split(",")]:
+        router = Router()
+        if level is not None:
+            router.use(Compression(level=level))
+        router.add_route("/", "GET")(lambda request: page)
+        print("%-16s %12d %12.1f" % (label, *measure(router, request, args.requests)))
+
+    static_dir = tempfile.mkdtemp()
+    with open(os.path.join(static_dir, "theme.css"), "w") as f:
+        f.write("".join(".post-%d { color: #%06x; margin: %dpx; }\n" % (i, i * 997, i % 40) for i in range(4000)))
+    compress_assets(static_dir)
+    request = Request("GET /static/theme.css HTTP/1.1\r\nAccept-Encoding: gzip\r\n\r\n")
+    print()
+    print("%-16s %12s %12s" % ("stylesheet", "bytes", "us/request"))
+    for label, static_gzip, middleware in [("identity", False, False), ("per request", False, True), ("sidecar", True, True)]:
+        router = Router(static_dir=static_dir, static_gzip=static_gzip)
+        if middleware:
+            router.use(Compression(level=9))
+        print("%-16s %12d %12.1f" % (label, *measure(router, request, args.requests)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# type: ignore[a,body,div,footer,h1,h2,head,header,html,li,link,meta,nav,p,script,section,span,title,ul]
+# Measures rendering a theme base layout (head, navigation, sidebar and footer around the page
+# content) per request: building and rendering the tree, rendering a tree built once, and rendering
+# the compiled template, which only fills in the title and content slots.
+# Usage: python benchmarks/html_bench.py [--renders N] [--links N]
+
+import argparse, logging, timeit
+
+from sapphirecms import html as sapphire_html
+
+sapphire_html.initialize(__name__)
+
+
+def base(pagetitle, navigation, content):
+    # A theme's base layout, as returned by theme.base().
+    return html([
+        head([
+            meta(charset="utf-8"),
+            meta(name="viewport", content="width=device-width, initial-scale=1"),
+            title(pagetitle),
+            link(rel="stylesheet", href="/static/css/theme.css"),
+            link(rel="icon", href="/static/favicon.ico"),
+            script("", src="/static/js/theme.js", defer="defer"),
+        ]),
+        body([
+            header([div(span("SapphireCMS"), classes=["logo"]), nav(ul([li(a(label, href=url)) for label, url in navigation]), classes=["navigation"])]),
+            div([
+                section(content, classes=["content"]),
+                div([h2("Recent posts"), ul([li(a(f"Post {i}", href=f"/posts/{i}")) for i in range(10)])], classes=["sidebar"]),
+            ], classes=["container"]),
+            footer([p("Powered by SapphireCMS"), ul([li(a(label, href=url)) for label, url in navigation])], classes=["footer"]),
+        ]),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compiled templates")
+    parser.add_argument("--renders", type=int, default=5000)
+    parser.add_argument("--links", type=int, default=8)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    navigation = [(f"Page {i}", f"/pages/{i}") for i in range(args.links)]
+    content = lambda: [h1("Welcome to SapphireCMS"), p("SapphireCMS is a modern, open-source, and easy-to-use CMS.")]
+    tree = base("Sapphire Landing", navigation, content())
+    template = sapphire_html.compile_template(base(sapphire_html.Slot("pagetitle"), navigation, sapphire_html.Slot("content")))
+    expected = str(tree)
+    modes = [
+        ("build+render", lambda: base("Sapphire Landing", navigation, content()).render()),
+        ("render tree", tree.render),
+        ("template", lambda: template.render(pagetitle="Sapphire Landing", content=content())),
+    ]
+    print("%-14s %12s" % ("mode", "us/render"))
+    for label, render in modes:
+        assert render() == expected
+        elapsed = min(timeit.repeat(render, number=args.renders, repeat=5))
+        print("%-14s %12.1f" % (label, elapsed / args.renders * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Measures Router.dispatch with 0, 1, 5 and 10 middleware, comparing the pipeline composed once per
+# chain of routers with composing the same middleware around the handler on every request, and the
+# previous worker path (route + modifiers + handler, no middleware) as the baseline.
+# Usage: python benchmarks/middleware_bench.py [--requests N] [--middleware 0,1,5,10]
+
+import argparse, logging, timeit
+
+from sapphirecms.routing import Router
+from sapphirecms.networking import Request
+from sapphirecms.networking.response import to_response
+
+
+def legacy_handle(router, request):
+    # WSGIWorker.handle_request before middleware.
+    handler, request_mod, response_mod, params = router.route(request)
+    for mod in request_mod:
+        request = mod(request)
+    response = handler(request, **params)
+    for mod in response_mod:
+        response = mod(response)
+    return to_response(response)
+
+
+def per_request(router, request):
+    # The same middleware, composed around the handler for each request.
+    resolved, chain = router.locate(request)
+    target = (resolved, request.method, request.path)
+    handle = lambda request: router.endpoint(request, target)
+    for middleware in reversed([middleware for r in chain for middleware in r.middleware]):
+        handle = (lambda middleware, call_next: lambda request: to_response(middleware(request, call_next)))(middleware, handle)
+    return handle(request)
+
+
+def build(count):
+    router = Router()
+    subrouter = Router("blog", prefix="/blog")
+    for i in range(count):
+        (router if i % 2 else subrouter).use(lambda request, call_next: call_next(request))
+    subrouter.add_route("/posts/<int:id>", "GET")(lambda request, id: "<h1>Post %d</h1>" % id)
+    router.add_subrouter(subrouter)
+    return router
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the middleware pipeline")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--middleware", default="0,1,5,10")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print("%-12s %-12s %12s" % ("middleware", "mode", "us/request"))
+    for count in [int(count) for count in args.middleware.split(",")]:
+        router = build(count)
+        request = Request("GET /blog/posts/7 HTTP/1.1\r\n\r\n")
+        modes = [("composed", router.dispatch), ("per-request", lambda request: per_request(router, request))]
+        if count == 0:
+            modes.insert(0, ("legacy", lambda request: legacy_handle(router, request)))
+        for label, handle in modes:
+            assert handle(request).body == "<h1>Post 7</h1>"
+            elapsed = min(timeit.repeat(lambda: handle(request), number=args.requests, repeat=5))
+            print("%-12d %-12s %12.2f" % (count, label, elapsed / args.requests * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# Measures requests for a post page whose handler queries the database and renders HTML, without
+# and with the page cache, and with the page's post edited (its tag invalidated) every N requests.
+# Usage: python benchmarks/pagecache_bench.py [--requests N] [--query SECONDS] [--edit-every N]
+
+import argparse, logging, time, timeit
+
+from sapphirecms.routing import Router, cache_tags, invalidate_tags
+from sapphirecms.networking import Request
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the page cache")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--query", type=float, default=0.002)
+    parser.add_argument("--edit-every", type=int, default=50)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print("%-14s %12s %12s" % ("mode", "renders", "us/request"))
+    # renders: handler runs during the first pass over the requests; the timing is of warm passes.
+    for label, ttl, edit_every in [("uncached", None, 0), ("cached", 60, 0), ("cached+edits", 60, args.edit_every)]:
+        router = Router()
+        renders = []
+
+        @router.add_route("/posts/<slug>", "GET", cache=ttl)
+        def post(request, slug):
+            renders.append(slug)
+            cache_tags(f"Posts:{slug}")
+            time.sleep(args.query)
+            return "".join("<p>%s %d</p>" % (slug, i) for i in range(2000))
+
+        requests = [Request(f"GET /posts/post-{i % 10} HTTP/1.1\r\n\r\n") for i in range(args.requests)]
+        def run():
+            for i, request in enumerate(requests):
+                if edit_every and i % edit_every == 0:
+                    invalidate_tags(f"Posts:post-{i % 10}")
+                handler, _, _, params = router.route(request)
+                handler(request, **params)
+
+        run()
+        first = len(renders)
+        elapsed = min(timeit.repeat(run, number=1, repeat=3))
+        print("%-14s %12d %12.1f" % (label, first, elapsed / args.requests * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Measures proxying a request to a local upstream server through ProxyRouter, comparing the previous
+# handler (a new connection per request via requests.request, with the body buffered) with the pooled,
+# streaming ProxyRouter, for a small JSON body and a larger download, and with a response cache when
+# the upstream server marks the responses cacheable (fresh hits and stale-while-revalidate hits).
+# Then measures the latency percentiles of concurrent clients proxied to three upstream servers, one of
+# which answers slowly, for each load balancing strategy.
+# Usage: python benchmarks/proxy_bench.py [--requests N] [--size BYTES] [--clients N] [--pool-requests N] [--slow SECONDS]
+
+import argparse, logging, threading, time, timeit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from sapphirecms.routing import Router, ProxyRouter
+from sapphirecms.networking import Request
+from sapphirecms.networking.response import Response
+
+
+def upstream_server(size, delay=0):
+    bodies = {"/small/": b'{"id": 1, "title": "Hello"}', "/large/": b"a" * size}
+    cache_control = {"/api": "max-age=3600", "/swr": "max-age=0, stale-while-revalidate=3600"}
+
+    class Upstream(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Write each response in one segment, as production servers do, so that Nagle's algorithm
+        # does not hold back the body of responses sent on a kept-alive connection.
+        wbufsize = -1
+
+        def do_GET(self):
+            time.sleep(delay)
+            body = bodies[self.path]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", cache_control.get(self.headers.get("X-Mount"), "no-store"))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def legacy_proxy(external_url, request, url):
+    # ProxyRouter's handler before the connection pool.
+    response = requests.request(request.method, f"{external_url}{url}", headers=request.headers, data=request.body)
+    response_headers = response.headers
+    response_headers.pop("Content-Encoding", None)
+    response_headers.pop("Transfer-Encoding", None)
+    return Response(response.content, status=response.status_code, headers=response_headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark proxied requests")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--size", type=int, default=1024 * 1024)
+    parser.add_argument("--clients", type=int, default=6)
+    parser.add_argument("--pool-requests", type=int, default=1200)
+    parser.add_argument("--slow", type=float, default=0.05)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    upstream = upstream_server(args.size)
+    external_url = f"http://127.0.0.1:{upstream.server_port}"
+    router = Router()
+    router.add_proxy(ProxyRouter("bench", "/api", external_url, request_headers={"*": {"X-Mount": "none"}}))
+    router.add_proxy(ProxyRouter("cached", "/cached", external_url, request_headers={"*": {"X-Mount": "/api"}}, cache_size=64 * 1024 * 1024))
+    router.add_proxy(ProxyRouter("swr", "/swr", external_url, request_headers={"*": {"X-Mount": "/swr"}}, cache_size=64 * 1024 * 1024))
+
+    def proxied(path, mount="/api"):
+        request = Request(f"GET {mount}{path} HTTP/1.1\r\nAccept: application/json\r\n\r\n")
+        handler, _, _, params = router.route(request)
+        return b"".join(handler(request, **params).iter_body())
+
+    def legacy(path):
+        request = Request(f"GET /api{path} HTTP/1.1\r\nAccept: application/json\r\n\r\n")
+        return b"".join(legacy_proxy(external_url, request, path + "/").iter_body())
+
+    print("%-8s %-12s %12s" % ("body", "proxy", "us/request"))
+    for path in ["/small", "/large"]:
+        for label, proxy in [("legacy", legacy), ("pooled", proxied), ("cached", lambda path: proxied(path, "/cached")), ("stale", lambda path: proxied(path, "/swr"))]:
+            assert proxy(path)
+            print("%-8s %-12s %12.2f" % (path[1:], label, min(timeit.repeat(lambda: proxy(path), number=args.requests, repeat=3)) / args.requests * 1e6))
+    upstream.shutdown()
+
+    upstreams = [upstream_server(args.size), upstream_server(args.size), upstream_server(args.size, args.slow)]
+    print()
+    print("%-18s %10s %10s %10s" % ("balance", "p50 ms", "p90 ms", "p99 ms"))
+    for strategy in ["round_robin", "least_outstanding"]:
+        router = Router()
+        router.add_proxy(ProxyRouter("pool", "/api", [f"http://127.0.0.1:{server.server_port}" for server in upstreams], balance=strategy))
+        latencies = []
+
+        def client():
+            for _ in range(args.pool_requests // args.clients):
+                start = time.perf_counter()
+                proxied("/small")
+                latencies.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=client) for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        latencies.sort()
+        print("%-18s %10.2f %10.2f %10.2f" % (strategy, *(latencies[int(len(latencies) * q)] * 1e3 for q in (0.5, 0.9, 0.99))))
+    for server in upstreams:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Measures route resolution with 10, 100 and 1000 routes, comparing the previous linear scan over
+# Route.matches/extract_params with the compiled route tree, with and without the route cache.
+# Then measures dispatch to one of N mounted subsites, comparing the previous in-order evaluation
+# of the subrouter rules with the prefix index.
+# Usage: python benchmarks/routing_bench.py [--lookups N] [--routes 10,100,1000] [--subsites 50]
+
+import argparse, logging, random, timeit
+
+from sapphirecms.routing import Router
+from sapphirecms.networking import Request
+
+
+def legacy_matches(route, request):
+    # Route.matches before the route tree, without its globals() converter fallback.
+    if request.method not in route.methods:
+        return False
+    if route.path == request.path:
+        return True
+    path_components = list(filter(lambda x: x != "", route.path.split("/")))
+    request_components = list(filter(lambda x: x != "", request.path.split("/")))
+    if len(path_components) != len(request_components) or len(path_components) == 0:
+        return False
+    for i in range(len(path_components)):
+        if path_components[i].startswith("<") and path_components[i].endswith(">"):
+            data_type = "string" if ":" not in path_components[i][1:-1] else path_components[i][1:-1].split(":")[0]
+            if data_type == "int":
+                try:
+                    int(request_components[i])
+                except:
+                    return False
+        elif path_components[i] != request_components[i]:
+            return False
+    return True
+
+
+def legacy_extract_params(route, request):
+    if not legacy_matches(route, request):
+        return {}
+    path_components = route.path.split("/")
+    request_components = request.path.split("/")
+    params = {}
+    for i in range(len(path_components)):
+        if path_components[i].startswith("<") and path_components[i].endswith(">"):
+            data_type, _, name = path_components[i][1:-1].rpartition(":")
+            params[name] = int(request_components[i]) if data_type == "int" else request_components[i]
+    return params
+
+
+def legacy_route(router, request):
+    for route in router.routes:
+        if legacy_matches(route, request):
+            return route.handler, route.request_mod, route.response_mod, legacy_extract_params(route, request)
+    return None, [], [], {}
+
+
+def build(count):
+    router = Router()
+    handler = lambda request, **params: "ok"
+    paths = []
+    for i in range(count // 5 or 1):
+        for path, sample in [
+            (f"/blog{i}/", f"/blog{i}/"),
+            (f"/blog{i}/about", f"/blog{i}/about"),
+            (f"/blog{i}/posts/<int:id>", f"/blog{i}/posts/{i}"),
+            (f"/blog{i}/posts/<int:id>/comments/<int:comment>", f"/blog{i}/posts/{i}/comments/3"),
+            (f"/blog{i}/tags/<tag>", f"/blog{i}/tags/python"),
+        ]:
+            router.add_route(path, "GET")(handler)
+            paths.append(sample)
+    return router, [Request(f"GET {path} HTTP/1.1\r\n\r\n") for path in paths]
+
+
+def legacy_dispatch(router, request):
+    # Router.route before the prefix index: evaluate every subrouter rule in order.
+    for rule, subrouter in router.subrouters.items():
+        if rule(request):
+            return subrouter.resolve(request, subrouter.prefix)[0]
+    return None, [], [], {}
+
+
+def build_subsites(count):
+    router = Router()
+    handler = lambda request, **params: "ok"
+    requests = []
+    for i in range(count):
+        subsite = Router(name=f"site{i:03d}", prefix=f"/site{i:03d}")
+        for path in ["/", "/about", "/posts/<int:id>"]:
+            subsite.add_route(path, "GET")(handler)
+        router.add_subrouter(subsite)
+        requests += [Request(f"GET /site{i:03d}/about HTTP/1.1\r\n\r\n"), Request(f"GET /site{i:03d}/posts/{i} HTTP/1.1\r\n\r\n")]
+    return router, requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark route resolution")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--routes", default="10,100,1000")
+    parser.add_argument("--subsites", type=int, default=50)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print("%-8s %-12s %12s %12s" % ("routes", "router", "avg us", "last us"))
+    for count in [int(count) for count in args.routes.split(",")]:
+        router, requests = build(count)
+        sample = [random.choice(requests) for _ in range(args.lookups)]
+        last = requests[-1]
+        for label, route in [
+            ("linear", lambda request: legacy_route(router, request)),
+            ("tree", lambda request: router.resolve(request)[0]),
+            ("tree+cache", router.route),
+        ]:
+            assert route(last)[0] is not None
+            it = iter(sample * 5)
+            average = min(timeit.repeat(lambda: route(next(it)), number=args.lookups, repeat=5)) / args.lookups * 1e6
+            worst = min(timeit.repeat(lambda: route(last), number=args.lookups, repeat=5)) / args.lookups * 1e6
+            print("%-8d %-12s %12.2f %12.2f" % (len(router.routes), label, average, worst))
+
+    router, requests = build_subsites(args.subsites)
+    sample = [random.choice(requests) for _ in range(args.lookups)]
+    last = requests[-1]
+    print()
+    print("%-8s %-12s %12s %12s" % ("subsites", "dispatch", "avg us", "last us"))
+    for label, route in [
+        ("rules", lambda request: legacy_dispatch(router, request)),
+        ("index", lambda request: router.resolve(request)[0]),
+    ]:
+        assert route(last)[0] is not None
+        it = iter(sample * 5)
+        average = min(timeit.repeat(lambda: route(next(it)), number=args.lookups, repeat=5)) / args.lookups * 1e6
+        worst = min(timeit.repeat(lambda: route(last), number=args.lookups, repeat=5)) / args.lookups * 1e6
+        print("%-8d %-12s %12.2f %12.2f" % (args.subsites, label, average, worst))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Compares the throughput and latency of the threaded and the asyncio serving modes.
+# Usage: python benchmarks/serving_bench.py [--requests N] [--concurrency C] [--mode threaded|async|prefork|all] [--path /|/render]
+
+import argparse, multiprocessing, os, socket, statistics, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+from sapphirecms.routing import Router
+from sapphirecms.networking import Server, Socket
+
+
+def render(request):
+    from sapphirecms.html import Element
+    div = type("div", (Element,), {"name": "div", "paired": True})
+    return str(div([div("Post #%s" % i, classes=["post"], id="post-%s" % i) for i in range(2000)]))
+
+
+def serve(mode, port):
+    sys.stdout = open(os.devnull, "w")
+    sys.stderr = open(os.devnull, "w")
+    server = Server(64, Router())
+    server.router.logger.disabled = True
+    server.router.add_route("/", "GET")(lambda request: "Hello, World!")
+    server.router.add_route("/render", "GET")(render)
+    if mode == "async":
+        server.start_async([Socket("127.0.0.1", port, 1024)])
+    elif mode == "prefork":
+        server.start([Socket("127.0.0.1", port, 1024, reuse_port=True)], workers=os.cpu_count())
+    else:
+        server.start([Socket("127.0.0.1", port, 1024)])
+
+
+def fetch(port, path="/"):
+    start = time.perf_counter()
+    with socket.create_connection(("127.0.0.1", port)) as conn:
+        conn.sendall(b"GET %s HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n" % path.encode())
+        while conn.recv(65536):
+            pass
+    return time.perf_counter() - start
+
+
+def wait_until_listening(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+    raise TimeoutError("Server on port %s did not start" % port)
+
+
+def run(mode, port, requests, concurrency, path="/"):
+    process = multiprocessing.Process(target=serve, args=(mode, port), daemon=True)
+    process.start()
+    try:
+        wait_until_listening(port)
+        fetch(port, path)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = sorted(pool.map(fetch, [port] * requests, [path] * requests))
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.join()
+    print("%-10s %8.1f req/s   p50 %8.2f ms   p99 %8.2f ms" % (
+        mode,
+        requests / elapsed,
+        statistics.median(latencies) * 1000,
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SapphireCMS serving modes")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mode", choices=["threaded", "async", "prefork", "all"], default="all")
+    parser.add_argument("--path", choices=["/", "/render"], default="/")
+    parser.add_argument("--port", type=int, default=4600)
+    args = parser.parse_args()
+
+    modes = ["threaded", "async", "prefork"] if args.mode == "all" else [args.mode]
+    for i, mode in enumerate(modes):
+        run(mode, args.port + i, args.requests, args.concurrency, args.path)
+
+
+if __name__ == "__main__":
+    main()
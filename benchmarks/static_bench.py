@@ -0,0 +1,63 @@
+# Measures serving a small static asset through Router.static_handler, comparing the previous handler
+# (isfile check, a new MimeTypes database and a FileResponse read per request) with the static cache,
+# for a full response and for a conditional request answered with 304. Then measures seeking in a
+# large media file: the whole file, as the previous handler sent it, against 64 KiB Range requests.
+# Usage: python benchmarks/static_bench.py [--requests N] [--size BYTES] [--media-size BYTES]
+
+import argparse, logging, mimetypes, os, tempfile, timeit
+
+from sapphirecms.routing import Router
+from sapphirecms.networking import Request
+from sapphirecms.networking.response import Response, FileResponse
+
+
+def legacy_static_handler(router, request, path):
+    # Router.static_handler before the static cache, without its print.
+    local_path = f"{router.static_dir}/{path}"[:-1].replace("/", os.sep)
+    if not os.path.isfile(local_path):
+        return Response("404 Not Found", status=404)
+    content_type = mimetypes.MimeTypes().guess_type(local_path)
+    return FileResponse(local_path, content_type=content_type[0] or "application/octet-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark static file serving")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=16 * 1024)
+    parser.add_argument("--media-size", type=int, default=16 * 1024 * 1024)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    static_dir = tempfile.mkdtemp()
+    with open(os.path.join(static_dir, "site.css"), "wb") as f:
+        f.write(b"a" * args.size)
+    router = Router(static_dir=static_dir)
+    request = Request("GET /static/site.css HTTP/1.1\r\n\r\n")
+    etag = router.static_handler(request, "site.css/").headers["ETag"]
+    conditional = Request(f"GET /static/site.css HTTP/1.1\r\nIf-None-Match: {etag}\r\n\r\n")
+
+    print("%-24s %12s" % ("handler", "us/request"))
+    for label, serve in [
+        ("legacy", lambda: legacy_static_handler(router, request, "site.css/").build()),
+        ("static cache", lambda: router.static_handler(request, "site.css/").build()),
+        ("static cache 304", lambda: router.static_handler(conditional, "site.css/").build()),
+    ]:
+        print("%-24s %12.2f" % (label, min(timeit.repeat(serve, number=args.requests, repeat=5)) / args.requests * 1e6))
+
+    with open(os.path.join(static_dir, "video.mp4"), "wb") as f:
+        f.write(os.urandom(args.media_size))
+    offset = args.media_size // 2
+    single = Request(f"GET /static/video.mp4 HTTP/1.1\r\nRange: bytes={offset}-{offset + 65535}\r\n\r\n")
+    multi = Request(f"GET /static/video.mp4 HTTP/1.1\r\nRange: bytes=0-32767, {offset}-{offset + 32767}\r\n\r\n")
+    print()
+    print("%-24s %12s" % ("seek", "us/request"))
+    for label, serve, number in [
+        ("legacy whole file", lambda: b"".join(legacy_static_handler(router, request, "video.mp4/").iter_body()), 20),
+        ("single range", lambda: b"".join(router.static_handler(single, "video.mp4/").iter_body()), args.requests),
+        ("multipart ranges", lambda: b"".join(router.static_handler(multi, "video.mp4/").iter_body()), args.requests),
+    ]:
+        print("%-24s %12.2f" % (label, min(timeit.repeat(serve, number=number, repeat=5)) / number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
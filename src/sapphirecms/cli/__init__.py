@@ -13,6 +13,7 @@
 # sapphire theme remove <name>: Remove a theme from the current SapphireCMS website.
 # sapphire theme list: List all installed themes for the current SapphireCMS website.
 # sapphire theme get: Get the current theme for the current SapphireCMS website.
+# sapphire assets build [<dir> ...] [--bundle <name>=<part>,<part> ...] [--minify] [--gzip]: Fingerprint the static assets of the current SapphireCMS website and write their manifests.
 # sapphire version: Get the version of the current SapphireCMS website.
 # sapphire update: Update the current SapphireCMS environment.
 # sapphire help: Get help for the SapphireCMS CLI.
@@ -99,6 +100,28 @@ def install(name, env, mod):
     print('To configure your website, move to the new directory and run:')
     print('sapphire config create Default')
         
+def assets_build(dirs, bundles, minify, gzip=False):
+    from sapphirecms.routing.assets import build_assets
+    if not dirs:
+        dirs = [d for d in ["static"] + [os.path.join("themes", t, "static") for t in (sorted(os.listdir("themes")) if os.path.isdir("themes") else [])] if os.path.isdir(d)]
+    if not dirs:
+        raise ValueError("No static directory found, please specify one")
+    parsed = {}
+    for bundle in bundles:
+        name, separator, parts = bundle.partition("=")
+        if not separator or not parts:
+            raise ValueError(f"Invalid bundle '{bundle}', expected <name>=<part>,<part>")
+        parsed[name.strip()] = [part.strip() for part in parts.split(",") if part.strip()]
+    unused = set(parsed)
+    for d in dirs:
+        with Halo(text=f"Building assets in '{d}'", spinner="dots2") as spinner:
+            local = {name: parts for name, parts in parsed.items() if all(os.path.isfile(os.path.join(d, part)) for part in parts)}
+            unused -= set(local)
+            manifest = build_assets(d, local, minify, gzip=gzip)
+            spinner.succeed(f"Built {len(manifest)} assets in '{d}'")
+    if unused:
+        raise ValueError(f"No static directory contains all the parts of bundle(s) {', '.join(sorted(unused))}")
+
 def run(mode):
     subprocess.run([pyexec, "-m", "CMS", mode])
     
@@ -268,6 +291,13 @@ def main():
     theme_parser.add_argument("action", help="The action to perform on the current SapphireCMS website", choices=["add", "remove", "list"], nargs="?")
     theme_parser.add_argument("id", help="Identifier of the theme to perform the action on (Can be a name or a URL for adding a theme)", nargs="?")
     
+    assets_parser = subparsers.add_parser("assets", help="Manage the static assets of the current SapphireCMS website")
+    assets_parser.add_argument("action", help="The action to perform on the static assets", choices=["build"])
+    assets_parser.add_argument("dirs", help="The static directories to build (Default: 'static' and the static directories of the themes)", nargs="*")
+    assets_parser.add_argument("-b", "--bundle", help="A bundle to concatenate, as <name>=<part>,<part> with paths relative to the static directory", action="append", default=[])
+    assets_parser.add_argument("--minify", help="Minify the CSS and JavaScript files and bundles", action="store_true")
+    assets_parser.add_argument("--gzip", help="Write the gzip sidecars of the compressible files, sent to clients accepting gzip", action="store_true")
+    
     version_parser = subparsers.add_parser("version", help="Get the version of the current SapphireCMS environment")
     
     update_parser = subparsers.add_parser("update", help="Update the current SapphireCMS environment")    
@@ -377,6 +407,10 @@ def main():
                     theme.list()
                 case _:
                     raise ValueError("Invalid action specified for command 'theme'")
+        case "assets":
+            match args.action:
+                case "build":
+                    assets_build(args.dirs, args.bundle, args.minify, args.gzip)
         case "version":
             import importlib.metadata
             print(importlib.metadata.version("SapphireCMS"))
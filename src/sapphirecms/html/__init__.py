@@ -1,4 +1,4 @@
-import sys, html
+import sys, html, weakref
 
 import pygments.util
 from pygments import highlight
@@ -77,13 +77,22 @@ class Element:
         Returns:
             str: The string representation of the element.
         """
+        return f"{self.start_tag()}{''.join([str(child) for child in self.children])}</{self.name}>" if self.paired else self.start_tag()
+
+    def start_tag(self):
+        """
+        Returns the opening tag of the element, with its attributes and classes.
+
+        Returns:
+            str: The opening tag.
+        """
         attrs = " " + (" ".join(self.attributes)) if len(self.attributes) > 0 else ""
         if type(self.classes) == list:
             classes = " ".join(self.classes)
             attrs += f' class="{classes}"'
         elif self.classes:
             attrs += f' class="{self.classes}"'
-        return f"<{self.name}{attrs}>{''.join([str(child) for child in self.children])}</{self.name}>" if self.paired else f"<{self.name}{attrs}>"
+        return f"<{self.name}{attrs}>"
 
     def __repr__(self):
         """
@@ -270,6 +279,174 @@ class Page:
         """
         return self.tree.queryClass(class_)
 
+class Slot(Element):
+    """
+    A placeholder for the dynamic part of a tree, filled in when a compiled Template is rendered.
+
+    Rendered directly, outside of a template, a slot renders its default.
+
+    Args:
+        slot (str): The name of the slot, i.e. the keyword argument of Template.render that fills it.
+        default: The content rendered when no value is given.
+        escape (bool): Whether string values are HTML-escaped. Elements are never escaped.
+
+    Attributes:
+        slot (str): The name of the slot.
+        default: The content rendered when no value is given.
+        escape (bool): Whether string values are HTML-escaped.
+    """
+
+    name = "slot"
+    paired = False
+
+    def __init__(self, slot, default=None, escape=False):
+        super().__init__()
+        self.slot = slot
+        self.default = default
+        self.escape = escape
+
+    def __str__(self):
+        return self.fill(self.default)
+
+    def fill(self, value):
+        """
+        Renders a value in place of the slot.
+
+        Args:
+            value: An element, a string, a list of them or None.
+
+        Returns:
+            str: The rendered value.
+        """
+        if value is None:
+            return "" if self.default is None else self.render_value(self.default)
+        return self.render_value(value)
+
+    def render_value(self, value):
+        """
+        Renders an element, a string or a list of them, escaping strings if the slot escapes.
+        """
+        if isinstance(value, (list, tuple)):
+            return "".join(self.render_value(item) for item in value)
+        if isinstance(value, str):
+            return html.escape(value) if self.escape else value
+        return str(value)
+
+    def prerendered(self):
+        """
+        Returns the slot itself, so that prerendered trees keep their slots.
+        """
+        return self
+
+class Template:
+    """
+    A render plan compiled from an element tree or a page.
+
+    Every subtree without a Slot is rendered once, at compile time, and the consecutive static
+    markup around the slots is folded into single strings. Rendering only fills in the slots and
+    joins the parts, instead of walking the whole tree. The tree must not be modified after it
+    is compiled; compile it again instead.
+
+    Args:
+        source (Element | Page | str | list): The tree to compile.
+
+    Attributes:
+        parts (list): The static strings of the plan, with None in place of each slot.
+        slots (list): The (index, Slot) pairs of the slots in parts.
+        names (set): The names of the slots.
+    """
+
+    def __init__(self, source):
+        parts = []
+        self.compile(source, parts)
+        self.parts, self.slots = [], []
+        for part in parts:
+            if isinstance(part, Slot):
+                self.slots.append((len(self.parts), part))
+                self.parts.append(None)
+            elif self.parts and self.parts[-1] is not None:
+                self.parts[-1] += part
+            else:
+                self.parts.append(part)
+        self.names = {slot.slot for _, slot in self.slots}
+
+    @classmethod
+    def compile(cls, node, parts):
+        """
+        Appends the parts of a node to a plan: whole strings for static subtrees, and the opening
+        tag, the parts of the children and the closing tag for elements containing a slot.
+        """
+        if isinstance(node, Page):
+            parts.append("<!DOCTYPE html>")
+            cls.compile(node.tree, parts)
+        elif isinstance(node, list):
+            for child in node:
+                cls.compile(child, parts)
+        elif isinstance(node, Slot):
+            parts.append(node)
+        elif isinstance(node, Element) and has_slot(node):
+            parts.append(node.start_tag())
+            for child in node.children:
+                cls.compile(child, parts)
+            parts.append(f"</{node.name}>")
+        else:
+            parts.append(str(node))
+
+    def render(self, **values):
+        """
+        Renders the template.
+
+        Args:
+            **values: The content of the slots, by name. Missing slots render their default.
+
+        Returns:
+            str: The rendered template.
+
+        Raises:
+            TypeError: If a value is given for a slot that the template does not have.
+        """
+        unknown = values.keys() - self.names
+        if unknown:
+            raise TypeError(f"Unknown slot(s) {', '.join(sorted(unknown))}")
+        parts = self.parts.copy()
+        for index, slot in self.slots:
+            parts[index] = slot.fill(values.get(slot.slot))
+        return "".join(parts)
+
+    __call__ = render
+
+def has_slot(element):
+    """
+    Checks whether an element's subtree contains a Slot.
+    """
+    if isinstance(element, Slot):
+        return True
+    if not element.paired:
+        return False
+    return any(isinstance(child, Element) and has_slot(child) for child in element.children)
+
+templates = weakref.WeakKeyDictionary()
+
+def compile_template(source):
+    """
+    Returns the Template of an element tree or a page, compiling it on first use.
+
+    Templates of elements and pages are cached for as long as the source exists, so a layout
+    compiled at import time is compiled only once.
+
+    Args:
+        source (Element | Page | str | list): The tree to compile.
+
+    Returns:
+        Template: The compiled template.
+    """
+    if not isinstance(source, (Element, Page)):
+        return Template(source)
+    template = templates.get(source)
+    if template is None:
+        template = templates[source] = Template(source)
+    return template
+
 all_tags = ["a", "abbr", "address", "area", "article", "aside", "audio", "b", "base", "bdi", "bdo", "blockquote", "body", "br", "button", "canvas", "caption", "cite", "code", "col", "colgroup", "command", "datalist", "dd", "del", "details", "dfn", "div", "dl", "dt", "em", "embed", "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "head", "header", "hgroup", "hr", "html", "i", "iframe", "img", "input", "ins", "kbd", "keygen", "label", "legend", "li", "link", "map", "mark", "math", "menu", "meta", "meter", "nav", "noscript", "object", "ol", "optgroup", "option", "output", "p", "param", "pre", "progress", "q", "rp", "rt", "ruby", "s", "samp", "script", "section", "select", "small", "source", "span", "strong", "style", "sub", "summary", "sup", "svg", "table", "tbody", "td", "textarea", "tfoot", "th", "thead", "time", "title", "tr", "track", "u", "ul", "var", "video", "wbr"]
 paired_tags = ["a", "abbr", "address", "article", "aside", "audio", "b", "bdi", "bdo", "blockquote", "body", "button", "canvas", "caption", "cite", "code", "colgroup", "command", "datalist", "dd", "del", "details", "dfn", "div", "dl", "dt", "em", "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "head", "header", "hgroup", "html", "i", "iframe", "ins", "kbd", "label", "legend", "li", "map", "mark", "math", "meter", "menu", "nav", "noscript", "object", "ol", "optgroup", "option", "output", "p", "pre", "progress", "q", "rp", "rt", "ruby", "s", "samp", "script", "section", "select", "small", "span", "strong", "style", "sub", "summary", "sup", "svg", "table", "tbody", "td", "textarea", "tfoot", "th", "thead", "time", "title", "tr", "u", "ul", "var", "video"]
 unpaired_tags = ["area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "meta", "param", "source", "track", "wbr"]
@@ -291,4 +468,7 @@ def initialize(context_name):
         setattr(sys.modules[context_name], tag, type(tag, (Element,), {"name": tag, "paired": False}))
     
     setattr(sys.modules[context_name], "Page", Page)
+    setattr(sys.modules[context_name], "Slot", Slot)
+    setattr(sys.modules[context_name], "Template", Template)
+    setattr(sys.modules[context_name], "compile_template", compile_template)
     setattr(sys.modules[context_name], "code_block", code_block)
\ No newline at end of file
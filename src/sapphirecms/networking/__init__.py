@@ -1,13 +1,17 @@
-import json
+import asyncio
+import inspect
 import pip
 import os, sys, select, socket
+import queue
+import signal
 import ssl
 import threading
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
-from .request import Request
-from .response import Response
+from .request import Request, RequestParser
+from .response import Response, FileResponse
 from sapphirecms.logs import server_logger, socket_logger, client_logger, worker_logger
     
 class Socket:
@@ -26,10 +30,12 @@ class Socket:
 
     """
 
-    def __init__(self, host, port, buffer_size, keyfile=None, certfile=None, cert_reqs=ssl.CERT_NONE, ca_certs=None, suppress_ragged_eofs=True, ciphers=None):
+    def __init__(self, host, port, buffer_size, keyfile=None, certfile=None, cert_reqs=ssl.CERT_NONE, ca_certs=None, suppress_ragged_eofs=True, ciphers=None, read_timeout=10, reuse_port=False):
         self.host = host
         self.port = port
         self.buffer_size = buffer_size
+        self.read_timeout = read_timeout
+        self.reuse_port = reuse_port
         self._socket = None
         self.https = certfile and keyfile
         if self.https:
@@ -62,20 +68,40 @@ class Socket:
         """
         Returns the next client connection.
         """
-        return Client(*self._socket.accept())
+        return Client(*self._socket.accept(), buffer_size=self.buffer_size, read_timeout=self.read_timeout)
         
     
-    def start(self, override=False):
+    def ssl_context(self):
+        """
+        Returns a server side SSL context built from the socket's certificate settings.
+        """
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile=self.certfile, keyfile=self.keyfile)
+        context.verify_mode = self.cert_reqs
+        if self.ca_certs:
+            context.load_verify_locations(self.ca_certs)
+        if self.ciphers:
+            context.set_ciphers(self.ciphers)
+        return context
+    
+    def start(self, override=False, wrap_ssl=True):
         """
         Starts the socket connection.
+
+        Args:
+            override (bool): Restart the socket even if it was already started.
+            wrap_ssl (bool): Wrap HTTPS sockets in SSL. Event loop servers pass False and apply ssl_context() themselves.
         """
         if self._socket and not override:
             logger = socket_logger(self.id)
             logger.warning("Socket connection already started.")
             return
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        if self.https:
-            self._socket = ssl.wrap_socket(self._socket, server_side=True, certfile=self.certfile, keyfile=self.keyfile, cert_reqs=self.cert_reqs, ca_certs=self.ca_certs, suppress_ragged_eofs=self.suppress_ragged_eofs, ciphers=self.ciphers)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if self.https and wrap_ssl:
+            self._socket = self.ssl_context().wrap_socket(self._socket, server_side=True, suppress_ragged_eofs=self.suppress_ragged_eofs)
         self._socket.bind((self.host, self.port))
         self.id = self._socket.fileno()
     
@@ -89,6 +115,7 @@ class Socket:
         logger = socket_logger(self.id)
         logger.info("Listening for incoming connections <%s:%s>..." % (self.host, self.port))
         self._socket.listen()
+        self._socket.setblocking(False)
         
     def disconnect(self):
         """
@@ -111,23 +138,81 @@ class Socket:
         self._socket.close()
 
 class Client:
-    def __init__(self, client_socket, address):
+    """
+    Represents an accepted client connection.
+
+    Args:
+        client_socket (socket): The accepted socket.
+        address (tuple): The address of the client.
+        buffer_size (int): The number of bytes requested from the socket per read.
+        read_timeout (float): The number of seconds a client has to send a complete request.
+
+    Attributes:
+        client_socket (socket): The accepted socket.
+        address (tuple): The address of the client.
+        parser (RequestParser): The parser the received bytes are fed to.
+
+    """
+
+    def __init__(self, client_socket, address, buffer_size=1024, read_timeout=10):
         self.client_socket = client_socket
-        self.client_socket.setblocking(False)
+        self.client_socket.settimeout(read_timeout)
         self.address = address
-        self.buffer_size = 1024
+        self.buffer_size = buffer_size
+        self.read_timeout = read_timeout
+        self.parser = RequestParser()
+
+    def fill(self, deadline):
+        """
+        Reads the next block from the client into the parser.
 
+        Returns:
+            bool: False if the client closed the connection.
+
+        Raises:
+            TimeoutError: If the read deadline has passed.
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Read deadline exceeded")
+        self.client_socket.settimeout(remaining)
+        block = self.client_socket.recv(self.buffer_size)
+        self.parser.feed(block)
+        return len(block) > 0
+    
     def receive(self):
         """
-        Receives data from the client.
+        Receives one request from the client.
+
+        Reads until the parser has a complete request. Bytes beyond the request are kept by the
+        parser for the next call.
+
+        Returns:
+            Request: The request, or None if the client closed the connection before completing one.
+
+        Raises:
+            TimeoutError: If the request is not complete within read_timeout seconds.
+            ValueError: If the request is malformed.
         """
-        logger = client_logger(self.address)
-        blocks = []
-        while select.select([self.client_socket], [], [], 0.2)[0]:
-            blocks.append(self.client_socket.recv(self.buffer_size))
-        self.client_socket = self.client_socket
-        return b"".join(blocks).decode()
+        deadline = time.monotonic() + self.read_timeout
+        request = self.parser.next()
+        while request is None:
+            if not self.fill(deadline):
+                return None
+            request = self.parser.next()
+        return request
     
+    def wait(self, timeout):
+        """
+        Waits for the client to start its next request.
+
+        Returns:
+            bool: True if request bytes are (or became) available within the timeout.
+        """
+        if self.parser.buffer or getattr(self.client_socket, "pending", lambda: 0)():
+            return True
+        return len(select.select([self.client_socket], [], [], timeout)[0]) > 0
+        
     def disconnect(self):
         """
         Disconnects the client socket.
@@ -146,7 +231,128 @@ class Client:
         """
         logger = client_logger(self.address)
         logger.info("Sending response to client...")
-        self.client_socket.send(data)
+        self.client_socket.sendall(data)
+        
+    def send_response(self, response, head=False):
+        """
+        Sends a response to the client, transmitting file bodies with sendfile and streamed bodies
+        chunk by chunk as they are produced.
+
+        Args:
+            response (Response): The response.
+            head (bool): Whether the response answers a HEAD request, in which case only the status
+                line and headers are sent.
+        """
+        if head:
+            self.send(response.build_head())
+            response.close()
+        elif isinstance(response, FileResponse) and response.sendable:
+            self.send(response.build_head())
+            with open(response.path, "rb") as f:
+                self.client_socket.sendfile(f, response.offset, response.count)
+        elif response.streaming:
+            for data in response.build_stream():
+                self.send(data)
+        else:
+            self.send(response.build())
+
+class WorkerPool:
+    """
+    Represents a fixed-size pool of worker threads fed by a bounded accept queue.
+
+    Args:
+        size (int): The number of worker threads.
+        queue_size (int): The number of accepted clients that may wait for a worker.
+        router (Router): The router object responsible for handling client requests.
+        debug (bool): Whether to include tracebacks in error responses.
+        keep_alive_timeout (float): The number of seconds an idle connection is kept open for the next request.
+        max_requests (int): The maximum number of requests served on one connection.
+
+    Attributes:
+        size (int): The number of worker threads.
+        queue (Queue): The accepted clients waiting for a worker.
+        active (int): The number of clients currently being handled.
+        queued (int): The number of clients waiting for a worker.
+        rejected (int): The number of clients rejected because the queue was full.
+
+    """
+
+    def __init__(self, size, queue_size, router, debug, keep_alive_timeout=5, max_requests=100):
+        self.size = size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.router = router
+        self.debug = debug
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_requests = max_requests
+        self.active = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+        self.threads = []
+        
+    @property
+    def queued(self):
+        return self.queue.qsize()
+        
+    def start(self):
+        """
+        Starts the worker threads.
+        """
+        while len(self.threads) < self.size:
+            thread = threading.Thread(target=self.run, name="SapphireWorker-%s" % len(self.threads), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+            
+    def run(self):
+        """
+        Handles queued clients until a stop sentinel is received.
+        """
+        while True:
+            client = self.queue.get()
+            if client is None:
+                return
+            with self.lock:
+                self.active += 1
+            try:
+                Worker(client, self.router, self.debug, self.keep_alive_timeout, self.max_requests, busy=lambda: self.queued > 0)
+            except Exception:
+                worker_logger(threading.current_thread().name).critical("An error occurred while serving a client: %s" % traceback.format_exc())
+            finally:
+                with self.lock:
+                    self.active -= 1
+                    
+    def submit(self, client):
+        """
+        Queues a client for the next free worker, rejecting it with a 503 if the queue is full.
+
+        Returns:
+            bool: True if the client was queued, False if it was rejected.
+        """
+        try:
+            self.queue.put_nowait(client)
+            return True
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+            try:
+                client.send(Response("503 Service Unavailable", status="503 Service Unavailable", headers={"Retry-After": "1"}).build())
+            except OSError:
+                pass
+            client.disconnect()
+            return False
+        
+    def stats(self):
+        """
+        Returns the live connection counters of the pool.
+        """
+        return {"size": self.size, "active": self.active, "queued": self.queued, "rejected": self.rejected}
+    
+    def stop(self):
+        """
+        Stops the worker threads once the queued clients are handled.
+        """
+        for _ in self.threads:
+            self.queue.put(None)
+        self.threads = []
 
 class Server:
     """
@@ -158,6 +364,10 @@ class Server:
         max_connections (int): The maximum number of simultaneous connections allowed.
         max_buffer_size (int): The maximum size of the receive buffer for each client connection.
         router (Router): The router object responsible for handling client requests.
+        queue_size (int): The number of accepted connections that may wait for a free worker before new ones are rejected with a 503.
+        keep_alive_timeout (float): The number of seconds an idle persistent connection is kept open.
+        max_keep_alive_requests (int): The maximum number of requests served on one persistent connection.
+        database: The storage adapter connected and closed by the ASGI lifespan events, if any.
 
     Attributes:
         host (str): The host address to bind the server socket to.
@@ -167,15 +377,24 @@ class Server:
         server_socket (socket): The server socket object.
         router (Router): The router object responsible for handling client requests.
         clients (list): A list of connected client sockets.
+        pool (WorkerPool): The worker pool handling the accepted connections.
+        database: The storage adapter connected and closed by the ASGI lifespan events, if any.
+        executor (ThreadPoolExecutor): The executor running synchronous handlers under ASGI.
         logger (Logger): The logger object for logging server events.
 
     """
 
-    def __init__(self, max_connections, router, auto_reload=False, debug=False, secret_key=None):
+    def __init__(self, max_connections, router, auto_reload=False, debug=False, secret_key=None, queue_size=64, keep_alive_timeout=5, max_keep_alive_requests=100, database=None):
         self.max_connections = max_connections
+        self.queue_size = queue_size
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_keep_alive_requests = max_keep_alive_requests
         self.router = router
         self.auto_reload = auto_reload
         self.debug = debug if sys.argv[0] != "prod" else False
+        self.pool = WorkerPool(self.max_connections, self.queue_size, self.router, self.debug, self.keep_alive_timeout, self.max_keep_alive_requests)
+        self.database = database
+        self.executor = None
         
         self.logger = server_logger()
         self.logger.info("Server initialized.")
@@ -183,7 +402,7 @@ class Server:
         self.secret_key = secret_key
     
     def __call__(self, environ, start_response):
-        req = Request("\r\n".join([f"{environ['REQUEST_METHOD']} {environ['PATH_INFO']} {environ['SERVER_PROTOCOL']}"] + [f"{key[5:].replace('_', '-').title()}: {value}" for key, value in environ.items() if key.startswith("HTTP_")] + [f"{key.title()}: {value}" for key, value in environ.items() if key in ["CONTENT_TYPE", "CONTENT_LENGTH"]] + [(environ["wsgi.input"].read(int(environ["CONTENT_LENGTH"])).decode() if environ["CONTENT_LENGTH"] != "0" else "")  if "CONTENT_LENGTH" in environ else ""]))
+        req = Request.from_environ(environ)
         worker = WSGIWorker(req, self.router, self.debug)
         response = worker.handle_request()
         hop_by_hop = ["connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailers", "transfer-encoding", "upgrade"]
@@ -191,17 +410,74 @@ class Server:
         for key, _ in headers.items():
             if key.lower() in hop_by_hop:
                 del response.headers[key]
-        start_response(response.status, list(response.headers.items()))
+        response.chunked = False
+        response.recalculate()
+        start_response(response.status, [(key, str(value)) for key, value in response.headers.items()])
+        if isinstance(response, FileResponse) and response.sendable:
+            if response.offset == 0 and response.count == os.path.getsize(response.path) and "wsgi.file_wrapper" in environ:
+                return environ["wsgi.file_wrapper"](open(response.path, "rb"), 2 ** 16)
+            return response.iter_body()
+        if response.streaming:
+            return response.iter_body()
         return [response.body.encode() if type(response.body) == str else response.body]
     
-    def start(self, sockets: list):
+    async def asgi(self, scope, receive, send):
         """
-        Starts the server.
+        The ASGI 3 application, e.g. `uvicorn app:server.asgi`.
+
+        Args:
+            scope (dict): The connection scope.
+            receive (callable): The receive channel.
+            send (callable): The send channel.
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="SapphireWorker")
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await ASGIWorker(scope, receive, send, self.router, self.debug, self.executor).handle_request()
+        else:
+            raise NotImplementedError("Unsupported ASGI scope type: %s" % scope["type"])
+        
+    async def lifespan(self, receive, send):
+        """
+        Handles the ASGI lifespan events, connecting the database on startup and closing it on shutdown.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    if self.database is not None:
+                        await loop.run_in_executor(self.executor, self.database.connect)
+                except Exception:
+                    self.logger.critical("Startup failed: %s" % traceback.format_exc())
+                    await send({"type": "lifespan.startup.failed", "message": traceback.format_exc()})
+                    return
+                self.logger.info("Server started (ASGI).")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                try:
+                    if self.database is not None:
+                        await loop.run_in_executor(self.executor, self.database.close)
+                except Exception:
+                    self.logger.critical("Shutdown failed: %s" % traceback.format_exc())
+                    await send({"type": "lifespan.shutdown.failed", "message": traceback.format_exc()})
+                    return
+                finally:
+                    self.executor.shutdown(wait=False)
+                    self.executor = None
+                self.logger.info("Server stopped.")
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    
+    def open_sockets(self, sockets: list, wrap_ssl=True):
+        """
+        Starts and listens on all the server sockets.
         """
-        self.logger.info("Starting Server")
         entrypoints = []
         for sock in sockets:
-            sock.start()
+            sock.start(wrap_ssl=wrap_ssl)
             if sock.host != "0.0.0.0":
                 entrypoints.append((f"http{'s' if sock.https else ''}://{sock.host}:{sock.port}/", {sock.id}))
             else:
@@ -218,18 +494,169 @@ class Server:
             self.logger.info("Socket#%s listening." % sock.id)
             
         self.logger.info("All server sockets listening.")
+    
+    def start(self, sockets: list, workers: int = 1):
+        """
+        Starts the server.
+
+        Args:
+            sockets (list): The sockets to serve on.
+            workers (int): The number of worker processes. With more than one, the server pre-forks
+                worker processes and supervises them (see supervise).
+        """
+        self.logger.info("Starting Server")
+        if workers > 1:
+            return self.supervise(sockets, workers)
+        self.open_sockets(sockets)
+        self.init_time = time.time()
+        while True:
+            try:
+                self.serve(sockets)
+            except KeyboardInterrupt:
+                self.logger.critical("KeyboardInterrupt received. Press Ctrl+C again to stop the server. [5s]")
+                try:
+                    time.sleep(5)
+                    self.logger.warning("Server not stopped. Continuing...")
+                except KeyboardInterrupt:
+                    self.logger.critical("KeyboardInterrupt received. Stopping server...")
+                    self.pool.stop()
+                    for sock in sockets:
+                        sock.close()
+                    self.logger.info("Server stopped.")
+                    return
+                
+    def serve(self, sockets: list):
+        """
+        Accepts connections on the (already listening) sockets and hands them to the worker pool.
+        """
+        self.pool.start()
+        while True:
+            if self.auto_reload:
+                self.check_file_changes()
+            readable, _, _ = select.select(sockets, [], [], 0.1)
+            for sock in readable:
+                try:
+                    client = sock.get_client()
+                except (BlockingIOError, InterruptedError):
+                    continue
+                if not self.pool.submit(client):
+                    self.logger.warning("Worker queue full. Rejected connection. %s" % self.stats())
+    
+    def supervise(self, sockets: list, workers: int, min_uptime: float = 1, max_backoff: float = 30):
+        """
+        Pre-forks worker processes that serve the sockets, and restarts any that exit.
+
+        Workers that exit within min_uptime seconds of starting, e.g. because they crash on start,
+        are restarted after an exponential backoff (0.2 s, 0.4 s, ... up to max_backoff seconds),
+        which is reset once a worker stays up for min_uptime seconds.
+
+        Sockets created with reuse_port=True are bound by every worker process with SO_REUSEPORT, so
+        the kernel balances connections between them. Otherwise the sockets are bound once here and
+        the workers accept on the inherited listening sockets. SIGINT and SIGTERM stop the server and
+        are forwarded to the workers.
+
+        Args:
+            sockets (list): The sockets to serve on.
+            workers (int): The number of worker processes.
+            min_uptime (float): The number of seconds a worker must run to not count as a crash on start.
+            max_backoff (float): The maximum number of seconds before a crashed worker is restarted.
+        """
+        if not hasattr(os, "fork"):
+            raise NotImplementedError("Pre-fork workers are not supported on this platform.")
+        reuse_port = all(sock.reuse_port for sock in sockets)
+        if not reuse_port:
+            self.open_sockets(sockets)
+        self.init_time = time.time()
+        children = {}
+        restarts = []
+        crashes = 0
+        stopping = []
+        
+        def spawn():
+            pid = os.fork()
+            if pid == 0:
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                try:
+                    if reuse_port:
+                        self.open_sockets(sockets)
+                    self.auto_reload = False
+                    self.serve(sockets)
+                except:
+                    self.logger.critical("Worker process crashed: %s" % traceback.format_exc())
+                finally:
+                    os._exit(1)
+            children[pid] = time.monotonic()
+            self.logger.info("Started worker process #%s." % pid)
+            
+        def stop(signum, frame):
+            stopping.append(signum)
+            
+        def stop_children():
+            for pid in children:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            for pid in children:
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+            children.clear()
+            
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        for _ in range(workers):
+            spawn()
+        while not stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid in children:
+                uptime = time.monotonic() - children.pop(pid)
+                crashes = crashes + 1 if uptime < min_uptime else 0
+                delay = min(0.1 * 2 ** crashes, max_backoff) if crashes else 0
+                self.logger.critical("Worker process #%s exited with status %s. Restarting in %.1fs..." % (pid, os.waitstatus_to_exitcode(status), delay))
+                restarts.append(time.monotonic() + delay)
+                continue
+            while restarts and min(restarts) <= time.monotonic():
+                restarts.remove(min(restarts))
+                spawn()
+            if self.auto_reload:
+                self.check_file_changes(before_reload=stop_children)
+            time.sleep(0.1)
+        self.logger.critical("Signal %s received. Stopping server..." % stopping[0])
+        stop_children()
+        for sock in sockets:
+            if sock._socket:
+                sock.close()
+        self.logger.info("Server stopped.")
+    
+    def stats(self):
+        """
+        Returns the live connection counters (active, queued and rejected) of the worker pool.
+        """
+        return self.pool.stats()
+    
+    def start_async(self, sockets: list, max_workers: int = None):
+        """
+        Starts the server on a single asyncio event loop.
+        
+        Connections are accepted, read and written on the event loop, while routing and the
+        (synchronous) handlers run on a bounded thread pool executor.
+
+        Args:
+            sockets (list): The sockets to serve on.
+            max_workers (int): The size of the handler executor. Defaults to the ThreadPoolExecutor default.
+        """
+        self.logger.info("Starting Server (asyncio)")
+        self.open_sockets(sockets, wrap_ssl=False)
         self.init_time = time.time()
         while True:
             try:
-                if self.auto_reload:
-                    self.check_file_changes()
-                active_sockets = []
-                readable, _, _ = select.select([sock for sock in sockets if sock not in active_sockets], [], [], 0.1)
-                for sock in readable:
-                    active_sockets.append(sock)
-                    client_handler = threading.Thread(target=Worker, args=(sock.get_client(), self.router, self.debug), daemon=True)
-                    client_handler.start()
-                    time.sleep(0.5)
+                asyncio.run(self.serve_async(sockets, max_workers))
             except KeyboardInterrupt:
                 self.logger.critical("KeyboardInterrupt received. Press Ctrl+C again to stop the server. [5s]")
                 try:
@@ -241,6 +668,31 @@ class Server:
                         sock.close()
                     self.logger.info("Server stopped.")
                     return
+    
+    async def serve_async(self, sockets: list, max_workers: int = None):
+        """
+        Serves the (already listening) sockets until cancelled.
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="SapphireWorker")
+        
+        def client_handler(sock):
+            async def handle_client(reader, writer):
+                await AsyncWorker(reader, writer, self.router, self.debug, executor, sock.read_timeout, self.keep_alive_timeout, self.max_keep_alive_requests).serve()
+            return handle_client
+        
+        servers = [await asyncio.start_server(client_handler(sock), sock=sock._socket, ssl=sock.ssl_context() if sock.https else None, limit=max(sock.buffer_size, 2 ** 16)) for sock in sockets]
+        try:
+            if self.auto_reload:
+                loop = asyncio.get_running_loop()
+                while True:
+                    await loop.run_in_executor(None, self.check_file_changes)
+                    await asyncio.sleep(1)
+            else:
+                await asyncio.gather(*[server.serve_forever() for server in servers])
+        finally:
+            for server in servers:
+                server.close()
+            executor.shutdown(wait=False, cancel_futures=True)
             
     def start_wsgi(self, server, socket_addrs: list):
         """
@@ -320,80 +772,126 @@ class Server:
             case _:
                 raise NotImplementedError(f"Server {server} not supported.")
             
-    def check_file_changes(self):
+    def check_file_changes(self, before_reload=None):
         """
         Checks for file changes and reloads the server if any changes are detected.
+
+        Args:
+            before_reload (function): Called before the server process is replaced.
         """
         for path, _, files in os.walk("."):
             for file in files:
                 if file.endswith(".py") and os.path.getmtime(os.path.join(path, file)) > self.init_time:
                     self.logger.warning("File<%s> changed. Reloading server..." % file)
                     try:
+                        if before_reload:
+                            before_reload()
                         os.execv(sys.executable, [f'"{sys.executable}"'] + [f'"{arg}"' for arg in sys.argv])
                     except:
                         self.logger.critical("An error occurred while trying to reload the server: %s" % traceback.format_exc())
 
 class Worker:
     """
-    Represents a worker that handles client requests.
+    Represents a worker that handles the requests of a client connection.
 
     Args:
         socket (socket): The socket object representing the client connection.
         router (Router): The router object responsible for handling client requests.
+        keep_alive_timeout (float): The number of seconds an idle connection is kept open for the next request.
+        max_requests (int): The maximum number of requests served on one connection.
+        busy (function): Returns True when other clients are waiting, in which case the connection is not kept alive.
 
     Attributes:
+        idle_poll (float): The number of seconds between checks of busy while the connection is idle.
         socket (socket): The socket object representing the client connection.
         router (Router): The router object responsible for handling client requests.
         logger (Logger): The logger object for logging worker events.
 
     """
 
-    def __init__(self, client, router, debug):
+    idle_poll = 0.1
+
+    def __init__(self, client, router, debug, keep_alive_timeout=5, max_requests=100, busy=lambda: False):
         self.start_time = time.time()
         self.client = client
         self.router = router
         self.debug = debug
-        self.handle_request()
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_requests = max_requests
+        self.busy = busy
+        self.serve()
         
-    def handle_request(self):
+    def serve(self):
+        """
+        Handles requests on the connection, in order, until it is no longer kept alive.
         """
-        Handles the client request.
+        try:
+            served = 1
+            while self.handle_request(keep_alive=served < self.max_requests and not self.busy()):
+                served += 1
+                if not self.wait():
+                    break
+        finally:
+            self.client.disconnect()
+        
+    def wait(self):
+        """
+        Waits for the client to start its next request, in slices of idle_poll seconds so that the
+        idle connection is given up as soon as other clients are waiting for a worker.
+
+        Returns:
+            bool: True if the client started a request within the keep-alive timeout.
+        """
+        deadline = time.monotonic() + self.keep_alive_timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            if self.client.wait(min(remaining, self.idle_poll)):
+                return True
+            if self.busy():
+                return False
+        return False
+        
+    def handle_request(self, keep_alive=False):
+        """
+        Handles the next client request.
+
+        Args:
+            keep_alive (bool): Whether the connection may be kept open after this request.
+
+        Returns:
+            bool: True if the connection was kept open for another request.
         """
         logger = worker_logger(id(self))
+        head = False
         try:
-            init_time = time.time()
-            data = self.client.receive()
-            if len(data) == 0:
-                return
-            receive_time = time.time()
-            request = Request(data)
-            logger.info("%s %s" % (request.method, request.path))
-            handler, request_mod, response_mod, params = self.router.route(request)
-            if not handler:
-                self.client.send(Response("404 Not Found", status=404).build())
-                return
-            for mod in request_mod:
-                request = mod(request)
-            response = handler(request, **params)
-            for mod in response_mod:
-                response = mod(response)
-            if type(response) == Response:
-                self.client.send(response.build())
-            elif type(response) == tuple:
-                if len(response) == 2 and type(response[0]) in [dict, list] and type(response[1]) == int:
-                    self.client.send(Response(json.dumps(response[0]), status=response[1], content_type="application/json").build())
-                else:
-                    self.client.send(Response("500 Internal Server Error", status=500).build())
-                    logger.critical("Invalid response format: %s" % response)
-            else:
-                self.client.send(Response(response).build())            
+            request = self.client.receive()
+            if request is None:
+                return False
+            head = request.method == "HEAD"
+            keep_alive = keep_alive and request.keep_alive
+            response = WSGIWorker(request, self.router, self.debug).handle_request()
+            keep_alive = response.frame(request.version) and keep_alive
+        except TimeoutError:
+            logger.warning("Client did not send a complete request in time.")
+            response, keep_alive = Response("408 Request Timeout", status="408 Request Timeout"), False
+        except ValueError:
+            logger.warning("Malformed request: %s" % traceback.format_exc())
+            response, keep_alive = Response("400 Bad Request", status="400 Bad Request"), False
         except Exception as e:
             logger.critical("An error occurred while handling the request: %s" % traceback.format_exc())
             if self.debug:
-                self.client.send(Response("500 Internal Server Error:\n\n%s" % traceback.format_exc(), status=500).build())
-            self.client.send(Response("500 Internal Server Error", status=500).build())
-        finally:
-            self.client.disconnect()
+                response = Response("500 Internal Server Error:\n\n%s" % traceback.format_exc(), status=500)
+            else:
+                response = Response("500 Internal Server Error", status=500)
+            keep_alive = False
+        response.headers["Connection"] = "keep-alive" if keep_alive else "close"
+        try:
+            self.client.send_response(response, head)
+        except (ConnectionError, ssl.SSLError):
+            return False
+        except Exception:
+            logger.critical("An error occurred while streaming the response: %s" % traceback.format_exc())
+            return False
+        return keep_alive
         
 class WSGIWorker:
     """
@@ -418,35 +916,292 @@ class WSGIWorker:
         
     def handle_request(self):
         """
-        Handles the client request.
+        Handles the client request through the router's middleware and the route handler.
         """
         logger = worker_logger(id(self))
         request = self.request
         try:
             logger.info("%s %s" % (request.method, request.path))
-            handler, request_mod, response_mod, params = self.router.route(request)
-            if not handler:
-                return Response("404 Not Found", status=404)
-            for mod in request_mod:
-                request = mod(request)
-            response = handler(request, **params)
-            for mod in response_mod:
-                response = mod(response)
-            if type(response) == Response:
-                return response
-            elif type(response) == tuple:
-                if len(response) == 2 and type(response[0]) in [dict, list] and type(response[1]) == int:
-                    return Response(json.dumps(response[0]), status=response[1], content_type="application/json")
-                else:
-                    logger.critical("Invalid response format: %s" % response)
-                    return Response("500 Internal Server Error", status=500)
-            else:
-                return Response(response)            
+            return self.router.dispatch(request)
         except Exception as e:
             logger.critical("An error occurred while handling the request: %s" % traceback.format_exc())
             if self.debug:
                 return Response("500 Internal Server Error:\n\n%s" % traceback.format_exc(), status=500)
             return Response("500 Internal Server Error", status=500)
+
+class ASGIWorker(WSGIWorker):
+    """
+    Represents a worker that handles one ASGI HTTP request.
+
+    Coroutine handlers and modifiers are awaited on the event loop; synchronous ones are run in the executor.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+        receive (callable): The ASGI receive channel.
+        send (callable): The ASGI send channel.
+        router (Router): The router object responsible for handling client requests.
+        debug (bool): Whether to include tracebacks in error responses.
+        executor (ThreadPoolExecutor): The executor that runs synchronous handlers.
+    """
+    
+    def __init__(self, scope, receive, send, router, debug, executor):
+        super().__init__(None, router, debug)
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.executor = executor
+        
+    async def call(self, function, *args, **kwargs):
+        """
+        Awaits a coroutine function, or runs a synchronous function in the executor.
+        """
+        if asyncio.iscoroutinefunction(function):
+            return await function(*args, **kwargs)
+        result = await asyncio.get_running_loop().run_in_executor(self.executor, lambda: function(*args, **kwargs))
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+        
+    async def read_body(self):
+        """
+        Reads the request body from the receive channel.
+
+        Returns:
+            bytes: The body, or None if the client disconnected.
+        """
+        body = []
+        while True:
+            message = await self.receive()
+            if message["type"] == "http.disconnect":
+                return None
+            body.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                return b"".join(body)
+        
+    async def handle_request(self):
+        """
+        Reads, dispatches and answers the request.
+        """
+        logger = worker_logger(id(self))
+        body = await self.read_body()
+        if body is None:
+            return
+        request = self.request = Request.from_asgi(self.scope, body)
+        try:
+            logger.info("%s %s" % (request.method, request.path))
+            response = await self.router.adispatch(request, self.call)
+        except Exception as e:
+            logger.critical("An error occurred while handling the request: %s" % traceback.format_exc())
+            if self.debug:
+                response = Response("500 Internal Server Error:\n\n%s" % traceback.format_exc(), status=500)
+            else:
+                response = Response("500 Internal Server Error", status=500)
+        await self.send_response(response)
+        
+    async def send_response(self, response):
+        """
+        Sends a response through the send channel, streaming file and iterable bodies chunk by chunk.
+        """
+        loop = asyncio.get_running_loop()
+        response.chunked = False
+        response.recalculate()
+        hop_by_hop = ["connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailers", "transfer-encoding", "upgrade"]
+        await self.send({
+            "type": "http.response.start",
+            "status": int(str(response.status).split(" ")[0]),
+            "headers": [(str(key).lower().encode("latin-1"), str(value).encode("latin-1")) for key, value in response.headers.items() if key.lower() not in hop_by_hop],
+        })
+        if isinstance(response, FileResponse) and response.sendable:
+            with open(response.path, "rb") as f:
+                f.seek(response.offset)
+                remaining = response.count
+                while remaining > 0:
+                    data = await loop.run_in_executor(self.executor, f.read, min(remaining, 2 ** 16))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    await self.send({"type": "http.response.body", "body": data, "more_body": True})
+        elif hasattr(response.body, "__aiter__"):
+            async for data in response.body:
+                data = data.encode("utf-8") if type(data) == str else data
+                if data:
+                    await self.send({"type": "http.response.body", "body": data, "more_body": True})
+        elif response.streaming:
+            stream = response.iter_body()
+            try:
+                while (data := await loop.run_in_executor(self.executor, next, stream, None)) is not None:
+                    await self.send({"type": "http.response.body", "body": data, "more_body": True})
+            finally:
+                await loop.run_in_executor(self.executor, stream.close)
+        else:
+            await self.send({"type": "http.response.body", "body": next(response.iter_body()), "more_body": False})
+            return
+        await self.send({"type": "http.response.body", "body": b"", "more_body": False})
+
+class AsyncWorker:
+    """
+    Represents a worker that handles the requests of a client connection on an asyncio event loop.
+
+    Args:
+        reader (StreamReader): The stream to read the request from.
+        writer (StreamWriter): The stream to write the response to.
+        router (Router): The router object responsible for handling client requests.
+        debug (bool): Whether to include tracebacks in error responses.
+        executor (Executor): The executor the router and handlers run on.
+        read_timeout (float): The number of seconds the client has to send a complete request.
+        keep_alive_timeout (float): The number of seconds an idle connection is kept open for the next request.
+        max_requests (int): The maximum number of requests served on one connection.
+
+    Attributes:
+        reader (StreamReader): The stream to read the request from.
+        writer (StreamWriter): The stream to write the response to.
+        router (Router): The router object responsible for handling client requests.
+        executor (Executor): The executor the router and handlers run on.
+
+    """
+
+    def __init__(self, reader, writer, router, debug, executor, read_timeout=10, keep_alive_timeout=5, max_requests=100):
+        self.start_time = time.time()
+        self.reader = reader
+        self.writer = writer
+        self.router = router
+        self.debug = debug
+        self.executor = executor
+        self.read_timeout = read_timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_requests = max_requests
+        self.parser = RequestParser()
+        
+    async def receive(self):
+        """
+        Receives one request from the client within the read timeout.
+
+        Returns:
+            Request: The request, or None if the client closed the connection before completing one.
+
+        Raises:
+            TimeoutError: If the request is not complete within read_timeout seconds.
+            ValueError: If the request is malformed.
+        """
+        return await asyncio.wait_for(self.read_request(), self.read_timeout)
+        
+    async def read_request(self):
+        """
+        Feeds the parser until it has a complete request.
+        """
+        request = self.parser.next()
+        while request is None:
+            data = await self.reader.read(2 ** 16)
+            if not data:
+                return None
+            self.parser.feed(data)
+            request = self.parser.next()
+        return request
+        
+    async def wait(self, timeout):
+        """
+        Waits for the client to start its next request.
+
+        Returns:
+            bool: True if request bytes are (or became) available within the timeout.
+        """
+        if self.parser.buffer:
+            return True
+        try:
+            data = await asyncio.wait_for(self.reader.read(2 ** 16), timeout)
+        except TimeoutError:
+            return False
+        self.parser.feed(data)
+        return len(data) > 0
+        
+    async def serve(self):
+        """
+        Handles requests on the connection, in order, until it is no longer kept alive.
+        """
+        try:
+            served = 1
+            while await self.handle_request(keep_alive=served < self.max_requests):
+                served += 1
+                if not await self.wait(self.keep_alive_timeout):
+                    break
+        finally:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+        
+    async def handle_request(self, keep_alive=False):
+        """
+        Handles the next client request.
+
+        Args:
+            keep_alive (bool): Whether the connection may be kept open after this request.
+
+        Returns:
+            bool: True if the connection was kept open for another request.
+        """
+        logger = worker_logger(id(self))
+        head = False
+        try:
+            request = await self.receive()
+            if request is None:
+                return False
+            head = request.method == "HEAD"
+            keep_alive = keep_alive and request.keep_alive
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self.executor, WSGIWorker(request, self.router, self.debug).handle_request)
+            keep_alive = response.frame(request.version) and keep_alive
+        except TimeoutError:
+            logger.warning("Client did not send a complete request in time.")
+            response, keep_alive = Response("408 Request Timeout", status="408 Request Timeout"), False
+        except ValueError:
+            logger.warning("Malformed request: %s" % traceback.format_exc())
+            response, keep_alive = Response("400 Bad Request", status="400 Bad Request"), False
+        except Exception as e:
+            logger.critical("An error occurred while handling the request: %s" % traceback.format_exc())
+            if self.debug:
+                response = Response("500 Internal Server Error:\n\n%s" % traceback.format_exc(), status=500)
+            else:
+                response = Response("500 Internal Server Error", status=500)
+            keep_alive = False
+        response.headers["Connection"] = "keep-alive" if keep_alive else "close"
+        try:
+            await self.send_response(response, head)
+        except (ConnectionError, ssl.SSLError):
+            return False
+        except Exception:
+            logger.critical("An error occurred while streaming the response: %s" % traceback.format_exc())
+            return False
+        return keep_alive
+    
+    async def send_response(self, response, head=False):
+        """
+        Sends a response to the client, transmitting file bodies with the event loop's sendfile and
+        streamed bodies chunk by chunk. Chunks are produced in the executor so a slow generator does
+        not block the event loop. Only the status line and headers are sent in answer to a HEAD request.
+        """
+        loop = asyncio.get_running_loop()
+        if head:
+            self.writer.write(response.build_head())
+            await self.writer.drain()
+            await loop.run_in_executor(self.executor, response.close)
+        elif isinstance(response, FileResponse) and response.sendable:
+            self.writer.write(response.build_head())
+            await self.writer.drain()
+            with open(response.path, "rb") as f:
+                await loop.sendfile(self.writer.transport, f, response.offset, response.count)
+        elif response.streaming:
+            stream = response.build_stream()
+            try:
+                while (data := await loop.run_in_executor(self.executor, next, stream, None)) is not None:
+                    self.writer.write(data)
+                    await self.writer.drain()
+            finally:
+                await loop.run_in_executor(self.executor, stream.close)
+        else:
+            self.writer.write(response.build())
+            await self.writer.drain()
                 
 if __name__ == "__main__":
     server = Server(5, 1024, None)
@@ -1,46 +1,382 @@
+from collections.abc import MutableMapping
+from functools import cached_property
+from urllib.parse import parse_qsl
+
+class Headers(MutableMapping):
+    """
+    A case-insensitive mapping of header names to values.
+
+    Names keep the case they were first given in. Repeated headers are joined with ", " (or "; " for Cookie).
+
+    Args:
+        items: A mapping or an iterable of (name, value) pairs. bytes names and values are decoded as latin-1.
+    """
+    def __init__(self, items=()):
+        self._store = {}
+        for name, value in (items.items() if hasattr(items, "items") else items):
+            self.add(name, value)
+
+    @classmethod
+    def from_lines(cls, lines):
+        """
+        Parses header lines.
+
+        Args:
+            lines (list): The header lines, decoded as latin-1, without their line endings.
+
+        Returns:
+            Headers: The headers.
+
+        Raises:
+            ValueError: If a line is not a header.
+        """
+        headers = cls.__new__(cls)
+        store = headers._store = {}
+        for line in lines:
+            name, separator, value = line.partition(":")
+            key = name.lower()
+            if key in store or not separator:
+                if not separator:
+                    raise ValueError("Malformed header line: %r" % line)
+                headers.add(name, value.strip())
+            else:
+                store[key] = (name, value.strip())
+        return headers
+
+    def add(self, name, value):
+        """
+        Adds a header, joining the value to any existing value of the same header.
+        """
+        name = name.decode("latin-1") if type(name) == bytes else name
+        value = value.decode("latin-1") if type(value) == bytes else value
+        key = name.lower()
+        if key in self._store:
+            self._store[key] = (self._store[key][0], "%s%s%s" % (self._store[key][1], "; " if key == "cookie" else ", ", value))
+        else:
+            self._store[key] = (name, value)
+
+    def __getitem__(self, name):
+        return self._store[name.lower()][1]
+
+    def __setitem__(self, name, value):
+        self._store[name.lower()] = (name, value)
+
+    def __delitem__(self, name):
+        del self._store[name.lower()]
+
+    def __contains__(self, name):
+        return type(name) == str and name.lower() in self._store
+
+    def __iter__(self):
+        return (name for name, _ in self._store.values())
+
+    def __len__(self):
+        return len(self._store)
+
+    def __repr__(self):
+        return "Headers(%r)" % dict(self.items())
+
+    def copy(self):
+        return Headers(self.items())
+
 class Request:
     """
     A class for handling requests.
+
+    The request line and headers are parsed from bytes when the request is created; the query string,
+    cookies, form and `data` are decoded on first access.
+
+    Attributes:
+        method (str): The request method.
+        path (str): The request path, without the query string, normalised to start and end with "/".
+        query (str): The raw query string.
+        version (str): The HTTP version, e.g. "HTTP/1.1".
+        headers (Headers): The request headers.
+        stream: A file-like object the body is lazily read from (e.g. `wsgi.input`), or None.
+        content_length (int): The number of bytes to read from the stream, or None to read it to EOF.
     """
     def __init__(self, request_data):
-        self.method = None
-        self.path = None
-        self.version = None
-        self.headers = {}
-        self.body = None
-        self.parse(request_data)
-        
-    def parse(self, request_data):
-        """
-        Parses the request data.
-        """
-        if type(request_data) == bytes:
-            request_data = request_data.decode("utf-8")
-        lines = request_data.split("\r\n")
+        if type(request_data) == str:
+            request_data = request_data.encode("utf-8")
+        elif type(request_data) != bytes:
+            request_data = bytes(request_data)
+        head_end = request_data.find(b"\r\n\r\n")
+        if head_end < 0:
+            head, body = request_data, b""
+        else:
+            head, body = request_data[:head_end], request_data[head_end + 4:]
+        self.parse(head)
+        self.stream = None
+        self.content_length = len(body)
+        self.body = body
+
+    def parse(self, head):
+        """
+        Parses the request line and headers.
+
+        Args:
+            head (bytes): The request head, without the blank line that ends it.
+
+        Raises:
+            ValueError: If the request line or a header is malformed.
+        """
+        lines = head.decode("latin-1").split("\r\n")
         request_line = lines[0].split(" ")
-        self.method = request_line[0]
-        self.path = request_line[1].split("?")[0]
-        if not self.path.endswith("/"):
-            self.path += "/"
-        if not self.path.startswith("/"):
-            self.path = "/" + self.path
-        self.version = request_line[2]
-        for line in lines[1:]:
-            if not line:
-                break
-            header = line.split(": ")
-            self.headers[header[0]] = header[1]
-            
-        self.data = {
-            "GET": self.path.split("?")[1] if "?" in self.path else "",
-            "POST": "\r\n".join(lines[lines.index("") + 1:]),
-            "COOKIE": [{cookie.split("=")[0]: cookie.split("=")[1]} for cookie in self.headers["Cookie"].split("; ")] if "Cookie" in self.headers else {},
+        if len(request_line) != 3:
+            raise ValueError("Malformed request line: %r" % lines[0])
+        self.method, target, self.version = request_line
+        path, _, self.query = target.partition("?")
+        self.set_path(path)
+        self.headers = Headers.from_lines(lines[1:])
+
+    def set_path(self, path):
+        """
+        Sets the path, normalised to start and end with "/".
+        """
+        if not path.endswith("/"):
+            path += "/"
+        if not path.startswith("/"):
+            path = "/" + path
+        self.path = path
+
+    @classmethod
+    def from_environ(cls, environ):
+        """
+        Creates a request from a WSGI environ without reserialising it. The body is read from
+        `wsgi.input` only when `body` or `data` is first accessed.
+
+        Args:
+            environ (dict): The WSGI environ.
+
+        Returns:
+            Request: The request.
+        """
+        request = cls.__new__(cls)
+        request.method = environ["REQUEST_METHOD"]
+        request.set_path(environ.get("PATH_INFO") or "/")
+        request.version = environ.get("SERVER_PROTOCOL", "HTTP/1.1")
+        request.query = environ.get("QUERY_STRING", "")
+        request.headers = Headers((key[5:].replace("_", "-").title(), value) for key, value in environ.items() if key.startswith("HTTP_"))
+        if environ.get("CONTENT_TYPE"):
+            request.headers["Content-Type"] = environ["CONTENT_TYPE"]
+        if environ.get("CONTENT_LENGTH"):
+            request.headers["Content-Length"] = environ["CONTENT_LENGTH"]
+            request.content_length = int(environ["CONTENT_LENGTH"])
+        else:
+            request.content_length = None if environ.get("wsgi.input_terminated") else 0
+        request.stream = environ.get("wsgi.input")
+        request._body = None
+        return request
+
+    @classmethod
+    def from_asgi(cls, scope, body=b""):
+        """
+        Creates a request from an ASGI HTTP connection scope without reserialising it.
+
+        Args:
+            scope (dict): The ASGI connection scope.
+            body (bytes): The request body read from the receive channel.
+
+        Returns:
+            Request: The request.
+        """
+        request = cls.__new__(cls)
+        request.method = scope["method"]
+        request.set_path(scope["path"])
+        request.version = "HTTP/%s" % scope.get("http_version", "1.1")
+        request.query = scope.get("query_string", b"").decode("latin-1")
+        request.headers = Headers(scope.get("headers", []))
+        request.stream = None
+        request.content_length = len(body)
+        request.body = body
+        return request
+
+    @property
+    def body(self):
+        """
+        The request body, read from the stream on first access.
+        """
+        if self._body is None and self.stream is not None:
+            self._body = self.stream.read(self.content_length) if self.content_length != 0 else b""
+        return self._body
+
+    @body.setter
+    def body(self, value):
+        self._body = value
+
+    @cached_property
+    def args(self):
+        """
+        The decoded query string parameters. A repeated parameter keeps its last value.
+        """
+        return dict(parse_qsl(self.query, keep_blank_values=True))
+
+    @cached_property
+    def cookies(self):
+        """
+        The cookies sent with the request.
+        """
+        cookies = {}
+        for cookie in self.headers.get("Cookie", "").split(";"):
+            name, separator, value = cookie.partition("=")
+            if separator:
+                value = value.strip()
+                cookies[name.strip()] = value[1:-1] if len(value) > 1 and value[0] == value[-1] == '"' else value
+        return cookies
+
+    @cached_property
+    def form(self):
+        """
+        The decoded fields of an application/x-www-form-urlencoded body, or an empty dict for other bodies.
+        """
+        if not self.headers.get("Content-Type", "").lower().startswith("application/x-www-form-urlencoded"):
+            return {}
+        return dict(parse_qsl((self.body or b"").decode("utf-8"), keep_blank_values=True))
+
+    @cached_property
+    def data(self):
+        """
+        The raw query string ("GET"), the body as text ("POST") and the cookies ("COOKIE") of the request.
+        """
+        body = self.body or b""
+        return {
+            "GET": self.query,
+            "POST": body.decode("utf-8") if type(body) == bytes else body,
+            "COOKIE": self.cookies,
         }
 
+    @property
+    def keep_alive(self):
+        """
+        Whether the client asked for the connection to stay open after this request.
+        """
+        connection = self.headers.get("Connection", "").lower()
+        if self.version == "HTTP/1.1":
+            return "close" not in connection
+        return "keep-alive" in connection
+
+class RequestParser:
+    """
+    An incremental parser for a stream of HTTP/1.x requests.
+
+    Bytes are fed as they arrive from the client and a Request is returned as soon as one is complete.
+    Parsing resumes where it stopped, so partial input is never scanned twice, and bytes past the end of
+    a request (e.g. pipelined requests) are kept for the next one. Chunked bodies are decoded and the
+    request is given the Content-Length of the decoded body.
+
+    Args:
+        max_head_size (int): The maximum size of a request line and headers.
+
+    Attributes:
+        buffer (bytearray): The bytes received but not yet consumed as a request.
+    """
+    HEAD, BODY, CHUNK_SIZE, CHUNK_DATA, TRAILERS = range(5)
+
+    def __init__(self, max_head_size=2 ** 16):
+        self.max_head_size = max_head_size
+        self.buffer = bytearray()
+        self.reset()
+
+    def reset(self):
+        """
+        Discards the state of the request being parsed.
+        """
+        self.state = self.HEAD
+        self.position = 0
+        self.scanned = 0
+        self.request = None
+        self.remaining = 0
+        self.chunks = []
+
+    def feed(self, data):
+        """
+        Appends received bytes to the buffer.
+        """
+        self.buffer += data
+
+    def find_line(self, delimiter=b"\r\n"):
+        """
+        Returns the index of the delimiter at or after the current position, or -1, remembering how far was scanned.
+        """
+        index = self.buffer.find(delimiter, max(self.position, self.scanned))
+        self.scanned = len(self.buffer) - len(delimiter) + 1 if index < 0 else 0
+        return index
+
+    def next(self):
+        """
+        Parses as much of the buffer as possible.
+
+        Returns:
+            Request: The next complete request, or None if more bytes are needed.
+
+        Raises:
+            ValueError: If the request is malformed.
+        """
+        while True:
+            if self.state == self.HEAD:
+                index = self.find_line(b"\r\n\r\n")
+                if index < 0:
+                    if len(self.buffer) > self.max_head_size:
+                        raise ValueError("Request head too large")
+                    return None
+                request = self.request = Request.__new__(Request)
+                request.parse(bytes(self.buffer[:index]))
+                request.stream = None
+                self.position = index + 4
+                if "chunked" in request.headers.get("Transfer-Encoding", "").lower():
+                    self.state = self.CHUNK_SIZE
+                else:
+                    length = str(request.headers.get("Content-Length", "0")).strip()
+                    if not (length.isascii() and length.isdigit()):
+                        raise ValueError("Malformed Content-Length: %r" % request.headers["Content-Length"])
+                    self.remaining = int(length)
+                    self.state = self.BODY
+            elif self.state == self.BODY:
+                if len(self.buffer) - self.position < self.remaining:
+                    return None
+                return self.complete(bytes(self.buffer[self.position:self.position + self.remaining]), self.position + self.remaining)
+            elif self.state == self.CHUNK_SIZE:
+                index = self.find_line()
+                if index < 0:
+                    return None
+                size = bytes(self.buffer[self.position:index].split(b";")[0].strip())
+                if not size or size.strip(b"0123456789abcdefABCDEF"):
+                    raise ValueError("Malformed chunk size: %r" % bytes(self.buffer[self.position:index]))
+                self.remaining = int(size, 16)
+                self.position = index + 2
+                self.state = self.CHUNK_DATA if self.remaining else self.TRAILERS
+            elif self.state == self.CHUNK_DATA:
+                if len(self.buffer) - self.position < self.remaining + 2:
+                    return None
+                self.chunks.append(bytes(self.buffer[self.position:self.position + self.remaining]))
+                self.position += self.remaining + 2
+                self.state = self.CHUNK_SIZE
+            elif self.state == self.TRAILERS:
+                index = self.find_line()
+                if index < 0:
+                    return None
+                if index == self.position:
+                    body = b"".join(self.chunks)
+                    del self.request.headers["Transfer-Encoding"]
+                    self.request.headers["Content-Length"] = str(len(body))
+                    return self.complete(body, index + 2)
+                self.position = index + 2
+
+    def complete(self, body, end):
+        """
+        Finishes the current request with its body and consumes it from the buffer.
+        """
+        request = self.request
+        request.content_length = len(body)
+        request.body = body
+        del self.buffer[:end]
+        self.reset()
+        return request
+
 if __name__ == "__main__":
     request = Request(b"GET / HTTP/1.1\r\nHost: localhost:8080\r\nUser-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:86.0) Gecko/20100101 Firefox/86.0\r\nAccept: text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8\r\nAccept-Language: en-US,en;q=0.5\r\nAccept-Encoding: gzip, deflate\r\nConnection: keep-alive\r\nUpgrade-Insecure-Requests: 1\r\n\r\n")
     print(request.method)
     print(request.path)
     print(request.version)
     print(request.headers)
-    print(request.body)
\ No newline at end of file
+    print(request.body)
@@ -1,16 +1,22 @@
+import os, mmap, json
+
 class Response:
     """
     A class for handling responses.
+
+    The body may be a str or bytes, or an iterable (e.g. a generator) of str/bytes chunks which is
+    streamed to the client as it is produced. Streamed bodies without an explicit Content-Length
+    header are sent with chunked transfer-encoding.
     """
     def __init__(self, body, status="200 OK", content_type="text/html", cookies={}, headers={}):
         self.body = body
+        self.chunked = True
         self.version = "HTTP/1.1"
         self.status = status
         self.content_type = content_type
         self._cookies = cookies
         self.headers = {
             "Content-Type": self.content_type,
-            "Connection": "close",
             "Set-Cookie": "; ".join(["%s=%s" % (cookiename, cookievalue) for cookiename, cookievalue in self._cookies.items()])
         }
         self.headers.update(headers)
@@ -19,22 +25,185 @@ class Response:
         self.headers["Content-Length"] = len(self.body)
         return "%s %s\n%s\n\n%s" % (self.version, self.status, "\n".join(["%s: %s" % (header, self.headers[header]) for header in self.headers]), self.body)
     
+    @property
+    def streaming(self):
+        """
+        Whether the body is an iterable of chunks rather than a single str or bytes. Asynchronous
+        iterables are only supported by the ASGI entry point.
+        """
+        return self.body is not None and not isinstance(self.body, (str, bytes, bytearray, memoryview, int)) and (hasattr(self.body, "__iter__") or hasattr(self.body, "__aiter__"))
+    
+    def frame(self, version):
+        """
+        Chooses how a streamed body is delimited for a client speaking the given HTTP version.
+
+        Returns:
+            bool: False if the body can only be delimited by closing the connection.
+        """
+        if self.streaming and "Content-Length" not in self.headers:
+            self.chunked = version == "HTTP/1.1"
+            return self.chunked
+        return True
+    
+    @property
+    def bodiless(self):
+        """
+        Whether the status is one that never has a body (1xx, 204 and 304), so that no Content-Length is sent.
+        """
+        code = str(self.status)[:3]
+        return code in ("204", "304") or code.startswith("1")
+    
     def recalculate(self):
         """
         Recalculates the headers.
         """
         self.headers["Set-Cookie"] = "; ".join(["%s=%s" % (cookiename, cookievalue) for cookiename, cookievalue in self._cookies.items()])
-        self.headers["Content-Length"] = len(self.body)
+        if self.bodiless:
+            self.headers.pop("Content-Length", None)
+        elif not self.streaming:
+            self.headers["Content-Length"] = len(str(self.body).encode("utf-8")) if type(self.body) in [str, int] else len(self.body)
+        elif "Content-Length" not in self.headers and self.chunked:
+            self.headers["Transfer-Encoding"] = "chunked"
+            
+    def iter_body(self):
+        """
+        Yields the body as bytes chunks, closing a streamed body once it is exhausted or abandoned.
+        """
+        if not self.streaming:
+            yield str(self.body).encode("utf-8") if type(self.body) in [str, int] else self.body
+            return
+        try:
+            for chunk in self.body:
+                chunk = chunk.encode("utf-8") if type(chunk) == str else chunk
+                if chunk:
+                    yield chunk
+        finally:
+            if hasattr(self.body, "close"):
+                self.body.close()
     
-    def build(self):
+    def close(self):
         """
-        Builds the response.
+        Closes a streamed body that will not be sent, e.g. in answer to a HEAD request.
+        """
+        if self.streaming and hasattr(self.body, "close"):
+            self.body.close()
+    
+    def build_head(self):
+        """
+        Builds the status line and headers of the response.
         """
         self.recalculate()
         status_line = ("%s %s" % (self.version, self.status)).encode("utf-8")
-        headers = b"\n".join([b"%s: %s" % (str(header).encode("utf-8") if type(header) in [str, int] else header, str(value).encode("utf-8") if type(value) in [str, int] else value) for header, value in self.headers.items()])
+        headers = b"\r\n".join([b"%s: %s" % (str(header).encode("utf-8") if type(header) in [str, int] else header, str(value).encode("utf-8") if type(value) in [str, int] else value) for header, value in self.headers.items()])
+        return b"%s\r\n%s\r\n\r\n" % (status_line, headers)
+    
+    def build(self):
+        """
+        Builds the response.
+        """
+        if self.streaming:
+            return b"".join(self.build_stream())
         body = str(self.body).encode("utf-8") if type(self.body) in [str, int] else self.body
-        return b"%s\r\n%s\r\n\r\n%s" % (status_line, headers, body)
+        return self.build_head() + body
+    
+    def build_stream(self):
+        """
+        Yields the response head followed by the (chunk-framed, if chunked) body chunks.
+        """
+        yield self.build_head()
+        if not self.streaming:
+            yield from self.iter_body()
+        elif "Transfer-Encoding" in self.headers:
+            for chunk in self.iter_body():
+                yield b"%x\r\n%s\r\n" % (len(chunk), chunk)
+            yield b"0\r\n\r\n"
+        else:
+            yield from self.iter_body()
+    
+class FileResponse(Response):
+    """
+    A response whose body is a (slice of a) file, sent by the server with sendfile so that it never passes through Python buffers.
+
+    Reading or assigning body falls back to an in-memory body, for response modifiers that need it.
+    """
+    def __init__(self, path, status="200 OK", content_type="application/octet-stream", cookies={}, headers={}, offset=0, count=None):
+        self.path = path
+        self.offset = offset
+        self.count = os.path.getsize(path) - offset if count is None else count
+        self._body = None
+        super().__init__(None, status, content_type, cookies, headers)
+        
+    @property
+    def body(self):
+        if self._body is None:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                self._body = f.read(self.count)
+        return self._body
+    
+    @body.setter
+    def body(self, value):
+        self._body = value
+        
+    def iter_body(self):
+        """
+        Yields the slice of the file in blocks read from a memory map, or the in-memory body once it
+        has been read or assigned.
+        """
+        if not self.sendable:
+            yield from super().iter_body()
+            return
+        if self.count <= 0:
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(self.offset, self.offset + self.count, 2 ** 16):
+                yield mapped[start:min(start + 2 ** 16, self.offset + self.count)]
+        
+    @property
+    def sendable(self):
+        """
+        Whether the body can still be sent straight from the file.
+        """
+        return self._body is None
+    
+    @property
+    def streaming(self):
+        """
+        Whether an assigned body is an iterable of chunks. The file itself is never read to find out.
+        """
+        return self._body is not None and Response.streaming.fget(self)
+        
+    def recalculate(self):
+        """
+        Recalculates the headers.
+        """
+        if self.sendable:
+            self.headers["Set-Cookie"] = "; ".join(["%s=%s" % (cookiename, cookievalue) for cookiename, cookievalue in self._cookies.items()])
+            self.headers["Content-Length"] = self.count
+        else:
+            super().recalculate()
+
+def to_response(result, logger=None):
+    """
+    Converts the value returned by a handler or middleware into a Response.
+
+    Args:
+        result: A Response, a (data, status) tuple to be sent as JSON, or a body.
+        logger (Logger): The logger for reporting invalid return values, or None.
+
+    Returns:
+        Response: The response.
+    """
+    if isinstance(result, Response):
+        return result
+    elif type(result) == tuple:
+        if len(result) == 2 and type(result[0]) in [dict, list] and type(result[1]) == int:
+            return Response(json.dumps(result[0]), status=result[1], content_type="application/json")
+        if logger is not None:
+            logger.critical("Invalid response format: %s" % (result,))
+        return Response("500 Internal Server Error", status=500)
+    else:
+        return Response(result)
 
 if __name__ == "__main__":
     response = Response(b"Hello, world!")
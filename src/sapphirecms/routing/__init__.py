@@ -1,13 +1,27 @@
-import logging, sys, os
-from sapphirecms.networking.response import Response
+import logging, sys, os, uuid, time, asyncio, threading, inspect, queue
+from sapphirecms.networking.response import Response, FileResponse, to_response
 from sapphirecms.networking.request import Request
 from sapphirecms.logs import LogFormatter
+from .assets import AssetManifest, build_assets, IMMUTABLE
+from .cache import LRUCache, HTTPCache, parse_cache_control
+from .coalesce import SingleFlight, coalesced
+from .compression import Compression, negotiate, add_vary
+from .converters import Converter, converters, register_converter
+from .pagecache import PageCache, cache_tags, cached, invalidate_tags
+from .static import StaticCache, StaticFile
+from .tree import PrefixIndex, RouteTree
+from .upstream import Upstream, UpstreamPool
 from typing import Callable
-import mimetypes
 
 import requests
+from requests.adapters import HTTPAdapter, Retry
+from urllib3.exceptions import ReadTimeoutError
 from urllib.parse import urlparse
 
+HOP_BY_HOP = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "proxy-connection", "te", "trailer", "trailers", "transfer-encoding", "upgrade"}
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS", "TRACE", "PUT", "DELETE"}
+CONDITIONAL = {"if-none-match", "if-modified-since", "if-match", "if-unmodified-since", "if-range"}
+
 class Router:
     """
     Represents a router that handles client requests.
@@ -15,23 +29,52 @@ class Router:
     Args:
         routes (list): A list of routes.
         logger (Logger): The logger object for logging router events.
+        cache_size (int): The number of resolved (method, path) pairs kept in the route cache. 0 disables it.
+        static_cache_size (int): The maximum total size in bytes of the static files kept in memory.
+        static_cache_control (str): The Cache-Control header sent with static files.
+        page_cache_size (int): The number of pages kept in the page cache of the routes added with a cache ttl.
+        static_gzip (bool): Whether compressible static files are sent from their prebuilt gzip sidecars to clients accepting gzip.
 
     Attributes:
         routes (list): A list of routes.
+        tree (RouteTree): The routes compiled into a segment trie for lookup.
+        cache (LRUCache): The route cache, mapping (method, path) to the resolved handler, modifiers and params.
+        parents (list): The routers this router is mounted on, whose caches it invalidates when it changes.
+        middleware (list): The middleware run around the requests handled by this router and its subrouters, in order.
+        pipelines (dict): The composed middleware pipelines, keyed by the chain of routers a request is routed through.
+        prefixes (PrefixIndex): The (rule, subrouter) pairs of subrouters and proxies mounted by path prefix, indexed by the prefix.
+        path_rules (set): The rules of the subrouters and proxies in the prefix index.
+        static_cache (StaticCache): The cache of the static files served by this router.
+        static_cache_control (str): The Cache-Control header sent with static files.
+        static_gzip (bool): Whether compressible static files are sent from their prebuilt gzip sidecars.
+        assets (AssetManifest): The manifest of the fingerprinted assets of the static directory.
+        page_cache (PageCache): The cache of the pages rendered by the routes added with a cache ttl.
         logger (Logger): The logger object for logging router events.
 
     """
 
-    def __init__(self, name: str = "MAIN", prefix: str = "", static_dir: str = "static", static_prefix: str = "/static", ctx: str = ""):
+    def __init__(self, name: str = "MAIN", prefix: str = "", static_dir: str = "static", static_prefix: str = "/static", ctx: str = "", cache_size: int = 1024, static_cache_size: int = 32 * 1024 * 1024, static_cache_control: str = "no-cache", page_cache_size: int = 1024, static_gzip: bool = True):
         self.routes = []
+        self.tree = RouteTree()
+        self.cache = LRUCache(cache_size)
+        self.parents = []
+        self.middleware = []
+        self.pipelines = {}
+        self.prefixes = PrefixIndex()
+        self.path_rules = set()
         self.subrouters = {}
         self.name = name
         self.prefix = prefix
         self.static_dir = static_dir
         self.static_prefix = prefix + static_prefix
+        self.static_cache = StaticCache(static_cache_size)
+        self.static_cache_control = static_cache_control
+        self.page_cache = PageCache(page_cache_size)
+        self.static_gzip = static_gzip
         
         if ctx != "":
             self.static_dir = os.path.join(os.path.dirname(sys.modules[ctx].__file__), self.static_dir)
+        self.assets = AssetManifest(os.path.join(self.static_dir, "manifest.json"))
         
         self.logger = logging.getLogger(f"Router<{self.name}>")
         self.logger.setLevel(logging.DEBUG)
@@ -40,26 +83,62 @@ class Router:
         self.logger.addHandler(stdout_handler)
         self.logger.addHandler(logging.FileHandler("logs/server.log"))
         
-    def add_route(self, path: str, methods: list = ["GET"], request_mod: list = [], response_mod: list = []):
+    def add_route(self, path: str, methods: list = ["GET"], request_mod: list = [], response_mod: list = [], coalesce: bool = False, vary: list = (), cache: float = None, vary_cookies: list = ()):
         """
         Adds a route to the router.
 
         Args:
             route (Route): The route to be added.
+            coalesce (bool): Whether concurrent identical GET and HEAD requests share one execution of the handler.
+            vary (list): The names of the request headers that make otherwise identical requests different.
+            cache (float): The number of seconds GET and HEAD responses of anonymous visitors are served from the page cache, or None.
+            vary_cookies (list): The names of the cookies that make otherwise identical requests different for the page cache.
 
         """
         def decorator(handler):
-            self.routes.append(Route(f'{self.prefix}{path}', methods, request_mod, response_mod, handler))
+            wrapped = cached(handler, cache, self.page_cache, vary, vary_cookies) if cache else handler
+            route = Route(f'{self.prefix}{path}', methods, request_mod, response_mod, coalesced(wrapped, vary) if coalesce else wrapped)
+            self.routes.append(route)
+            self.tree.insert(route)
+            self.invalidate()
             return handler
         return decorator
         
+    def use(self, middleware: Callable):
+        """
+        Adds a middleware to the router.
+
+        A middleware is called as middleware(request, call_next) and returns the response. It may
+        modify the request before passing it on with call_next(request), modify the response it
+        gets back, or return a response without calling call_next, e.g. for a cache hit or a 304,
+        in which case the route handler is not run. Middleware run in the order they were added,
+        inside the middleware of the routers this router is mounted on, for every request routed
+        to this router or to its subrouters and proxies, including requests no route matches.
+        Coroutine middleware are only supported by the ASGI entry point.
+
+        Args:
+            middleware (function): The middleware, a function or a coroutine function.
+
+        Returns:
+            function: The middleware, so that use can be applied as a decorator.
+
+        """
+        self.middleware.append(middleware)
+        self.invalidate()
+        return middleware
+        
     def add_subrouter(self, subrouter, rule: Callable = None):
         """
         Adds a subrouter to the router.
 
+        Without a rule, the subrouter receives the requests whose path starts with its prefix; when
+        several prefixes match, the longest wins. Subrouters with a custom rule are only tried, in
+        the order they were added, for requests no prefix matches.
+
         Args:
             path (str): The path of the subrouter.
             subrouter (Router): The subrouter to be added.
+            rule (function): A custom rule deciding, from the request, whether the subrouter handles it.
 
         """
         if not isinstance(subrouter, Router):
@@ -70,10 +149,14 @@ class Router:
                 rule = lambda request: request.path.startswith(subrouter.prefix)
             else:
                 rule = lambda request: True
+            self.path_rules.add(rule)
+            self.prefixes.insert(subrouter.prefix, (rule, subrouter))
         if not callable(rule):
             raise Exception("Rule must be a callable function")
         
         self.subrouters[rule] = subrouter
+        subrouter.parents.append(self)
+        self.invalidate()
         self.logger.info("Added subrouter<%s> to router<%s>" % (subrouter.name, self.name))
         
     def add_proxy(self, proxy):
@@ -87,79 +170,419 @@ class Router:
         if not isinstance(proxy, ProxyRouter):
             raise Exception("Proxy must be of type ProxyRouter")
         rule = lambda request: request.path.startswith(f'{self.prefix}{proxy.internal_path}')
+        self.path_rules.add(rule)
+        self.prefixes.insert(f'{self.prefix}{proxy.internal_path}', (rule, proxy))
         self.subrouters[rule] = proxy
+        proxy.parents.append(self)
+        self.invalidate()
         self.logger.info("Added proxy<%s> to router<%s>" % (f'{self.prefix}{proxy.internal_path}', self.name))
     
     def route(self, request: Request, parent_prefix: str = ""):
         """
         Routes a request to the appropriate handler.
 
+        Resolutions that depend only on the method and path are kept in the route cache.
+
+        Args:
+            request (Request): The request object to be routed.
+
+        Returns:
+            tuple: The handler, request modifiers, response modifiers and params, or (None, [], [], {}).
+
+        """
+        return self.locate(request, parent_prefix)[0]
+    
+    def locate(self, request: Request, parent_prefix: str = ""):
+        """
+        Routes a request like route, also returning the routers the request is routed through.
+
+        Returns:
+            tuple: The resolution as returned by route, and the chain of routers from this one to the
+                one owning the handler.
+
+        """
+        key = (request.method, request.path, parent_prefix)
+        located = self.cache.get(key)
+        if located is not None:
+            return located
+        resolved, cacheable, chain = self.resolve(request, parent_prefix)
+        located = (resolved, chain)
+        if cacheable and resolved[0] is not None:
+            self.cache.put(key, located)
+        return located
+    
+    def resolve(self, request: Request, parent_prefix: str = ""):
+        """
+        Resolves a request to its handler without consulting the route cache.
+
         Args:
             request (Request): The request object to be routed.
 
+        Returns:
+            tuple: The resolution as returned by route, whether it depends only on the method and
+                path, and the chain of routers the request is routed through.
+
         """
-        for route in self.routes:
-            if route.matches(request, parent_prefix):
-                self.logger.info("Found matching route")
-                return route.handler, route.request_mod, route.response_mod, route.extract_params(request)
+        route, params = self.tree.lookup(request.method, request.path)
+        if route is not None:
+            self.logger.info("Found matching route")
+            return (route.handler, route.request_mod, route.response_mod, params), True, (self,)
+        mounted = self.prefixes.longest(request.path)
+        if mounted is not None:
+            self.logger.info("Routing request to subrouter<%s>" % mounted[1].name)
+            resolved, cacheable, chain = mounted[1].resolve(request, f'{parent_prefix}{mounted[1].prefix}')
+            return resolved, cacheable, (self,) + chain
         for rule, subrouter in self.subrouters.items():
-            if rule(request):
+            if rule not in self.path_rules and rule(request):
                 self.logger.info("Routing request to subrouter<%s>" % subrouter.name)
-                return subrouter.route(request, f'{parent_prefix}{subrouter.prefix}')
+                resolved, _, chain = subrouter.resolve(request, f'{parent_prefix}{subrouter.prefix}')
+                return resolved, False, (self,) + chain
         if request.path.startswith(self.static_prefix):
             self.logger.info("Routing request to static handler")
             path = request.path[len(self.static_prefix):]
             if path.startswith("/"):
                 path = path[1:]
-            return self.static_handler, [], [], {"path": path}
-        return None, [], [], {}
+            return (self.static_handler, [], [], {"path": path}), True, (self,)
+        return (None, [], [], {}), True, (self,)
+    
+    def dispatch(self, request: Request):
+        """
+        Handles a request: routes it, then runs it through the middleware of the routers it is
+        routed through and the route's modifiers and handler.
+
+        The pipeline of each chain of routers is composed on its first request and reused. The
+        resolution is passed down the pipeline with the request, as the method and path it was made for.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            Response: The response, 404 Not Found if no route matches.
+
+        """
+        resolved, chain = self.locate(request)
+        pipeline = self.pipelines.get(chain)
+        if pipeline is None:
+            pipeline = self.pipelines[chain] = self.compose(chain)
+        return pipeline(request, (resolved, request.method, request.path))
+    
+    async def adispatch(self, request: Request, call: Callable):
+        """
+        Handles a request like dispatch, on an event loop. Coroutine middleware, modifiers and
+        handlers are awaited; the others are run with call.
+
+        Args:
+            request (Request): The request.
+            call (function): Awaits a coroutine function, or runs a synchronous function off the
+                event loop, and returns its result.
+
+        Returns:
+            Response: The response, 404 Not Found if no route matches.
+
+        """
+        resolved, chain = self.locate(request)
+        pipeline = self.pipelines.get(("async",) + chain)
+        if pipeline is None:
+            pipeline = self.pipelines[("async",) + chain] = self.acompose(chain)
+        return await pipeline(request, (resolved, request.method, request.path), call)
+    
+    def compose(self, chain: tuple):
+        """
+        Composes the middleware of a chain of routers, outermost first, around the endpoint. The
+        pipeline is called with a request and its resolution, which each layer hands on to the next.
+        """
+        handle = self.endpoint
+        for middleware in reversed([middleware for router in chain for middleware in router.middleware]):
+            handle = self.layer(middleware, handle)
+        return handle
+    
+    def layer(self, middleware: Callable, call_next: Callable):
+        def handle(request, resolved):
+            return to_response(middleware(request, lambda request: call_next(request, resolved)), self.logger)
+        return handle
+    
+    def target(self, request: Request, resolved: tuple):
+        """
+        Returns the resolution of a request for the endpoint: the one made by dispatch, unless a
+        middleware has since changed the method or path (with request.set_path), in which case the
+        request is routed again. The middleware that run are still those of the original route.
+
+        Args:
+            request (Request): The request.
+            resolved (tuple): The resolution made by dispatch, and the method and path it was made for.
+
+        """
+        resolution, method, path = resolved
+        if request.method != method or request.path != path:
+            return self.route(request)
+        return resolution
+    
+    def endpoint(self, request: Request, resolved: tuple):
+        """
+        Runs the request modifiers, handler and response modifiers of the route a request was routed to.
+        """
+        handler, request_mod, response_mod, params = self.target(request, resolved)
+        if not handler:
+            return Response("404 Not Found", status=404)
+        for mod in request_mod:
+            request = mod(request)
+        response = handler(request, **params)
+        for mod in response_mod:
+            response = mod(response)
+        return to_response(response, self.logger)
+    
+    def acompose(self, chain: tuple):
+        """
+        Composes the middleware of a chain of routers like compose, for adispatch.
+        """
+        handle = self.aendpoint
+        for middleware in reversed([middleware for router in chain for middleware in router.middleware]):
+            handle = self.alayer(middleware, handle)
+        return handle
+    
+    def alayer(self, middleware: Callable, call_next: Callable):
+        if asyncio.iscoroutinefunction(middleware):
+            async def handle(request, resolved, call):
+                return to_response(await middleware(request, lambda request: call_next(request, resolved, call)), self.logger)
+        else:
+            async def handle(request, resolved, call):
+                loop = asyncio.get_running_loop()
+                return to_response(await call(middleware, request, lambda request: self.forward(call_next, request, resolved, loop)), self.logger)
+        return handle
+    
+    def forward(self, call_next: Callable, request: Request, resolved: tuple, loop: asyncio.AbstractEventLoop):
+        """
+        Runs the rest of an asynchronous pipeline for a synchronous middleware, from the thread the
+        middleware runs in.
+
+        The coroutines of the pipeline run on the event loop, while the synchronous middleware,
+        modifiers and handlers it calls are sent back to this thread, which would otherwise only wait.
+        A synchronous middleware thus never needs a second thread of the executor, which could all
+        be taken by requests waiting the same way.
+
+        Returns:
+            Response: The response of the rest of the pipeline.
+
+        """
+        tasks = queue.SimpleQueue()
+        async def call(function, *args, **kwargs):
+            if asyncio.iscoroutinefunction(function):
+                return await function(*args, **kwargs)
+            future = loop.create_future()
+            tasks.put((future, function, args, kwargs))
+            result = await future
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        done = asyncio.run_coroutine_threadsafe(call_next(request, resolved, call), loop)
+        done.add_done_callback(lambda _: tasks.put(None))
+        while (task := tasks.get()) is not None:
+            future, function, args, kwargs = task
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                loop.call_soon_threadsafe(lambda future=future, e=e: future.done() or future.set_exception(e))
+            else:
+                loop.call_soon_threadsafe(lambda future=future, result=result: future.done() or future.set_result(result))
+        return done.result()
+    
+    async def aendpoint(self, request: Request, resolved: tuple, call: Callable):
+        """
+        Runs the request modifiers, handler and response modifiers of the route a request was routed
+        to, awaiting the coroutine ones and running the others with call.
+        """
+        handler, request_mod, response_mod, params = self.target(request, resolved)
+        if not handler:
+            return Response("404 Not Found", status=404)
+        for mod in request_mod:
+            request = await call(mod, request)
+        response = await call(handler, request, **params)
+        for mod in response_mod:
+            response = await call(mod, response)
+        return to_response(response, self.logger)
+    
+    def invalidate(self):
+        """
+        Clears the route cache and the middleware pipelines of this router and of the routers it is mounted on.
+        """
+        self.cache.clear()
+        self.pipelines.clear()
+        for parent in self.parents:
+            parent.invalidate()
+    
+    def cache_info(self):
+        """
+        Returns the route cache statistics.
+
+        Returns:
+            dict: The hits, misses, current size and maximum size of the route cache.
+
+        """
+        return self.cache.info()
+    
+    def build_assets(self, bundles: dict = None, minify: bool = False, gzip: bool = False):
+        """
+        Fingerprints the assets of the static directory and writes its manifest.
+
+        Args:
+            bundles (dict): Maps the logical name of each bundle to the names of its parts.
+            minify (bool): Whether to minify the CSS and JavaScript files and bundles.
+            gzip (bool): Whether to write the gzip sidecars of the compressible files.
+
+        Returns:
+            dict: The manifest.
+
+        """
+        return build_assets(self.static_dir, bundles, minify, gzip=gzip)
+    
+    def asset_url(self, name: str):
+        """
+        Returns the URL of a static asset, fingerprinted if the asset is in the manifest.
+
+        Args:
+            name (str): The logical name of the asset, relative to the static directory, e.g. "css/site.css".
+
+        Returns:
+            str: The URL, e.g. "/static/css/site.3f2a9c1b0d4e.css".
+
+        """
+        return f"{self.static_prefix}/{self.assets.resolve(name)}"
     
     def static_handler(self, request: Request, path: str):
         """
         Handles static file requests.
 
+        Small files are served from the static cache and large ones from disk. Responses carry
+        ETag, Last-Modified and Cache-Control headers, and conditional requests for an unchanged
+        file are answered with 304 Not Modified. Range requests are answered with 206 Partial
+        Content: a single range as a slice of the file, several as a multipart/byteranges body read
+        from a memory map of the file. Clients accepting gzip are sent the gzip sidecar of
+        compressible files, when one was built (build_assets with gzip) and is newer than the
+        file; range requests are always served from the file itself. Fingerprinted assets are sent with an immutable
+        Cache-Control header.
+
         Args:
             path (str): The path of the static file.
 
         Returns:
-            Response: The response object containing the static file.
+            Response: The response object sending the static file.
 
         """
-        try:
-            print(f"{self.static_dir}/{path}"[:-1])
-            local_path = f"{self.static_dir}/{path}"[:-1].replace("/", os.sep)
-            with open(local_path, "rb") as f:
-                if "." in local_path:
-                    content_type = mimetypes.MimeTypes().guess_type(local_path)
-                    return Response(f.read(), content_type=content_type[0])
-                return Response(f.read())
-        except:
+        if ".." in path.split("/"):
+            return Response("404 Not Found", status=404)
+        local_path = f"{self.static_dir}/{path}"[:-1].replace("/", os.sep)
+        entry = self.static_cache.lookup(local_path)
+        if entry is None:
             return Response("404 Not Found", status=404)
+        cache_control = IMMUTABLE if self.assets.immutable(path.rstrip("/")) else self.static_cache_control
+        headers = {"ETag": entry.etag, "Last-Modified": entry.last_modified, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+        if self.static_gzip and "Range" not in request.headers:
+            sidecar = self.static_cache.gzipped(entry)
+            if sidecar is not None:
+                add_vary(headers)
+                if negotiate(request.headers.get("Accept-Encoding"), ("gzip",)):
+                    headers.update({"ETag": sidecar.etag, "Last-Modified": sidecar.last_modified, "Content-Encoding": "gzip"})
+                    del headers["Accept-Ranges"]
+                    if sidecar.not_modified(request):
+                        return Response(b"", status="304 Not Modified", content_type=entry.content_type, headers=headers)
+                    if sidecar.body is None:
+                        return FileResponse(sidecar.path, content_type=entry.content_type, headers=headers)
+                    return Response(sidecar.body, content_type=entry.content_type, headers=headers)
+        if entry.not_modified(request):
+            return Response(b"", status="304 Not Modified", content_type=entry.content_type, headers=headers)
+        ranges = entry.ranges(request)
+        if ranges == []:
+            headers["Content-Range"] = "bytes */%d" % entry.size
+            return Response(b"", status="416 Range Not Satisfiable", content_type=entry.content_type, headers=headers)
+        if ranges and len(ranges) == 1:
+            (first, last), = ranges
+            headers["Content-Range"] = "bytes %d-%d/%d" % (first, last, entry.size)
+            if entry.body is None:
+                return FileResponse(local_path, status="206 Partial Content", content_type=entry.content_type, headers=headers, offset=first, count=last + 1 - first)
+            return Response(entry.body[first:last + 1], status="206 Partial Content", content_type=entry.content_type, headers=headers)
+        if ranges:
+            boundary = uuid.uuid4().hex
+            headers["Content-Length"], body = entry.byteranges(ranges, boundary)
+            return Response(body, status="206 Partial Content", content_type="multipart/byteranges; boundary=%s" % boundary, headers=headers)
+        if entry.body is None:
+            return FileResponse(local_path, content_type=entry.content_type, headers=headers)
+        return Response(entry.body, content_type=entry.content_type, headers=headers)
         
 class ProxyRouter(Router):
     """
     Represents a router that proxies requests to an external server.
+
+    Upstream connections are kept alive in a connection pool shared by the requests of the proxy,
+    and upstream response bodies are streamed to the client as they arrive, without being decoded.
+
+    With a cache, GET responses the upstream server allows shared caches to store are kept in an
+    HTTPCache and served from it while fresh. Stale responses are revalidated with a conditional
+    request, in the background while they are within their stale-while-revalidate window, and are
+    served stale if the upstream server cannot be reached, unless they must be revalidated.
+
+    With several external URLs, requests are balanced over them by an UpstreamPool. Servers that
+    fail are ejected, and idempotent requests that fail are retried on another server.
     
     Args:
         name (str): The name of the proxy router.
         internal_path (str): The path of the proxy router.
-        external_url (str): The URL of the external server.
+        external_url (str): The URL of the external server, or a list of the URLs of equivalent servers.
         headers (dict): The headers to be sent with the request.
+        pool_size (int): The maximum number of connections kept open to the external server.
+        keep_alive (bool): Whether upstream connections are reused for later requests.
+        connect_timeout (float): The number of seconds to wait for an upstream connection.
+        read_timeout (float): The number of seconds to wait for upstream data.
+        retries (int): The number of times a failed connection to a server is retried on the same server. Read timeouts and error statuses are not retried there; idempotent requests fail over to other servers instead (see upstream_retries).
+        chunk_size (int): The size in bytes of the chunks the upstream body is read in.
+        cache_size (int): The maximum total size in bytes of the responses cached in memory. 0 disables the memory tier.
+        cache_dir (str): The directory of the on-disk cache tier, or None. The cache is disabled if there is neither tier.
+        balance (str): The load balancing strategy: round_robin, least_outstanding or consistent_hash.
+        max_fails (int): The number of consecutive failures that eject a server.
+        fail_timeout (float): The number of seconds an ejected server is skipped.
+        health_check (str): The path requested to check the servers in the background, or None.
+        health_check_interval (float): The number of seconds between health checks.
+        upstream_retries (int): The number of other servers an idempotent request is retried on when a server fails.
+        coalesce (bool): Whether concurrent identical GET and HEAD requests share one upstream request.
+        vary (list): The names of the request headers that make otherwise identical requests different.
         
     Attributes:
         internal_path (str): The path of the proxy router.
-        external_url (str): The URL of the external server.
+        external_url (str): The URL of the (first) external server.
+        upstreams (UpstreamPool): The external servers.
         headers (dict): The headers to be sent with the request.
+        session (Session): The session holding the upstream connection pool.
+        timeout (tuple): The connect and read timeouts.
+        http_cache (HTTPCache): The cache of upstream responses, or None.
+        flights (SingleFlight): The group coalescing identical requests, or None.
         
     """
     
-    def __init__(self, name: str, internal_path: str, external_url: str, request_headers: dict = {}, response_headers: dict = {}, url_rewrite: Callable = lambda x: x):
+    def __init__(self, name: str, internal_path: str, external_url, request_headers: dict = {}, response_headers: dict = {}, url_rewrite: Callable = lambda x: x, pool_size: int = 10, keep_alive: bool = True, connect_timeout: float = 5, read_timeout: float = 30, retries: int = 2, chunk_size: int = 65536, cache_size: int = 0, cache_dir: str = None, balance: str = "round_robin", max_fails: int = 3, fail_timeout: float = 30, health_check: str = None, health_check_interval: float = 10, upstream_retries: int = 1, coalesce: bool = False, vary: list = ()):
         self.name = name
         self.internal_path = self.prefix = internal_path
-        self.external_url = external_url
+        urls = [external_url] if isinstance(external_url, str) else list(external_url)
+        self.upstreams = UpstreamPool(urls, balance, max_fails, fail_timeout, health_check, health_check_interval)
+        self.upstream_retries = upstream_retries
+        self.external_url = urls[0]
         self.request_headers = request_headers
         self.response_headers = response_headers
         self.url_rewrite = url_rewrite
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+        self.chunk_size = chunk_size
+        self.http_cache = HTTPCache(cache_size, cache_dir) if cache_size or cache_dir else None
+        self.flights = SingleFlight() if coalesce else None
+        self.vary = vary
+        self.cache = LRUCache(0)
+        self.parents = []
+        self.middleware = []
+        self.pipelines = {}
+        
+        self.session = requests.Session()
+        self.session.headers.clear()
+        adapter = HTTPAdapter(pool_connections=len(urls), pool_maxsize=pool_size, max_retries=Retry(total=retries, read=0, status=0, backoff_factor=0.05))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         
         self.logger = logging.getLogger(f"ProxyRouter<{self.internal_path}>")
         
@@ -174,6 +597,12 @@ class ProxyRouter(Router):
         self.logger.info("Routing request to external server")
         return self.get_proxy_handler(request, parent_prefix), [], [], {}
     
+    def resolve(self, request: Request, parent_prefix: str = ""):
+        """
+        Resolves a request to the proxy handler, which depends only on the path prefix.
+        """
+        return self.route(request, parent_prefix), True, (self,)
+    
     def get_proxy_handler(self, request: Request, parent_prefix: str):
         """
         Returns a handler function that proxies the request to the external server.
@@ -197,21 +626,247 @@ class ProxyRouter(Router):
 
             """
             url = self.url_rewrite(request.path[len(parent_prefix):])
-            headers = request.headers
+            headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_BY_HOP and name.lower() not in ("host", "content-length")}
             headers.update(self.request_headers.get(url, self.request_headers.get("*", {})))
-            response = requests.request(request.method, f"{self.external_url}{url}", headers=headers, data=request.body)
-            response_headers = response.headers
+            response_headers = dict(self.response_headers.get(url, self.response_headers.get("*", {})))
+            if request.query:
+                url = f"{url}?{request.query}"
+            if not self.keep_alive:
+                headers["Connection"] = "close"
+            if self.http_cache is not None:
+                if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+                    self.http_cache.invalidate(url)
+                elif self.cacheable(request):
+                    return self.cached(request, url, headers, response_headers)
+            upstream = self.send(request.method, url, headers, request.body or None)
+            if isinstance(upstream, Response):
+                return upstream
+            return self.relay(upstream, url, response_headers)
+        return coalesced(handler, self.vary, self.flights) if self.flights is not None else handler
+    
+    def send(self, method: str, url: str, headers: dict, data: bytes = None):
+        """
+        Sends a request to an external server selected by the upstream pool.
+
+        A server that cannot be reached or answers 502, 503 or 504 counts as failed, and idempotent
+        requests are then retried on up to upstream_retries other servers.
+
+        Args:
+            method (str): The request method.
+            url (str): The path and query string on the external server.
+            headers (dict): The request headers.
+            data (bytes): The request body, or None.
+
+        Returns:
+            requests.Response: The streamed upstream response, or a 502/504 Response if no external server could answer.
+
+        """
+        attempts = 1 + (self.upstream_retries if method in IDEMPOTENT else 0)
+        tried, error = [], None
+        for attempt in range(attempts):
+            server = self.upstreams.select(url, tried)
+            if server is None:
+                break
+            tried.append(server)
+            started = self.upstreams.acquire(server)
+            try:
+                response = self.session.request(method, f"{server.url}{url}", headers=headers, data=data, timeout=self.timeout, stream=True, allow_redirects=False)
+            except requests.exceptions.RequestException as e:
+                self.upstreams.release(server, failed=True)
+                self.logger.error("Could not reach %s: %s" % (server.url, e))
+                error = e
+                continue
+            if response.status_code in (502, 503, 504):
+                self.upstreams.release(server, failed=True)
+                if attempt < attempts - 1 and len(tried) < len(self.upstreams):
+                    response.close()
+                    continue
+                response.server = None
+                return response
+            response.server, response.started = server, started
+            return response
+        # Read timeouts that exhaust the retries surface as a ConnectionError wrapping them.
+        if isinstance(error, requests.exceptions.Timeout) or isinstance(getattr(error.args[0] if error is not None and error.args else None, "reason", None), ReadTimeoutError):
+            return Response("504 Gateway Timeout", status="504 Gateway Timeout")
+        return Response("502 Bad Gateway", status="502 Bad Gateway")
+    
+    def close(self, upstream):
+        """
+        Closes an upstream response, returning its connection to the pool, and completes its request
+        in the upstream pool.
+        """
+        upstream.close()
+        server, upstream.server = getattr(upstream, "server", None), None
+        if server is not None:
+            self.upstreams.release(server, upstream.started)
+    
+    def relay(self, upstream, url: str, response_headers: dict, store: Callable = None):
+        """
+        Builds the response to the client from an upstream response.
+
+        Args:
+            upstream (requests.Response): The streamed upstream response.
+            url (str): The path and query string on the external server.
+            response_headers (dict): The headers added to the response.
+            store (function): Called with the whole body once it has been relayed, to cache it, or None.
+
+        Returns:
+            Response: The response streaming the upstream body.
+
+        """
+        response_headers = {**{name: value for name, value in upstream.headers.items() if name.lower() not in HOP_BY_HOP and name.lower() != "content-type"}, **response_headers}
+        content_type = upstream.headers.get("Content-Type", "application/octet-stream")
+        status = f"{upstream.status_code} {upstream.reason}"
+        
+        if type(self).adapt_response_body is not ProxyRouter.adapt_response_body:
             response_headers.pop("Content-Encoding", None)
-            response_headers.pop("Transfer-Encoding", None)
-            response_headers.update(self.response_headers.get(url, self.response_headers.get("*", {})))
-            
-            response_body = self.adapt_response_body(response.content, path=urlparse(f"{self.external_url}{url}"))
-            return Response(response_body, status=response.status_code, headers=response_headers)
-        return handler
+            response_headers.pop("Content-Length", None)
+            try:
+                response_body = self.adapt_response_body(upstream.content, path=urlparse(upstream.url))
+            finally:
+                self.close(upstream)
+            return Response(response_body, status=status, content_type=content_type, headers=response_headers)
+        return Response(self.stream(upstream, store), status=status, content_type=content_type, headers=response_headers)
+    
+    def stream(self, upstream, store: Callable = None):
+        """
+        Yields the body of an upstream response as it arrives, still content-encoded, and returns
+        the connection to the pool once the body is exhausted.
+
+        Args:
+            upstream (requests.Response): The upstream response, requested with stream=True.
+            store (function): Called with the whole body if it is relayed completely and is small enough to be cached.
+
+        """
+        chunks, size = [], 0
+        try:
+            for chunk in upstream.raw.stream(self.chunk_size, decode_content=False):
+                if store is not None:
+                    size += len(chunk)
+                    chunks.append(chunk)
+                    if size > self.http_cache.max_entry_size:
+                        store, chunks = None, []
+                yield chunk
+            if store is not None:
+                store(b"".join(chunks))
+        finally:
+            self.close(upstream)
+    
+    def cacheable(self, request: Request):
+        """
+        Checks whether a request may be answered from the cache: a GET without credentials, a
+        Range header or a Cache-Control: no-store directive.
+        """
+        if request.method != "GET" or "Authorization" in request.headers or "Range" in request.headers:
+            return False
+        return "no-store" not in parse_cache_control(request.headers.get("Cache-Control"))
+    
+    def cached(self, request: Request, url: str, headers: dict, response_headers: dict):
+        """
+        Answers a cacheable request from the cache, revalidating or fetching the response as needed.
+
+        Args:
+            request (Request): The request.
+            url (str): The path and query string on the external server.
+            headers (dict): The headers to send upstream.
+            response_headers (dict): The headers added to the response.
+
+        Returns:
+            Response: The response.
+
+        """
+        entry = self.http_cache.lookup(url, request.headers)
+        directives = parse_cache_control(request.headers.get("Cache-Control"))
+        if entry is not None and "no-cache" not in directives and directives.get("max-age") != "0" and request.headers.get("Pragma") != "no-cache":
+            if entry.fresh():
+                self.http_cache.record("hits")
+                return self.replay(entry, request, response_headers)
+            if entry.stale_while_revalidate():
+                self.http_cache.record("stale")
+                if self.http_cache.begin_revalidation(url):
+                    threading.Thread(target=self.revalidate, args=(url, entry, headers, request.headers.copy()), daemon=True).start()
+                return self.replay(entry, request, response_headers)
+        if entry is None:
+            self.http_cache.record("misses")
+        else:
+            headers = {name: value for name, value in headers.items() if name.lower() not in CONDITIONAL}
+            headers.update(entry.validators())
+        
+        upstream = self.send("GET", url, headers)
+        if isinstance(upstream, Response):
+            if entry is not None and "must-revalidate" not in entry.directives and "proxy-revalidate" not in entry.directives:
+                self.http_cache.record("stale")
+                return self.replay(entry, request, response_headers)
+            return upstream
+        if entry is not None and upstream.status_code == 304:
+            self.close(upstream)
+            self.http_cache.refresh(url, entry, upstream.headers)
+            return self.replay(entry, request, response_headers)
+        return self.relay(upstream, url, response_headers, self.storer(url, request.headers, upstream))
+    
+    def storer(self, url: str, request_headers, upstream):
+        """
+        Returns the function storing the body of an upstream response in the cache, or None if the
+        response may not be stored.
+        """
+        if upstream.status_code in (206, 304) or not self.http_cache.storable(upstream.status_code, upstream.headers):
+            return None
+        status = f"{upstream.status_code} {upstream.reason}"
+        headers = {name: value for name, value in upstream.headers.items() if name.lower() not in HOP_BY_HOP}
+        response_time = time.time()
+        return lambda body: self.http_cache.store(url, request_headers, status, headers, body, response_time)
+    
+    def revalidate(self, url: str, entry, headers: dict, request_headers):
+        """
+        Revalidates a stale response in the background, storing the new response if it changed.
+        """
+        try:
+            headers = {name: value for name, value in headers.items() if name.lower() not in CONDITIONAL}
+            headers.update(entry.validators())
+            upstream = self.send("GET", url, headers)
+            if isinstance(upstream, Response):
+                return
+            if upstream.status_code == 304:
+                self.close(upstream)
+                self.http_cache.refresh(url, entry, upstream.headers)
+                return
+            for _ in self.stream(upstream, self.storer(url, request_headers, upstream)):
+                pass
+        except Exception as e:
+            self.logger.error("Could not revalidate %s: %s" % (url, e))
+        finally:
+            self.http_cache.end_revalidation(url)
+    
+    def replay(self, entry, request: Request, response_headers: dict):
+        """
+        Builds the response to the client from a cached response, answering the client's own
+        If-None-Match with 304 Not Modified.
+        """
+        headers = {name: value for name, value in entry.headers.items() if name.lower() not in ("content-type", "content-length")}
+        headers.update(response_headers)
+        headers["Age"] = str(int(entry.age()))
+        content_type = entry.header("Content-Type") or "application/octet-stream"
+        etag, if_none_match = entry.header("ETag"), request.headers.get("If-None-Match")
+        if etag is not None and if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if "*" in tags or etag.removeprefix("W/") in tags:
+                return Response(b"", status="304 Not Modified", content_type=content_type, headers=headers)
+        return Response(entry.body, status=entry.status, content_type=content_type, headers=headers)
+    
+    def cache_info(self):
+        """
+        Returns the statistics of the response cache.
+
+        Returns:
+            dict: The hits, misses, stale hits and revalidations of the cache and the sizes of its tiers, or None if the proxy has no cache.
+
+        """
+        return self.http_cache.info() if self.http_cache is not None else None
     
     def adapt_response_body(self, body, path):
         """
-        Adapts the response body.
+        Adapts the response body. Subclasses overriding it receive the whole decoded body, which
+        disables streaming.
 
         Args:
             body (bytes): The body of the response.
@@ -234,6 +889,10 @@ class Route:
     """
     Represents a route.
 
+    The path may contain parameter segments: `<name>` matches any segment and `<type:name>` a segment
+    accepted by the converter registered as type (built in: string, int, float, uuid, slug and path,
+    which matches all of the remaining segments). The path is parsed once, when the route is created.
+
     Args:
         path (str): The path of the route.
         method (str): The method of the route.
@@ -243,6 +902,7 @@ class Route:
         path (str): The path of the route.
         method (str): The method of the route.
         handler (function): The handler function of the route.
+        segments (list): The parsed path: literal segments as str, parameters as (type, name, Converter) tuples.
 
     """
 
@@ -252,6 +912,66 @@ class Route:
         self.handler = handler
         self.request_mod = request_mod
         self.response_mod = response_mod
+        self.segments = self.parse(path)
+        
+    def parse(self, path: str):
+        """
+        Parses the path of the route into segments.
+
+        Args:
+            path (str): The path of the route.
+
+        Returns:
+            list: The literal segments as str and the parameters as (type, name, Converter) tuples.
+
+        Raises:
+            ValueError: If a parameter has an unknown type or a catch-all is not the last segment.
+
+        """
+        segments = []
+        for component in filter(None, path.split("/")):
+            if segments and type(segments[-1]) == tuple and segments[-1][2].greedy:
+                raise ValueError("A <%s:...> parameter must be the last segment of %s" % (segments[-1][0], path))
+            if component.startswith("<") and component.endswith(">"):
+                data_type, _, name = component[1:-1].rpartition(":")
+                data_type = data_type or "string"
+                if data_type not in converters:
+                    raise ValueError("Unknown parameter type %r in %s" % (data_type, path))
+                segments.append((data_type, name, converters[data_type]))
+            else:
+                segments.append(component)
+        return segments
+        
+    def match(self, path: str):
+        """
+        Matches the route's path against a request path.
+
+        Args:
+            path (str): The request path.
+
+        Returns:
+            dict: The converted parameters, or None if the path does not match.
+
+        """
+        components = [component for component in path.split("/") if component]
+        params = {}
+        for i, segment in enumerate(self.segments):
+            if i >= len(components):
+                return None
+            if type(segment) == str:
+                if components[i] != segment:
+                    return None
+            elif segment[2].greedy:
+                rest = "/".join(components[i:])
+                if not segment[2].accepts(rest):
+                    return None
+                params[segment[1]] = segment[2].to_python(rest)
+                return params
+            elif segment[2].accepts(components[i]):
+                params[segment[1]] = segment[2].to_python(components[i])
+            else:
+                return None
+        return params if len(components) == len(self.segments) else None
 
     def matches(self, request: Request, prefix: str = ""):
         """
@@ -264,48 +984,7 @@ class Route:
             bool: True if the route matches the request, False otherwise.
 
         """
-        if request.method not in self.methods:
-            return False
-        
-        if self.path == request.path:
-            return True
-        
-        path_components = list(filter(lambda x: x != "", self.path.split("/")))
-        if request.path.startswith(prefix):
-            request_components = list(filter(lambda x: x != "", request.path.split("/")))
-            
-        if request.path == self.path:
-            return True
-        if len(path_components) != len(request_components):
-            return False
-        if len(path_components) == 0:
-            return False
-        # print(path_components, request_components, self.path, request.path)
-        for i in range(len(path_components)):
-            # print(path_components[i], request_components[i])
-            if path_components[i].startswith("<") and path_components[i].endswith(">"):
-                if ":" not in path_components[i][1:-1]:
-                    data_type = "string"
-                else:
-                    data_type = path_components[i][1:-1].split(":")[0]
-                value = request_components[i]
-                if data_type == "int":
-                    try:
-                        int(value)
-                    except:
-                        return False
-                elif data_type == "string":
-                    pass
-                else:
-                    try:
-                        globals()[data_type](value)
-                    except:
-                        return False
-            else:
-                if path_components[i] != request_components[i]:
-                    return False
-            
-        return True
+        return request.method in self.methods and self.match(request.path) is not None
     
     def extract_params(self, request: Request):
         """
@@ -318,33 +997,7 @@ class Route:
             dict: The dictionary of parameters.
 
         """
-        if not self.matches(request):
-            return {}
-        path_components = self.path.split("/")
-        request_components = request.path.split("/")
-        
-        params = {}
-        for i in range(len(path_components)):
-            if path_components[i].startswith("<") and path_components[i].endswith(">"):
-                if ":" not in path_components[i][1:-1]:
-                    data_type = "string"
-                    var_name = path_components[i][1:-1]
-                else:
-                    data_type = path_components[i][1:-1].split(":")[0]
-                    var_name = path_components[i][1:-1].split(":")[1]
-                value = request_components[i]
-                if data_type == "int":
-                    params[var_name] = int(value)
-                elif data_type == "string":
-                    params[var_name] = value
-                else:
-                    try:
-                        params[var_name] = globals()[data_type](value)
-                    except:
-                        params[var_name] = value
-                        # print("Warning: Could not convert parameter to specified type. Using string instead.")
-                        self.logger.warning("Could not convert parameter to specified type. Using string instead.")
-        return params
+        return self.match(request.path) or {}
     
     def __str__(self):
         """
@@ -0,0 +1,260 @@
+import os, re, json, hashlib, tempfile, threading
+from .compression import compressible, compress_file
+from .static import mime_types
+
+MANIFEST = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+def fingerprint(name: str, content: bytes, length: int = 12):
+    """
+    Returns the fingerprinted name of an asset, with a hash of its content before its extension.
+
+    Args:
+        name (str): The logical name, e.g. "css/site.css".
+        content (bytes): The content of the asset.
+        length (int): The number of hexadecimal digits of the hash.
+
+    Returns:
+        str: The fingerprinted name, e.g. "css/site.3f2a9c1b0d4e.css".
+
+    """
+    root, extension = os.path.splitext(name)
+    return "%s.%s%s" % (root, hashlib.sha256(content).hexdigest()[:length], extension)
+
+def minify_css(source: str):
+    """
+    Minifies a stylesheet by removing comments and the whitespace that does not separate tokens.
+    Strings are kept as they are.
+    """
+    parts = re.split(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""", source)
+    for index in range(0, len(parts), 2):
+        code = re.sub(r"/\*.*?\*/", "", parts[index], flags=re.S)
+        code = re.sub(r"\s+", " ", code)
+        code = re.sub(r"\s*([{};,>~])\s*", r"\1", code)
+        code = re.sub(r"\s*:\s*(?=[^{]*[;}])", ":", code)
+        parts[index] = code.replace(";}", "}")
+    return "".join(parts).strip()
+
+TOKEN = re.compile(r"[A-Za-z0-9_$]+|\s+|.", re.S)
+
+# Tokens after which a slash starts a regular expression literal rather than a division.
+REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^") | {"", "return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw", "yield", "await"}
+
+def minify_js(source: str):
+    """
+    Minifies a script conservatively: comments are removed, and so are indentation, trailing
+    whitespace and blank lines. Line breaks are kept so that automatic semicolon insertion is not
+    affected; strings, template literals and regular expression literals are kept as they are.
+    """
+    output = []
+    index, length = 0, len(source)
+    previous = ""
+    while index < length:
+        character = source[index]
+        if character in "\"'`":
+            end = index + 1
+            while end < length and source[end] != character:
+                end += 2 if source[end] == "\\" else 1
+            output.append(source[index:end + 1])
+            index, previous = end + 1, character
+        elif source.startswith("//", index):
+            end = source.find("\n", index)
+            index = length if end < 0 else end
+        elif source.startswith("/*", index):
+            end = source.find("*/", index + 2)
+            index = length if end < 0 else end + 2
+            output.append(" ")
+        elif character == "/" and previous in REGEX_PRECEDERS:
+            end, in_class = index + 1, False
+            while end < length and (in_class or source[end] != "/") and source[end] != "\n":
+                if source[end] == "\\":
+                    end += 1
+                elif source[end] == "[":
+                    in_class = True
+                elif source[end] == "]":
+                    in_class = False
+                end += 1
+            output.append(source[index:end + 1])
+            index, previous = end + 1, "/"
+        else:
+            match = TOKEN.match(source, index)
+            token = match.group()
+            output.append(token)
+            if not token.isspace():
+                previous = token
+            index = match.end()
+    lines = (line.strip() for line in "".join(output).splitlines())
+    return "\n".join(re.sub(r"[ \t]+", " ", line) for line in lines if line)
+
+minifiers = {".css": minify_css, ".js": minify_js}
+
+def build_assets(static_dir: str, bundles: dict = None, minify: bool = False, exclude: tuple = (MANIFEST,), gzip: bool = False):
+    """
+    Fingerprints the assets of a static directory and writes its manifest, then optionally
+    compresses its files into gzip sidecars.
+
+    Every file is copied to a fingerprinted name next to it. Bundles are the concatenation of
+    their parts, in order, written only under their fingerprinted name. Fingerprinted files of a
+    previous build that are no longer current are removed. The manifest, manifest.json in the
+    static directory, maps each logical name to its fingerprinted name.
+
+    Args:
+        static_dir (str): The static directory.
+        bundles (dict): Maps the logical name of each bundle, e.g. "bundle.css", to the list of
+            the names of its parts, relative to the static directory.
+        minify (bool): Whether to minify the CSS and JavaScript files and bundles.
+        exclude (tuple): The names of the files that are not fingerprinted.
+        gzip (bool): Whether to write the gzip sidecars of the static directory with compress_assets.
+
+    Returns:
+        dict: The manifest.
+
+    Raises:
+        FileNotFoundError: If a bundle part does not exist.
+
+    """
+    manifest_path = os.path.join(static_dir, MANIFEST)
+    previous = read_manifest(manifest_path)
+    outputs = set(previous.values())
+    sources = {}
+    for directory, _, files in os.walk(static_dir):
+        for file in files:
+            name = os.path.relpath(os.path.join(directory, file), static_dir).replace(os.sep, "/")
+            if name in outputs or name in exclude or file.startswith(".") or (file.endswith(".gz") and file[:-3] in files):
+                continue
+            with open(os.path.join(directory, file), "rb") as f:
+                sources[name] = f.read()
+    for name, parts in (bundles or {}).items():
+        missing = [part for part in parts if part not in sources]
+        if missing:
+            raise FileNotFoundError("Bundle %s: no such asset %s" % (name, ", ".join(missing)))
+        separator = b"\n;\n" if name.endswith(".js") else b"\n"
+        sources[name] = separator.join(sources[part].rstrip() for part in parts) + b"\n"
+    manifest = {}
+    for name in sorted(sources):
+        content = sources[name]
+        extension = os.path.splitext(name)[1].lower()
+        if minify and extension in minifiers:
+            content = minifiers[extension](content.decode("utf-8")).encode("utf-8")
+        manifest[name] = fingerprint(name, content)
+        path = os.path.join(static_dir, manifest[name].replace("/", os.sep))
+        if not os.path.exists(path):
+            write(path, content)
+    for stale in outputs - set(manifest.values()):
+        for path in (stale, stale + ".gz"):
+            try:
+                os.remove(os.path.join(static_dir, path.replace("/", os.sep)))
+            except OSError:
+                pass
+    write(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    if gzip:
+        compress_assets(static_dir)
+    return manifest
+
+def compress_assets(static_dir: str, level: int = 9, min_size: int = 1024):
+    """
+    Writes the gzip sidecar of every compressible file of a static directory, the file with ".gz"
+    appended to its name, for the static handler to send to clients accepting gzip.
+
+    Sidecars that are newer than their file are kept. Files smaller than min_size are not
+    compressed, and neither are files that do not shrink.
+
+    Args:
+        static_dir (str): The static directory.
+        level (int): The compression level, from 1 to 9.
+        min_size (int): The size in bytes below which files are not compressed.
+
+    Returns:
+        list: The names of the sidecars written, relative to the static directory.
+
+    """
+    written = []
+    for directory, _, files in os.walk(static_dir):
+        for file in files:
+            if file.startswith(".") or file.endswith(".gz") or not compressible(mime_types.guess_type(file)[0]):
+                continue
+            path = os.path.join(directory, file)
+            status = os.stat(path)
+            if status.st_size < min_size:
+                continue
+            try:
+                if os.stat(path + ".gz").st_mtime_ns >= status.st_mtime_ns:
+                    continue
+            except OSError:
+                pass
+            compress_file(path, path + ".gz", level)
+            if os.path.getsize(path + ".gz") >= status.st_size:
+                os.remove(path + ".gz")
+                continue
+            written.append(os.path.relpath(path + ".gz", static_dir).replace(os.sep, "/"))
+    return written
+
+def read_manifest(path: str):
+    """
+    Reads a manifest, returning an empty one if the file is missing or invalid.
+    """
+    try:
+        with open(path, "rb") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+def write(path: str, content: bytes):
+    """
+    Writes a file atomically, so that it is never served half-written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".")
+    with os.fdopen(fd, "wb") as f:
+        f.write(content)
+    os.replace(temporary, path)
+
+class AssetManifest:
+    """
+    The manifest of a static directory, reloaded whenever the file changes.
+
+    Args:
+        path (str): The path of the manifest.
+
+    Attributes:
+        path (str): The path of the manifest.
+        names (dict): Maps the logical names to the fingerprinted names.
+        fingerprinted (set): The fingerprinted names.
+
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.names = {}
+        self.fingerprinted = set()
+        self.mtime = None
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Reloads the manifest if the file was created, changed or removed since it was last read.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except (OSError, ValueError):
+            mtime = None
+        if mtime == self.mtime:
+            return
+        with self.lock:
+            names = read_manifest(self.path) if mtime is not None else {}
+            self.names, self.fingerprinted, self.mtime = names, set(names.values()), mtime
+
+    def resolve(self, name: str):
+        """
+        Returns the fingerprinted name of an asset, or the name itself if it is not in the manifest.
+        """
+        self.refresh()
+        return self.names.get(name.lstrip("/"), name.lstrip("/"))
+
+    def immutable(self, name: str):
+        """
+        Checks whether a path under the static directory is a fingerprinted asset.
+        """
+        self.refresh()
+        return name in self.fingerprinted
@@ -0,0 +1,520 @@
+import os, time, json, hashlib, tempfile, threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded mapping that evicts the least recently used entry.
+
+    Args:
+        maxsize (int): The maximum number of entries. 0 disables the cache.
+
+    Attributes:
+        maxsize (int): The maximum number of entries.
+        hits (int): The number of lookups that found an entry.
+        misses (int): The number of lookups that did not.
+
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the entry for a key, marking it as recently used, or default if there is none.
+        """
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Adds or replaces the entry for a key, evicting the least recently used entry if the cache is full.
+        """
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """
+        Removes and returns the entry for a key, or default if there is none.
+        """
+        with self.lock:
+            return self.entries.pop(key, default)
+
+    def clear(self):
+        """
+        Removes all entries. The statistics are kept.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def info(self):
+        """
+        Returns the cache statistics.
+
+        Returns:
+            dict: The hits, misses, current size and maximum size of the cache.
+
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self.entries)
+
+def parse_cache_control(value: str):
+    """
+    Parses a Cache-Control header.
+
+    Args:
+        value (str): The value of the header, or None.
+
+    Returns:
+        dict: The lowercased directives, mapped to their unquoted argument or None.
+
+    """
+    directives = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip().strip('"') if argument else None
+    return directives
+
+def parse_seconds(value: str):
+    """
+    Parses a delta-seconds directive argument, returning None if it is not a number.
+    """
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+def parse_date(value: str):
+    """
+    Parses an HTTP date into a timestamp, returning None if it is invalid.
+    """
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+class CachedResponse:
+    """
+    Represents a response stored by an HTTPCache, together with what its freshness depends on.
+
+    Args:
+        status (str): The status line of the response, e.g. "200 OK".
+        headers (dict): The end-to-end headers of the response.
+        body (bytes): The body of the response, as sent by the upstream server.
+        vary (dict): The lowercased request headers named by the Vary header, mapped to their values in the request.
+        response_time (float): The time the response was received.
+
+    Attributes:
+        status (str): The status line of the response.
+        headers (dict): The end-to-end headers of the response.
+        body (bytes): The body of the response.
+        vary (dict): The request header values this variant was selected by.
+        response_time (float): The time the response was received or last revalidated.
+        directives (dict): The Cache-Control directives of the response.
+
+    """
+
+    def __init__(self, status: str, headers: dict, body: bytes, vary: dict, response_time: float):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.vary = vary
+        self.response_time = response_time
+        self.directives = parse_cache_control(self.header("Cache-Control"))
+
+    def header(self, name: str):
+        """
+        Returns the value of a response header, matched case-insensitively, or None.
+        """
+        name = name.lower()
+        return next((value for key, value in self.headers.items() if key.lower() == name), None)
+
+    def freshness_lifetime(self):
+        """
+        Returns the number of seconds the response is fresh for, from s-maxage, max-age or Expires.
+        """
+        if "no-cache" in self.directives:
+            return 0
+        for directive in ("s-maxage", "max-age"):
+            if directive in self.directives:
+                return parse_seconds(self.directives[directive]) or 0
+        expires = parse_date(self.header("Expires"))
+        if expires is not None:
+            return max(expires - (parse_date(self.header("Date")) or self.response_time), 0)
+        return 0
+
+    def age(self, now: float = None):
+        """
+        Returns the current age of the response in seconds.
+        """
+        return max((now or time.time()) - self.response_time, 0) + (parse_seconds(self.header("Age")) or 0)
+
+    def fresh(self, now: float = None):
+        """
+        Checks whether the response can be served without contacting the upstream server.
+        """
+        return self.age(now) < self.freshness_lifetime()
+
+    def stale_while_revalidate(self, now: float = None):
+        """
+        Checks whether the stale response can still be served while it is revalidated in the background.
+        """
+        if "must-revalidate" in self.directives or "proxy-revalidate" in self.directives or "no-cache" in self.directives:
+            return False
+        window = parse_seconds(self.directives.get("stale-while-revalidate")) or 0
+        return self.age(now) < self.freshness_lifetime() + window
+
+    def validators(self):
+        """
+        Returns the conditional request headers that revalidate the response.
+        """
+        validators = {}
+        if self.header("ETag") is not None:
+            validators["If-None-Match"] = self.header("ETag")
+        if self.header("Last-Modified") is not None:
+            validators["If-Modified-Since"] = self.header("Last-Modified")
+        return validators
+
+    def refresh(self, headers: dict, response_time: float):
+        """
+        Updates the stored headers from a 304 Not Modified response and restarts the freshness clock.
+        """
+        updated = {key.lower(): (key, value) for key, value in self.headers.items()}
+        for key, value in headers.items():
+            if key.lower() not in ("content-length", "content-encoding", "transfer-encoding"):
+                updated[key.lower()] = (key, value)
+        self.headers = dict(updated.values())
+        self.response_time = response_time
+        self.directives = parse_cache_control(self.header("Cache-Control"))
+
+    def __len__(self):
+        return len(self.body)
+
+class HTTPCache:
+    """
+    A shared HTTP cache of upstream responses, with a memory tier and an optional disk tier.
+
+    Responses are stored per URL, one variant per combination of the request headers named by their
+    Vary header. The memory tier is an LRU bounded by the total size of the bodies; with a directory,
+    responses are also written to disk, where they survive restarts and memory evictions. On disk,
+    each URL has a JSON file of the metadata of its variants and a file of their raw bodies, so that
+    nothing read from the directory is ever executed; unreadable entries are cache misses.
+
+    Args:
+        maxsize (int): The maximum total size in bytes of the bodies kept in memory.
+        directory (str): The directory of the disk tier, or None for a memory-only cache.
+        disk_maxsize (int): The maximum total size in bytes of the disk tier.
+        max_entry_size (int): The size in bytes above which a response is not stored.
+
+    Attributes:
+        maxsize (int): The maximum total size in bytes of the bodies kept in memory.
+        directory (str): The directory of the disk tier, or None.
+        size (int): The total size in bytes of the bodies kept in memory.
+        hits (int): The number of requests served fresh from the cache.
+        misses (int): The number of requests without a usable stored response.
+        stale (int): The number of requests served stale while the response was revalidated.
+        revalidated (int): The number of stored responses the upstream server confirmed unchanged.
+
+    """
+
+    def __init__(self, maxsize: int = 64 * 1024 * 1024, directory: str = None, disk_maxsize: int = 1024 * 1024 * 1024, max_entry_size: int = 8 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.disk_maxsize = disk_maxsize
+        self.max_entry_size = max_entry_size
+        self.size = 0
+        self.disk_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.entries = OrderedDict()
+        self.revalidating = set()
+        self.lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.disk_size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def storable(self, status: int, headers: dict):
+        """
+        Checks whether an upstream response may be stored.
+
+        Args:
+            status (int): The status code of the response.
+            headers (dict): The headers of the response.
+
+        Returns:
+            bool: False for responses marked no-store or private, varying on everything or setting
+                cookies, and for responses that are neither explicitly fresh nor revalidatable.
+
+        """
+        lowered = {key.lower(): value for key, value in headers.items()}
+        directives = parse_cache_control(lowered.get("cache-control"))
+        if "no-store" in directives or "private" in directives or "set-cookie" in lowered:
+            return False
+        if "*" in lowered.get("vary", ""):
+            return False
+        if any(directive in directives for directive in ("s-maxage", "max-age")) or "expires" in lowered:
+            return True
+        return status in (200, 203, 204, 300, 301, 308, 404, 410) and ("etag" in lowered or "last-modified" in lowered)
+
+    def variant(self, headers: dict, request_headers):
+        """
+        Returns the request header values a response with the given headers varies on.
+        """
+        vary = next((value for key, value in headers.items() if key.lower() == "vary"), "")
+        return {name.strip().lower(): (request_headers.get(name.strip()) or "").strip() for name in vary.split(",") if name.strip()}
+
+    def lookup(self, url: str, request_headers):
+        """
+        Finds the stored response for a request.
+
+        Args:
+            url (str): The upstream URL, including the query string.
+            request_headers (Headers): The request headers, which select the variant.
+
+        Returns:
+            CachedResponse: The stored response, fresh or not, or None.
+
+        """
+        with self.lock:
+            variants = self.entries.get(url)
+            if variants is not None:
+                self.entries.move_to_end(url)
+        if variants is None:
+            variants = self.load(url)
+            if variants:
+                self.remember(url, variants)
+        for entry in variants or []:
+            if all((request_headers.get(name) or "").strip() == value for name, value in entry.vary.items()):
+                return entry
+        return None
+
+    def store(self, url: str, request_headers, status: str, headers: dict, body: bytes, response_time: float):
+        """
+        Stores a response, replacing the variant selected by the same request header values.
+
+        Returns:
+            CachedResponse: The stored response, or None if it is too large.
+
+        """
+        if len(body) > self.max_entry_size:
+            return None
+        entry = CachedResponse(status, headers, body, self.variant(headers, request_headers), response_time)
+        with self.lock:
+            variants = self.entries.get(url)
+        if variants is None:
+            variants = self.load(url) or []
+        variants = [variant for variant in variants if variant.vary != entry.vary] + [entry]
+        self.remember(url, variants)
+        self.save(url, variants)
+        return entry
+
+    def refresh(self, url: str, entry: CachedResponse, headers: dict):
+        """
+        Updates a stored response from a 304 Not Modified response to its revalidation.
+        """
+        entry.refresh(headers, time.time())
+        with self.lock:
+            self.revalidated += 1
+            variants = self.entries.get(url)
+        if variants is not None:
+            self.save(url, variants)
+        return entry
+
+    def invalidate(self, url: str):
+        """
+        Removes every stored variant of a URL, e.g. after an unsafe request to it.
+        """
+        with self.lock:
+            self.size -= sum(len(entry) for entry in self.entries.pop(url, []))
+        if self.directory is not None:
+            path = self.path(url)
+            metadata = self.read_metadata(path)
+            with self.lock:
+                self.disk_size -= self.remove(path)
+                if metadata is not None:
+                    self.disk_size -= self.remove(os.path.join(self.directory, metadata["body"]))
+
+    def remember(self, url: str, variants: list):
+        """
+        Puts the variants of a URL in the memory tier, evicting the least recently used URLs until
+        the bodies fit in maxsize.
+        """
+        with self.lock:
+            self.size += sum(len(entry) for entry in variants) - sum(len(entry) for entry in self.entries.pop(url, []))
+            self.entries[url] = variants
+            while self.size > self.maxsize and self.entries:
+                self.size -= sum(len(entry) for entry in self.entries.popitem(last=False)[1])
+
+    def path(self, url: str):
+        """
+        Returns the metadata file of a URL in the disk tier.
+        """
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def read_metadata(self, path: str):
+        """
+        Reads a metadata file of the disk tier, returning None if it is missing or invalid.
+        """
+        try:
+            with open(path, "rb") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(metadata, dict) or not isinstance(metadata.get("variants"), list):
+            return None
+        body = metadata.get("body")
+        if not isinstance(body, str) or os.path.basename(body) != body or not body.endswith(".body"):
+            return None
+        return metadata
+
+    def load(self, url: str):
+        """
+        Reads the variants of a URL from the disk tier, or returns None.
+        """
+        if self.directory is None:
+            return None
+        metadata = self.read_metadata(self.path(url))
+        if metadata is None or metadata.get("url") != url:
+            return None
+        try:
+            with open(os.path.join(self.directory, metadata["body"]), "rb") as f:
+                bodies = f.read()
+            variants, offset = [], 0
+            for variant in metadata["variants"]:
+                length = variant["length"]
+                if type(length) != int or not 0 <= length <= len(bodies) - offset:
+                    return None
+                entry = CachedResponse(str(variant["status"]), {str(key): str(value) for key, value in variant["headers"].items()}, bodies[offset:offset + length], {str(key): str(value) for key, value in variant["vary"].items()}, float(variant["response_time"]))
+                variants.append(entry)
+                offset += length
+        except (OSError, KeyError, ValueError, TypeError, AttributeError):
+            return None
+        return variants if offset == len(bodies) else None
+
+    def save(self, url: str, variants: list):
+        """
+        Writes the variants of a URL to the disk tier, evicting the least recently written files
+        until the tier fits in disk_maxsize.
+
+        The bodies are written first, to a file named after their digest, and the metadata
+        pointing to them replaces the previous one atomically, so a reader never pairs metadata
+        with the wrong bodies.
+        """
+        if self.directory is None:
+            return
+        path = self.path(url)
+        bodies = b"".join(entry.body for entry in variants)
+        body_name = "%s.%s.body" % (os.path.basename(path)[:-len(".json")], hashlib.sha256(bodies).hexdigest()[:16])
+        metadata = {
+            "url": url,
+            "body": body_name,
+            "variants": [{"status": entry.status, "headers": dict(entry.headers), "vary": entry.vary, "response_time": entry.response_time, "length": len(entry.body)} for entry in variants],
+        }
+        body_temporary = self.write_temporary(bodies)
+        temporary = self.write_temporary(json.dumps(metadata).encode("utf-8"))
+        with self.lock:
+            previous = self.read_metadata(path)
+            self.disk_size -= self.remove(path)
+            if previous is not None and previous["body"] != body_name:
+                self.disk_size -= self.remove(os.path.join(self.directory, previous["body"]))
+            body_path = os.path.join(self.directory, body_name)
+            self.disk_size -= self.remove(body_path)
+            os.replace(body_temporary, body_path)
+            os.replace(temporary, path)
+            self.disk_size += len(bodies) + os.path.getsize(path)
+            if self.disk_size > self.disk_maxsize:
+                files = sorted((entry for entry in os.scandir(self.directory) if entry.is_file() and entry.path not in (path, body_path)), key=lambda entry: entry.stat().st_mtime)
+                for file in files:
+                    if self.disk_size <= self.disk_maxsize:
+                        break
+                    self.disk_size -= self.remove(file.path)
+
+    def write_temporary(self, content: bytes):
+        """
+        Writes content to a new temporary file of the disk tier, returning its path.
+        """
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix=".")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        return temporary
+
+    def remove(self, path: str):
+        """
+        Removes a disk tier file, returning its size (0 if there was none).
+        """
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except OSError:
+            return 0
+
+    def record(self, outcome: str):
+        """
+        Counts a request served as a "hits", "misses" or "stale" outcome.
+        """
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def begin_revalidation(self, url: str):
+        """
+        Claims the background revalidation of a URL, returning False if one is already running.
+        """
+        with self.lock:
+            if url in self.revalidating:
+                return False
+            self.revalidating.add(url)
+            return True
+
+    def end_revalidation(self, url: str):
+        """
+        Releases the background revalidation of a URL.
+        """
+        with self.lock:
+            self.revalidating.discard(url)
+
+    def clear(self):
+        """
+        Removes all entries from both tiers. The statistics are kept.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+        if self.directory is not None:
+            for entry in os.scandir(self.directory):
+                if entry.is_file():
+                    self.remove(entry.path)
+            self.disk_size = 0
+
+    def info(self):
+        """
+        Returns the cache statistics.
+
+        Returns:
+            dict: The hits, misses, stale hits, revalidations, number of cached URLs and the sizes of both tiers.
+
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "stale": self.stale, "revalidated": self.revalidated, "urls": len(self.entries), "size": self.size, "maxsize": self.maxsize, "disk_size": self.disk_size}
@@ -0,0 +1,183 @@
+import copy, asyncio, threading, functools
+from sapphirecms.networking.response import Response, FileResponse
+
+class Flight:
+    """
+    Represents one in-flight execution shared by concurrent identical requests.
+
+    Attributes:
+        done (Event): Set once the result or exception is available.
+        result: The materialised result of the execution.
+        exception (BaseException): The exception raised by the execution, or None.
+
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution whose result every caller receives.
+
+    The first caller for a key runs the function; callers arriving while it runs wait for it and get
+    a copy of its result, or its exception. Streamed response bodies are read into memory before
+    they are shared, since a stream can only be consumed once.
+
+    Attributes:
+        executions (int): The number of times a function was run.
+        coalesced (int): The number of calls answered by another call's execution.
+
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.tasks = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.lock = threading.Lock()
+
+    def call(self, key, function, *args, **kwargs):
+        """
+        Runs a function, or waits for the running execution with the same key.
+
+        Args:
+            key: The key identifying identical calls.
+            function (function): The function.
+
+        Returns:
+            A copy of the result of the execution.
+
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            try:
+                flight.result = self.materialise(function(*args, **kwargs))
+            except BaseException as e:
+                flight.exception = e
+            finally:
+                with self.lock:
+                    del self.flights[key]
+                flight.done.set()
+        else:
+            flight.done.wait()
+        if flight.exception is not None:
+            raise flight.exception
+        return self.share(flight.result)
+
+    async def acall(self, key, function, *args, **kwargs):
+        """
+        Awaits a coroutine function, or the running execution with the same key on this event loop.
+
+        Args:
+            key: The key identifying identical calls.
+            function (function): The coroutine function.
+
+        Returns:
+            A copy of the result of the execution.
+
+        """
+        key = (id(asyncio.get_running_loop()), key)
+        with self.lock:
+            task = self.tasks.get(key)
+            if task is None:
+                task = self.tasks[key] = asyncio.ensure_future(self.amaterialise(function(*args, **kwargs)))
+                task.add_done_callback(lambda _: self.tasks.pop(key, None))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        return self.share(await asyncio.shield(task))
+
+    @staticmethod
+    def materialise(result):
+        """
+        Reads a streamed response body into memory so that the response can be shared.
+        """
+        if isinstance(result, Response) and not isinstance(result, FileResponse) and result.streaming and not hasattr(result.body, "__aiter__"):
+            result.body = b"".join(result.iter_body())
+        return result
+
+    @staticmethod
+    async def amaterialise(awaitable):
+        """
+        Awaits a result and reads its streamed, possibly asynchronous, response body into memory.
+        """
+        result = await awaitable
+        if isinstance(result, Response) and hasattr(result.body, "__aiter__"):
+            result.body = b"".join([chunk.encode("utf-8") if type(chunk) == str else chunk async for chunk in result.body])
+        return SingleFlight.materialise(result)
+
+    @staticmethod
+    def share(result):
+        """
+        Returns a copy of a result that the caller may modify without affecting the other callers.
+        """
+        if isinstance(result, Response):
+            shared = copy.copy(result)
+            shared.headers = dict(result.headers)
+            shared._cookies = dict(result._cookies)
+            return shared
+        if type(result) in (str, bytes, int, type(None)):
+            return result
+        return copy.deepcopy(result)
+
+    def info(self):
+        """
+        Returns the coalescing statistics.
+
+        Returns:
+            dict: The number of executions, the number of calls that joined one and the number in flight.
+
+        """
+        with self.lock:
+            return {"executions": self.executions, "coalesced": self.coalesced, "in_flight": len(self.flights) + len(self.tasks)}
+
+def coalesced(handler, vary: list = (), flights: SingleFlight = None):
+    """
+    Wraps a route handler so that concurrent identical GET and HEAD requests share one execution.
+
+    Requests are identical if they have the same method, path and query string, and the same values
+    of the request headers named in vary. Requests with a Cookie or Authorization header may get a
+    response of their own, so they are never coalesced unless that header is named in vary.
+
+    Args:
+        handler (function): The handler, a function or a coroutine function.
+        vary (list): The names of the request headers that select different responses.
+        flights (SingleFlight): The group to coalesce in, or None for a new one.
+
+    Returns:
+        function: The wrapped handler, with the SingleFlight group as its `flights` attribute.
+
+    """
+    flights = SingleFlight() if flights is None else flights
+    vary = tuple(vary)
+    personal = tuple(name for name in ("Cookie", "Authorization") if name.lower() not in (header.lower() for header in vary))
+
+    def shared(request):
+        return request.method in ("GET", "HEAD") and not any(request.headers.get(name) for name in personal)
+
+    def key(request, params):
+        return (request.method, request.path, request.query, tuple(request.headers.get(name) for name in vary))
+
+    if asyncio.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def wrapper(request, **params):
+            if not shared(request):
+                return await handler(request, **params)
+            return await flights.acall(key(request, params), handler, request, **params)
+    else:
+        @functools.wraps(handler)
+        def wrapper(request, **params):
+            if not shared(request):
+                return handler(request, **params)
+            return flights.call(key(request, params), handler, request, **params)
+    wrapper.flights = flights
+    return wrapper
@@ -0,0 +1,186 @@
+import os, zlib, tempfile
+from sapphirecms.networking.response import Response, FileResponse, to_response
+from .cache import parse_cache_control
+
+mime_types = frozenset([
+    "text/html", "text/css", "text/plain", "text/xml", "text/csv", "text/markdown", "text/javascript",
+    "application/javascript", "application/json", "application/ld+json", "application/manifest+json",
+    "application/xml", "application/rss+xml", "application/atom+xml", "image/svg+xml",
+])
+
+wbits = {"gzip": 31, "deflate": 15}
+
+def negotiate(accept_encoding: str, encodings: tuple = ("gzip", "deflate")):
+    """
+    Chooses the content coding of a response from an Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): The value of the Accept-Encoding header, or None.
+        encodings (tuple): The supported codings, in order of preference.
+
+    Returns:
+        str: The accepted coding with the highest quality value, ties going to the earlier one in
+            encodings, or None if the response should not be compressed.
+
+    """
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compressible(content_type: str, allowed: frozenset = mime_types):
+    """
+    Checks whether a MIME type, with or without parameters, is in an allowlist.
+    """
+    return (content_type or "").split(";")[0].strip().lower() in allowed
+
+def add_vary(headers: dict, name: str = "Accept-Encoding"):
+    """
+    Adds a request header name to the Vary header of a response, unless it is already listed.
+    """
+    key = next((key for key in headers if key.lower() == "vary"), "Vary")
+    values = [value.strip() for value in str(headers.get(key) or "").split(",") if value.strip()]
+    if name.lower() not in (value.lower() for value in values) and "*" not in values:
+        headers[key] = ", ".join(values + [name])
+
+def compress_file(source: str, path: str, level: int = 9, block_size: int = 2 ** 16):
+    """
+    Writes the gzip compression of a file next to it, replacing the previous version atomically.
+
+    Args:
+        source (str): The path of the file.
+        path (str): The path of the compressed file.
+        level (int): The compression level, from 1 to 9.
+
+    Raises:
+        OSError: If the compressed file cannot be written.
+
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, wbits["gzip"])
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            with open(source, "rb") as original:
+                while block := original.read(block_size):
+                    f.write(compressor.compress(block))
+            f.write(compressor.flush())
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+
+def compress_stream(chunks, compressor):
+    """
+    Compresses a streamed body chunk by chunk, flushing after every chunk so that each one reaches
+    the client as soon as it is produced.
+    """
+    try:
+        for chunk in chunks:
+            chunk = chunk.encode("utf-8") if type(chunk) == str else chunk
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+class Compression:
+    """
+    A middleware compressing responses with gzip or deflate, as negotiated with the Accept-Encoding
+    request header.
+
+    Only responses of an allowlisted MIME type are compressed, and in-memory bodies only from
+    min_size bytes on; streamed bodies are compressed chunk by chunk unless their Content-Length is
+    below min_size. Responses that already have a Content-Encoding, file responses, partial and
+    bodiless responses and responses marked no-transform are left alone. Compressible responses
+    get a Vary: Accept-Encoding header whether or not they are compressed, and the ETag of a
+    compressed response is made weak.
+
+    Args:
+        min_size (int): The size in bytes below which bodies are sent uncompressed.
+        level (int): The compression level, from 1 (fastest) to 9 (smallest).
+        mime_types (frozenset): The MIME types to compress.
+        encodings (tuple): The supported codings, in order of preference.
+
+    Attributes:
+        min_size (int): The size in bytes below which bodies are sent uncompressed.
+        level (int): The compression level.
+        mime_types (frozenset): The MIME types to compress.
+        encodings (tuple): The supported codings, in order of preference.
+
+    """
+
+    def __init__(self, min_size: int = 1024, level: int = 6, mime_types: frozenset = mime_types, encodings: tuple = ("gzip", "deflate")):
+        if not 1 <= level <= 9:
+            raise ValueError("Compression level must be between 1 and 9, got %r" % level)
+        unknown = [encoding for encoding in encodings if encoding not in wbits]
+        if unknown:
+            raise ValueError("Unsupported content coding %s, expected gzip or deflate" % ", ".join(unknown))
+        self.min_size = min_size
+        self.level = level
+        self.mime_types = frozenset(mime_types)
+        self.encodings = tuple(encodings)
+
+    def __call__(self, request, call_next):
+        response = to_response(call_next(request))
+        self.compress(response, request.headers.get("Accept-Encoding"))
+        return response
+
+    def compress(self, response: Response, accept_encoding: str):
+        """
+        Compresses a response in place if it is eligible and the client accepts a supported coding.
+
+        Returns:
+            str: The coding applied, or None.
+
+        """
+        if isinstance(response, FileResponse) or response.bodiless or str(response.status)[:3] == "206":
+            return None
+        lowered = {key.lower(): value for key, value in response.headers.items()}
+        if lowered.get("content-encoding") or not compressible(lowered.get("content-type"), self.mime_types):
+            return None
+        if "no-transform" in parse_cache_control(lowered.get("cache-control")):
+            return None
+        add_vary(response.headers)
+        encoding = negotiate(accept_encoding, self.encodings)
+        if encoding is None or hasattr(response.body, "__aiter__"):
+            return None
+        length = lowered.get("content-length")
+        if response.streaming:
+            if length is not None and int(length) < self.min_size:
+                return None
+            response.body = compress_stream(iter(response.body), zlib.compressobj(self.level, zlib.DEFLATED, wbits[encoding]))
+        elif isinstance(response.body, (str, bytes, bytearray, memoryview)):
+            body = response.body.encode("utf-8") if type(response.body) == str else bytes(response.body)
+            if len(body) < self.min_size:
+                return None
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, wbits[encoding])
+            response.body = compressor.compress(body) + compressor.flush()
+        else:
+            return None
+        for key in list(response.headers):
+            if key.lower() in ("content-length", "accept-ranges"):
+                del response.headers[key]
+            elif key.lower() == "etag" and not str(response.headers[key]).startswith("W/"):
+                response.headers[key] = "W/" + str(response.headers[key])
+        response.headers["Content-Encoding"] = encoding
+        return encoding
@@ -0,0 +1,70 @@
+import re, uuid
+from typing import Callable
+
+class Converter:
+    """
+    Represents a route parameter type.
+
+    A segment matches the parameter if it fully matches the regex (any segment matches if there is
+    none) and is then passed to to_python, which must accept every segment the regex matches.
+
+    Args:
+        regex (str): The regex a segment must fully match, or None.
+        to_python (function): Converts a matching segment to the parameter value.
+        greedy (bool): Whether the parameter consumes all of the remaining segments, joined by "/".
+
+    Attributes:
+        pattern (Pattern): The compiled regex, or None.
+        to_python (function): Converts a matching segment to the parameter value.
+        greedy (bool): Whether the parameter consumes all of the remaining segments.
+
+    """
+
+    def __init__(self, regex: str = None, to_python: Callable = str, greedy: bool = False):
+        self.pattern = re.compile(regex) if regex is not None else None
+        self.to_python = to_python
+        self.greedy = greedy
+
+    def accepts(self, segment: str):
+        """
+        Checks whether a segment matches the parameter.
+
+        Args:
+            segment (str): The path segment (or, for a greedy parameter, the rest of the path).
+
+        Returns:
+            bool: True if the segment matches.
+
+        """
+        return self.pattern is None or self.pattern.fullmatch(segment) is not None
+
+converters = {
+    "string": Converter(),
+    "int": Converter(r"-?[0-9]+", int),
+    "float": Converter(r"-?[0-9]+(\.[0-9]+)?", float),
+    "uuid": Converter(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}", uuid.UUID),
+    "slug": Converter(r"[-a-zA-Z0-9_]+"),
+    "path": Converter(greedy=True),
+}
+
+def register_converter(name: str, regex: str = None, to_python: Callable = str, greedy: bool = False):
+    """
+    Registers a route parameter type, usable as `<name:param>` in routes added afterwards.
+
+    Args:
+        name (str): The name of the type. Registering an existing name replaces it.
+        regex (str): The regex a segment must fully match, or None to match any segment.
+        to_python (function): Converts a matching segment to the parameter value.
+        greedy (bool): Whether the parameter consumes all of the remaining segments.
+
+    Returns:
+        Converter: The registered converter.
+
+    Raises:
+        ValueError: If the name is not a valid identifier.
+
+    """
+    if not name.isidentifier():
+        raise ValueError("Invalid converter name: %r" % name)
+    converters[name] = Converter(regex, to_python, greedy)
+    return converters[name]
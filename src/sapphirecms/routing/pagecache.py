@@ -0,0 +1,265 @@
+import time, asyncio, weakref, threading, functools, contextvars
+from collections import OrderedDict
+from sapphirecms.networking.response import Response, FileResponse
+from .cache import parse_cache_control
+from .coalesce import SingleFlight
+
+collected_tags = contextvars.ContextVar("collected_tags", default=None)
+page_caches = weakref.WeakSet()
+
+def cache_tags(*tags):
+    """
+    Declares that the page being rendered depends on the given tags, so that invalidating any of
+    them evicts it. Does nothing outside a cached handler.
+
+    Args:
+        tags (str): The tags, e.g. "Posts" for a collection or "Posts:<id>" for one document.
+
+    """
+    collected = collected_tags.get()
+    if collected is not None:
+        collected.update(str(tag) for tag in tags)
+
+def invalidate_tags(*tags):
+    """
+    Evicts the pages depending on any of the given tags from every page cache of the process.
+
+    Args:
+        tags (str): The tags.
+
+    """
+    for cache in list(page_caches):
+        cache.invalidate_tags(*tags)
+
+class CachedPage:
+    """
+    Represents a handler result stored in a PageCache.
+
+    Attributes:
+        result: The materialised result of the handler.
+        expires (float): The monotonic time after which the page is not served.
+        tags (frozenset): The tags the page depends on.
+
+    """
+    __slots__ = ("result", "expires", "tags")
+
+    def __init__(self, result, expires: float, tags: frozenset):
+        self.result = result
+        self.expires = expires
+        self.tags = tags
+
+class PageCache:
+    """
+    A thread-safe LRU cache of rendered pages, invalidated by time and by tags.
+
+    Every page records the tags it depends on, and invalidate_tags evicts exactly the pages that
+    recorded one of the given tags. A page whose tags are invalidated while it is being rendered
+    is not stored, since it may have been rendered from the data as it was before the change.
+
+    Args:
+        maxsize (int): The maximum number of pages. 0 disables the cache.
+
+    Attributes:
+        maxsize (int): The maximum number of pages.
+        hits (int): The number of requests answered from the cache.
+        misses (int): The number of requests that ran the handler.
+        bypassed (int): The number of requests that were not eligible for caching.
+        invalidated (int): The number of pages evicted by tag invalidation.
+
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.invalidated = 0
+        self.generation = 0
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.lock = threading.Lock()
+        page_caches.add(self)
+
+    def lookup(self, key):
+        """
+        Returns the unexpired page stored for a key, or None.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self.discard(key)
+            self.misses += 1
+            return None
+
+    def store(self, key, result, ttl: float, tags: set, generation: int):
+        """
+        Stores a page, evicting the least recently used page if the cache is full.
+
+        Args:
+            key: The key of the request.
+            result: The materialised result of the handler.
+            ttl (float): The number of seconds the page is served.
+            tags (set): The tags the page depends on.
+            generation (int): The generation read before the handler ran; the page is dropped if
+                tags were invalidated since.
+
+        """
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.discard(key)
+            self.entries[key] = CachedPage(result, time.monotonic() + ttl, frozenset(tags))
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.maxsize:
+                self.discard(next(iter(self.entries)))
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def invalidate_tags(self, *tags):
+        """
+        Evicts the pages depending on any of the given tags.
+
+        Returns:
+            int: The number of pages evicted.
+
+        """
+        with self.lock:
+            self.generation += 1
+            keys = set().union(*(self.tags.get(str(tag), ()) for tag in tags))
+            for key in keys:
+                self.discard(key)
+            self.invalidated += len(keys)
+            return len(keys)
+
+    def clear(self):
+        """
+        Removes all pages. The statistics are kept.
+        """
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.tags.clear()
+
+    def info(self):
+        """
+        Returns the cache statistics.
+
+        Returns:
+            dict: The hits, misses, bypassed requests, invalidated pages, current size and maximum size of the cache.
+
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "bypassed": self.bypassed, "invalidated": self.invalidated, "size": len(self.entries), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self.entries)
+
+def storable(result):
+    """
+    Checks whether a handler result may be shared between visitors: a response must be a 200 that
+    is not sent from a file, sets no cookies and is not marked no-store or private.
+    """
+    if isinstance(result, FileResponse):
+        return False
+    if isinstance(result, Response):
+        lowered = {key.lower(): value for key, value in result.headers.items()}
+        directives = parse_cache_control(lowered.get("cache-control"))
+        return str(result.status)[:3] == "200" and not result._cookies and not lowered.get("set-cookie") and "no-store" not in directives and "private" not in directives
+    if type(result) == tuple:
+        return len(result) == 2 and result[1] == 200
+    return True
+
+def cached(handler, ttl: float, cache: PageCache, vary: list = (), vary_cookies: list = (), auth_cookies: list = ("JWT",)):
+    """
+    Wraps a route handler so that its GET and HEAD responses are served from a page cache for ttl seconds.
+
+    Requests share a page if they have the same method, path and query string, and the same values
+    of the request headers named in vary and the cookies named in vary_cookies. Requests with an
+    Authorization header or one of the auth_cookies are always passed to the handler. While the
+    handler runs, the tags it declares with cache_tags, directly or by loading models, are recorded
+    with the page.
+
+    Args:
+        handler (function): The handler, a function or a coroutine function.
+        ttl (float): The number of seconds a page is served from the cache.
+        cache (PageCache): The cache to store the pages in.
+        vary (list): The names of the request headers that select different pages.
+        vary_cookies (list): The names of the cookies that select different pages.
+        auth_cookies (list): The names of the cookies that identify an authenticated visitor.
+
+    Returns:
+        function: The wrapped handler, with the PageCache as its `page_cache` attribute.
+
+    """
+    vary, vary_cookies, auth_cookies = tuple(vary), tuple(vary_cookies), tuple(auth_cookies)
+
+    def key(request):
+        if request.method not in ("GET", "HEAD") or "Authorization" in request.headers:
+            return None
+        cookies = request.cookies if "Cookie" in request.headers else {}
+        if any(name in cookies for name in auth_cookies):
+            return None
+        return (request.method, request.path, request.query, tuple(request.headers.get(name) for name in vary), tuple(cookies.get(name) for name in vary_cookies))
+
+    def bypass():
+        with cache.lock:
+            cache.bypassed += 1
+
+    if asyncio.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def wrapper(request, **params):
+            page_key = key(request)
+            if page_key is None:
+                bypass()
+                return await handler(request, **params)
+            entry = cache.lookup(page_key)
+            if entry is not None:
+                return SingleFlight.share(entry.result)
+            generation, tags = cache.generation, set()
+            token = collected_tags.set(tags)
+            try:
+                result = await SingleFlight.amaterialise(handler(request, **params))
+            finally:
+                collected_tags.reset(token)
+            if storable(result):
+                cache.store(page_key, result, ttl, tags, generation)
+                return SingleFlight.share(result)
+            return result
+    else:
+        @functools.wraps(handler)
+        def wrapper(request, **params):
+            page_key = key(request)
+            if page_key is None:
+                bypass()
+                return handler(request, **params)
+            entry = cache.lookup(page_key)
+            if entry is not None:
+                return SingleFlight.share(entry.result)
+            generation, tags = cache.generation, set()
+            token = collected_tags.set(tags)
+            try:
+                result = SingleFlight.materialise(handler(request, **params))
+            finally:
+                collected_tags.reset(token)
+            if storable(result):
+                cache.store(page_key, result, ttl, tags, generation)
+                return SingleFlight.share(result)
+            return result
+    wrapper.page_cache = cache
+    return wrapper
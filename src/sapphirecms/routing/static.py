@@ -0,0 +1,315 @@
+import os, stat, threading, mimetypes, mmap
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from .compression import compressible
+
+mime_types = mimetypes.MimeTypes()
+
+def parse_range(header: str, size: int, max_ranges: int = 16):
+    """
+    Parses a Range header for a representation of the given size.
+
+    Overlapping and adjacent ranges are coalesced, so the result is sorted.
+
+    Args:
+        header (str): The value of the Range header.
+        size (int): The size of the representation in bytes.
+        max_ranges (int): The number of ranges above which the header is ignored.
+
+    Returns:
+        list: The satisfiable (first, last) byte positions, inclusive; an empty list if no range is
+            satisfiable, or None if the header is invalid and should be ignored.
+
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    specs = specs.split(",")
+    if len(specs) > max_ranges:
+        return None
+    ranges = []
+    for spec in specs:
+        first, dash, last = spec.strip().partition("-")
+        if not dash or not (first + last).isdigit():
+            return None
+        if not first:
+            if int(last) > 0 and size > 0:
+                ranges.append((max(size - int(last), 0), size - 1))
+        elif last and int(last) < int(first):
+            return None
+        elif int(first) < size:
+            ranges.append((int(first), min(int(last), size - 1) if last else size - 1))
+    ranges.sort()
+    coalesced = []
+    for first, last in ranges:
+        if coalesced and first <= coalesced[-1][1] + 1:
+            coalesced[-1] = (coalesced[-1][0], max(coalesced[-1][1], last))
+        else:
+            coalesced.append((first, last))
+    return coalesced
+
+class StaticFile:
+    """
+    Represents a static file as last read from disk.
+
+    Args:
+        path (str): The local path of the file.
+        status (os.stat_result): The status of the file when it was read.
+        body (bytes): The contents of the file, or None if it is too large to be kept in memory.
+
+    Attributes:
+        path (str): The local path of the file.
+        size (int): The size of the file in bytes.
+        mtime (int): The modification time of the file in nanoseconds.
+        body (bytes): The contents of the file, or None if it is sent from disk.
+        content_type (str): The MIME type of the file.
+        etag (str): The entity tag, derived from the size and modification time.
+        last_modified (str): The modification time as an HTTP date.
+
+    """
+
+    def __init__(self, path: str, status: os.stat_result, body: bytes = None):
+        self.path = path
+        self.size = status.st_size
+        self.mtime = status.st_mtime_ns
+        self.body = body
+        if "." in os.path.basename(path):
+            self.content_type = mime_types.guess_type(path)[0] or "application/octet-stream"
+        else:
+            self.content_type = "text/html"
+        self.etag = '"%x-%x"' % (self.size, self.mtime)
+        self.last_modified = formatdate(status.st_mtime, usegmt=True)
+
+    def current(self, status: os.stat_result):
+        """
+        Checks whether the entry still describes the file.
+
+        Args:
+            status (os.stat_result): The current status of the file.
+
+        Returns:
+            bool: True if the size and modification time are unchanged.
+
+        """
+        return status.st_size == self.size and status.st_mtime_ns == self.mtime
+
+    def not_modified(self, request):
+        """
+        Evaluates the conditional headers of a request against the file.
+
+        If-None-Match takes precedence over If-Modified-Since, which is only compared to the file's
+        modification time at the one second resolution of HTTP dates.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            bool: True if the client's copy is current and a 304 response can be sent.
+
+        """
+        if request.method not in ("GET", "HEAD"):
+            return False
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return self.mtime // 1_000_000_000 <= since
+        return False
+
+    def ranges(self, request):
+        """
+        Evaluates the Range and If-Range headers of a request against the file.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            list: The (first, last) byte positions to send, an empty list if the range is not
+                satisfiable, or None if the whole file should be sent.
+
+        """
+        header = request.headers.get("Range")
+        if header is None or request.method != "GET":
+            return None
+        if_range = request.headers.get("If-Range")
+        if if_range is not None and if_range.strip() not in (self.etag, self.last_modified):
+            return None
+        return parse_range(header, self.size)
+
+    def read_range(self, first: int, last: int, block_size: int = 2 ** 16):
+        """
+        Yields the bytes from first to last, inclusive, from memory or from a memory map of the file.
+        """
+        if self.body is not None:
+            yield self.body[first:last + 1]
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(first, last + 1, block_size):
+                yield mapped[start:min(start + block_size, last + 1)]
+
+    def byteranges(self, ranges: list, boundary: str):
+        """
+        Builds a multipart/byteranges body.
+
+        Args:
+            ranges (list): The (first, last) byte positions of the parts.
+            boundary (str): The multipart boundary.
+
+        Returns:
+            tuple: The length of the body and an iterator over its chunks.
+
+        """
+        heads = [("\r\n--%s\r\nContent-Type: %s\r\nContent-Range: bytes %d-%d/%d\r\n\r\n" % (boundary, self.content_type, first, last, self.size)).encode("latin-1") for first, last in ranges]
+        tail = ("\r\n--%s--\r\n" % boundary).encode("latin-1")
+        length = sum(len(head) for head in heads) + sum(last + 1 - first for first, last in ranges) + len(tail)
+        def chunks():
+            for head, (first, last) in zip(heads, ranges):
+                yield head
+                yield from self.read_range(first, last)
+            yield tail
+        return length, chunks()
+
+class StaticCache:
+    """
+    A thread-safe cache of static files, bounded by the total size of the cached contents.
+
+    Every lookup stats the file and rereads it if its size or modification time changed, so edits
+    on disk are picked up on the next request. Files larger than max_file_size are not kept in
+    memory; only their metadata is cached and they are sent from disk.
+
+    Args:
+        maxsize (int): The maximum total size of the cached contents in bytes. 0 disables caching of contents.
+        max_file_size (int): The size in bytes above which a file is sent from disk.
+
+    Attributes:
+        maxsize (int): The maximum total size of the cached contents in bytes.
+        max_file_size (int): The size in bytes above which a file is sent from disk.
+        size (int): The total size of the cached contents in bytes.
+        hits (int): The number of lookups answered from memory.
+        misses (int): The number of lookups that read the file.
+
+    """
+
+    def __init__(self, maxsize: int = 32 * 1024 * 1024, max_file_size: int = 256 * 1024):
+        self.maxsize = maxsize
+        self.max_file_size = max_file_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def lookup(self, path: str):
+        """
+        Returns the current entry for a file, reading it if it is not cached or has changed.
+
+        Args:
+            path (str): The local path of the file.
+
+        Returns:
+            StaticFile: The entry, or None if there is no regular file at the path.
+
+        """
+        try:
+            status = os.stat(path)
+        except (OSError, ValueError):
+            self.pop(path)
+            return None
+        if not stat.S_ISREG(status.st_mode):
+            self.pop(path)
+            return None
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry.current(status):
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = self.read(path, status)
+        self.put(path, entry)
+        return entry
+
+    def gzipped(self, entry: StaticFile):
+        """
+        Returns the gzip sidecar of a file, the file with ".gz" appended to its name.
+
+        Sidecars are built ahead of time with compress_assets and only read here, so the static
+        directory may be read-only. A sidecar older than the file is not used until it is rebuilt.
+
+        Args:
+            entry (StaticFile): The current entry of the file.
+
+        Returns:
+            StaticFile: The entry of the sidecar, or None if the file is not of a compressible
+                type, or its sidecar is missing, outdated or not smaller than the file.
+
+        """
+        if not compressible(entry.content_type):
+            return None
+        sidecar = self.lookup(entry.path + ".gz")
+        if sidecar is None or sidecar.mtime < entry.mtime or sidecar.size >= entry.size:
+            return None
+        return sidecar
+
+    def read(self, path: str, status: os.stat_result):
+        """
+        Reads a file into a new entry, keeping its contents only if it is small enough.
+        """
+        if status.st_size > self.max_file_size or status.st_size > self.maxsize:
+            return StaticFile(path, status)
+        with open(path, "rb") as f:
+            body = f.read()
+            status = os.fstat(f.fileno())
+        return StaticFile(path, status, body)
+
+    def put(self, path: str, entry: StaticFile):
+        """
+        Adds or replaces the entry for a file, evicting the least recently used entries until the
+        cached contents fit in maxsize.
+        """
+        with self.lock:
+            self.discard(path)
+            self.entries[path] = entry
+            self.size += len(entry.body or b"")
+            while self.size > self.maxsize and len(self.entries) > 1:
+                self.discard(next(iter(self.entries)))
+
+    def pop(self, path: str):
+        """
+        Removes the entry for a file, if there is one.
+        """
+        with self.lock:
+            self.discard(path)
+
+    def discard(self, path: str):
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.size -= len(entry.body or b"")
+
+    def clear(self):
+        """
+        Removes all entries. The statistics are kept.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def info(self):
+        """
+        Returns the cache statistics.
+
+        Returns:
+            dict: The hits, misses, number of entries, total size and maximum size of the cache.
+
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "size": self.size, "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self.entries)
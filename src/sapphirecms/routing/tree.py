@@ -0,0 +1,157 @@
+class Node:
+    """
+    Represents a node of a RouteTree, i.e. one path segment.
+
+    Attributes:
+        static (dict): The children reached by a literal segment.
+        params (list): The (type, name, converter, child) children reached by a typed parameter segment, in registration order.
+        catch_all (list): The (type, name, converter, child) children that consume all of the remaining segments.
+        routes (list): The routes whose pattern ends at this node, in registration order.
+
+    """
+    __slots__ = ("static", "params", "catch_all", "routes")
+
+    def __init__(self):
+        self.static = {}
+        self.params = []
+        self.catch_all = []
+        self.routes = []
+
+class RouteTree:
+    """
+    A segment trie of routes.
+
+    Routes are inserted once, when they are added to a router. A lookup walks the request path one
+    segment at a time and returns the route together with its converted parameters. Literal segments
+    take precedence over parameters, and parameters over catch-alls; when a branch matches the path
+    but has no route for the request method, the lookup backtracks to the next candidate.
+
+    Attributes:
+        root (Node): The node of the root path.
+
+    """
+
+    def __init__(self):
+        self.root = Node()
+
+    def insert(self, route):
+        """
+        Inserts a route.
+
+        Args:
+            route (Route): The route, with its pattern parsed into segments.
+
+        """
+        node = self.root
+        for segment in route.segments:
+            if type(segment) == str:
+                node = node.static.setdefault(segment, Node())
+                continue
+            children = node.catch_all if segment[2].greedy else node.params
+            child = next((child for data_type, name, converter, child in children if (data_type, name, converter) == segment), None)
+            if child is None:
+                child = Node()
+                children.append((segment[0], segment[1], segment[2], child))
+            node = child
+        node.routes.append(route)
+
+    def lookup(self, method, path):
+        """
+        Finds the route matching a request.
+
+        Args:
+            method (str): The request method.
+            path (str): The request path.
+
+        Returns:
+            tuple: The route and its converted parameters, or (None, None) if no route matches.
+
+        """
+        segments = [segment for segment in path.split("/") if segment]
+        params = {}
+        route = self.search(self.root, segments, 0, method, params)
+        if route is None:
+            return None, None
+        return route, params
+
+    def search(self, node, segments, index, method, params):
+        """
+        Searches the subtree of a node for a route matching the segments from index on.
+        """
+        if index == len(segments):
+            for route in node.routes:
+                if method in route.methods:
+                    return route
+            return None
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None:
+            route = self.search(child, segments, index + 1, method, params)
+            if route is not None:
+                return route
+        for _, name, converter, child in node.params:
+            if converter.pattern is not None and converter.pattern.fullmatch(segment) is None:
+                continue
+            route = self.search(child, segments, index + 1, method, params)
+            if route is not None:
+                params[name] = converter.to_python(segment)
+                return route
+        if node.catch_all:
+            rest = "/".join(segments[index:])
+            for _, name, converter, child in node.catch_all:
+                if not converter.accepts(rest):
+                    continue
+                for route in child.routes:
+                    if method in route.methods:
+                        params[name] = converter.to_python(rest)
+                        return route
+        return None
+
+class PrefixIndex:
+    """
+    A character trie mapping path prefixes to values, answering longest-prefix-match queries in
+    O(path length).
+
+    Attributes:
+        root (dict): The trie; each node maps a character to its child node, and None to the value
+            of the prefix ending at the node.
+
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, prefix, value):
+        """
+        Adds a prefix. If the prefix is already indexed, the value it was first added with is kept.
+
+        Args:
+            prefix (str): The path prefix.
+            value: The value returned for paths starting with the prefix.
+
+        """
+        node = self.root
+        for character in prefix:
+            node = node.setdefault(character, {})
+        node.setdefault(None, value)
+
+    def longest(self, path):
+        """
+        Finds the longest indexed prefix of a path.
+
+        Args:
+            path (str): The path.
+
+        Returns:
+            The value of the longest indexed prefix of the path, or None if no prefix matches.
+
+        """
+        node = self.root
+        value = node.get(None)
+        for character in path:
+            node = node.get(character)
+            if node is None:
+                break
+            if None in node:
+                value = node[None]
+        return value
@@ -0,0 +1,214 @@
+import os, time, bisect, hashlib, threading
+import requests
+
+class Upstream:
+    """
+    Represents one server of an UpstreamPool.
+
+    Args:
+        url (str): The base URL of the server.
+
+    Attributes:
+        url (str): The base URL of the server.
+        outstanding (int): The number of requests sent to the server whose response has not been completed.
+        failures (int): The number of consecutive failed requests.
+        ejected_until (float): The time until which the server is not selected after too many failures.
+        healthy (bool): The result of the last active health check.
+        latency (float): The moving average of the seconds the server took to complete a request.
+
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0
+        self.healthy = True
+        self.latency = 0.0
+
+    def available(self, now: float):
+        """
+        Checks whether the server may be selected.
+        """
+        return self.healthy and self.ejected_until <= now
+
+    def __repr__(self):
+        return "Upstream<%s>" % self.url
+
+class UpstreamPool:
+    """
+    A load-balanced group of servers that serve the same content.
+
+    Strategies:
+        round_robin: Each server in turn.
+        least_outstanding: The server with the fewest requests in flight, weighted by its recent
+            response time, so that a slow server only receives requests while the others are busy.
+            Until a server has completed a request, it is weighted by the mean response time of the
+            others, so that a server that hangs from the start does not take every request.
+        consistent_hash: The server owning the request path on a hash ring, so that a path keeps
+            going to the same server while the group changes.
+
+    A server is ejected for fail_timeout seconds after max_fails consecutive failures, and, with a
+    health check path, is taken out of rotation while a background check of it fails. When no
+    server is available, the unavailable ones are tried rather than failing outright.
+
+    Args:
+        urls (list): The base URLs of the servers.
+        strategy (str): The load balancing strategy.
+        max_fails (int): The number of consecutive failures that eject a server.
+        fail_timeout (float): The number of seconds an ejected server is skipped.
+        health_check (str): The path requested to check the servers, or None to disable active checks.
+        health_check_interval (float): The number of seconds between health checks.
+        health_check_timeout (float): The number of seconds a health check may take.
+        replicas (int): The number of points of each server on the hash ring.
+
+    Attributes:
+        upstreams (list): The servers.
+        strategy (str): The load balancing strategy.
+
+    """
+    strategies = ("round_robin", "least_outstanding", "consistent_hash")
+
+    def __init__(self, urls: list, strategy: str = "round_robin", max_fails: int = 3, fail_timeout: float = 30, health_check: str = None, health_check_interval: float = 10, health_check_timeout: float = 2, replicas: int = 100):
+        if not urls:
+            raise ValueError("An upstream pool needs at least one server")
+        if strategy not in self.strategies:
+            raise ValueError("Unknown load balancing strategy %r, expected one of %s" % (strategy, ", ".join(self.strategies)))
+        self.upstreams = [Upstream(url) for url in urls]
+        self.strategy = strategy
+        self.max_fails = max_fails
+        self.fail_timeout = fail_timeout
+        self.health_check = health_check
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.ring = sorted((self.hash(f"{upstream.url}#{replica}"), index) for index, upstream in enumerate(self.upstreams) for replica in range(replicas))
+        self.next = 0
+        self.lock = threading.Lock()
+        self.checker = None
+        self.checker_pid = None
+        self.stopped = threading.Event()
+
+    @staticmethod
+    def hash(key: str):
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def select(self, key: str = "", exclude: list = ()):
+        """
+        Selects the server for a request.
+
+        Args:
+            key (str): The request path, used by the consistent_hash strategy.
+            exclude (list): The servers already tried for the request.
+
+        Returns:
+            Upstream: The server, or None if every server has been tried.
+
+        """
+        self.start()
+        now = time.monotonic()
+        with self.lock:
+            candidates = [index for index, upstream in enumerate(self.upstreams) if upstream not in exclude]
+            if not candidates:
+                return None
+            available = [index for index in candidates if self.upstreams[index].available(now)] or candidates
+            if self.strategy == "consistent_hash":
+                allowed = set(available)
+                start = bisect.bisect(self.ring, (self.hash(key), len(self.upstreams)))
+                for offset in range(len(self.ring)):
+                    index = self.ring[(start + offset) % len(self.ring)][1]
+                    if index in allowed:
+                        return self.upstreams[index]
+            if self.strategy == "least_outstanding":
+                sampled = [upstream.latency for upstream in self.upstreams if upstream.latency > 0]
+                floor = sum(sampled) / len(sampled) if sampled else 1.0
+                load = {index: (self.upstreams[index].outstanding + 1) * (self.upstreams[index].latency or floor) for index in available}
+                lowest = min(load.values())
+                available = [index for index in available if load[index] == lowest]
+            index = next((index for index in available if index >= self.next), available[0])
+            self.next = index + 1
+            return self.upstreams[index]
+
+    def acquire(self, upstream: Upstream):
+        """
+        Records that a request is sent to a server.
+
+        Returns:
+            float: The time the request was sent, to be passed to release.
+
+        """
+        with self.lock:
+            upstream.outstanding += 1
+        return time.monotonic()
+
+    def release(self, upstream: Upstream, started: float = None, failed: bool = False):
+        """
+        Records that a request to a server has completed, ejecting the server if it failed too often.
+
+        Args:
+            upstream (Upstream): The server.
+            started (float): The time returned by acquire, or None.
+            failed (bool): Whether the server could not answer the request.
+
+        """
+        with self.lock:
+            upstream.outstanding = max(upstream.outstanding - 1, 0)
+            if not failed:
+                upstream.failures = 0
+                if started is not None:
+                    elapsed = time.monotonic() - started
+                    upstream.latency = elapsed if upstream.latency == 0 else 0.7 * upstream.latency + 0.3 * elapsed
+                return
+            upstream.failures += 1
+            if upstream.failures >= self.max_fails:
+                upstream.ejected_until = time.monotonic() + self.fail_timeout
+
+    def start(self):
+        """
+        Starts the background health checks of this process, if they are enabled and not running.
+        """
+        if self.health_check is None or (self.checker is not None and self.checker_pid == os.getpid()):
+            return
+        with self.lock:
+            if self.checker is not None and self.checker_pid == os.getpid():
+                return
+            self.stopped.clear()
+            self.checker_pid = os.getpid()
+            self.checker = threading.Thread(target=self.run_checks, daemon=True)
+            self.checker.start()
+
+    def stop(self):
+        """
+        Stops the background health checks.
+        """
+        self.stopped.set()
+        self.checker = None
+
+    def run_checks(self):
+        session = requests.Session()
+        while True:
+            self.check(session)
+            if self.stopped.wait(self.health_check_interval):
+                break
+
+    def check(self, session: requests.Session = None):
+        """
+        Checks every server once. A server is healthy if the health check path answers with a
+        status below 500; a healthy server is no longer ejected.
+        """
+        session = session or requests
+        for upstream in self.upstreams:
+            try:
+                healthy = session.get(f"{upstream.url}{self.health_check}", timeout=self.health_check_timeout).status_code < 500
+            except requests.exceptions.RequestException:
+                healthy = False
+            with self.lock:
+                upstream.healthy = healthy
+                if healthy:
+                    upstream.failures = 0
+                    upstream.ejected_until = 0
+
+    def __iter__(self):
+        return iter(self.upstreams)
+
+    def __len__(self):
+        return len(self.upstreams)
@@ -1,16 +1,32 @@
-import bson
+import bson, threading
 from pymongo.mongo_client import MongoClient
 
 class MongoDB:
     def __init__(self, uri, database, factories):
-        self.client = MongoClient(uri)
-        self.db = self.client[database]
+        self.uri = uri
+        self.database = database
+        self.client = None
+        self._db = None
+        self.lock = threading.Lock()
         self.models = {k: v(self) for k,v in factories.items()}
         for _, item in factories.items():
             v = item(self)
             k = v.__name__
             setattr(self, k, v)
 
+    def connect(self):
+        with self.lock:
+            if self.client is None:
+                self.client = MongoClient(self.uri)
+                self._db = self.client[self.database]
+
+    @property
+    def db(self):
+        # The connection is opened lazily: by the ASGI lifespan startup, or on first use.
+        if self.client is None:
+            self.connect()
+        return self._db
+
     def commit(self):
         pass
 
@@ -117,4 +133,7 @@ class MongoDB:
         return model.__dataset_name__ in self.db.list_collection_names()
     
     def close(self):
-        self.client.close()
\ No newline at end of file
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+            self._db = None
\ No newline at end of file
@@ -2,6 +2,7 @@ import datetime
 import json
 import hashlib
 import requests
+from sapphirecms.routing.pagecache import cache_tags, invalidate_tags
 
 def BaseModel(Database):
     class BaseModel:
@@ -25,18 +26,27 @@ def BaseModel(Database):
         def __repr__(self):
             return f"{self.__class__.__name__}({', '.join([f'{key}={value}' for key, value in self.__dict__.items()])})"
         
+        def page_cache_tags(self):
+            # The page cache tags of the collection and, once stored, of this document.
+            return [self.__dataset_name__] + ([f"{self.__dataset_name__}:{self._id}"] if getattr(self, "_id", None) is not None else [])
+        
         def save(self):
+            tags = self.page_cache_tags()
             self._id = self.__database__.save(self)
+            invalidate_tags(*tags)
             
         def delete(self):
             self.__database__.delete(self)
+            invalidate_tags(*self.page_cache_tags())
             
         @classmethod
         def all(cls):
+            cache_tags(cls.__dataset_name__)
             return cls.__database__.all(cls)
         
         @classmethod
         def get(cls, _id):
+            cache_tags(f"{cls.__dataset_name__}:{_id}")
             return cls.__database__.get(cls, _id)
         
         def exists(self):
@@ -44,6 +54,7 @@ def BaseModel(Database):
         
         @classmethod
         def count(self):
+            cache_tags(self.__dataset_name__)
             return self.__database__.count(self)
         
         def first(self, sort_key, sort_order):
@@ -54,6 +65,7 @@ def BaseModel(Database):
         
         @classmethod
         def filter(cls, **kwargs):
+            cache_tags(cls.__dataset_name__)
             return cls.__database__.filter(cls, **kwargs)
         
         def to_dict(self):
@@ -1,11 +1,12 @@
 from html_test import TestHTML
+from request_test import TestRequest
 from routing_test import TestRouting
 from serving_test import TestServing
 import unittest
 
 class TestSuite(unittest.TestSuite):
     def __init__(self):
-        super().__init__([TestHTML(), TestRouting(), TestServing()])
+        super().__init__([TestHTML(), TestRequest(), TestRouting(), TestServing()])
         
 if __name__ == "__main__":
     unittest.TextTestRunner().run(TestSuite())
\ No newline at end of file
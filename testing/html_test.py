@@ -1,5 +1,5 @@
 # type: ignore[a,abbr,address,area,article,aside,audio,b,base,bdi,bdo,blockquote,body,br,button,canvas,caption,cite,code,col,colgroup,command,datalist,dd,del,details,dfn,div,dl,dt,em,embed,fieldset,figcaption,figure,footer,form,h1,h2,h3,h4,h5,h6,head,header,hgroup,hr,html,i,iframe,img,input,ins,kbd,keygen,label,legend,li,link,map,mark,math,menu,meta,meter,nav,noscript,object,ol,optgroup,option,output,p,param,pre,progress,q,rp,rt,ruby,s,samp,script,section,select,small,source,span,strong,style,sub,summary,sup,svg,table,tbody,td,textarea,tfoot,th,thead,time,title,tr,track,u,ul,var,video,wbr]
-from sapphirecms.html import initialize, Element, Page
+from sapphirecms.html import initialize, Element, Page, Slot, Template, compile_template
 import unittest
 from halo import Halo
 
@@ -41,6 +41,26 @@ class TestHTML(unittest.TestCase):
         self.assertEqual(page.render(), f"<!DOCTYPE html>{html([head(title('Hello, World!')), body('Hello, World!')])}")
         self.assertEqual(page.render(), f"<!DOCTYPE html>{page.tree}")
         
+    def test_template(self):
+        layout = html([head(title(Slot("pagetitle", escape=True))), body([div("Navigation", classes=["nav"]), div(Slot("content", default="Empty"), id="main"), footer("Footer")])])
+        template = compile_template(layout)
+        self.assertIs(compile_template(layout), template)
+        self.assertEqual(template.parts, ['<html><head><title>', None, '</title></head><body><div class="nav">Navigation</div><div id="main">', None, '</div><footer>Footer</footer></body></html>'])
+        self.assertEqual(template.names, {"pagetitle", "content"})
+        content = [h1("Hello"), "World"]
+        self.assertEqual(template.render(pagetitle="A & B", content=content), html([head(title("A &amp; B")), body([div("Navigation", classes=["nav"]), div(content, id="main"), footer("Footer")])]).render())
+        self.assertEqual(template.render(), layout.render())
+        self.assertIn('<div id="main">Empty</div>', template.render())
+        self.assertRaises(TypeError, template.render, unknown="value")
+
+        class myPage(Page):
+            def __init__(self):
+                self.tree = html(body(Slot("content")))
+        page = myPage()
+        self.assertEqual(Template(page).render(content=p("Hello")), "<!DOCTYPE html><html><body><p>Hello</p></body></html>")
+        self.assertEqual(Template(page).parts, ["<!DOCTYPE html><html><body>", None, "</body></html>"])
+        self.assertEqual(Template(p("Static")).parts, ["<p>Static</p>"])
+
     def setUp(self):
         initialize(__name__)
         
@@ -110,6 +130,13 @@ class TestHTML(unittest.TestCase):
             except Exception as e:
                 spinner.fail()
                 fails += 1
+        with Halo(text="Running HTML.template", spinner="dots2") as spinner:
+            try:
+                self.test_template()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
                 
         if fails == 0:
             print("All HTML tests passed.")
@@ -0,0 +1,110 @@
+from sapphirecms.networking import Request
+from sapphirecms.networking.request import Headers, RequestParser
+import unittest
+from halo import Halo
+
+
+class TestRequest(unittest.TestCase):
+    def test_request_parse(self):
+        request = Request(b"POST /posts?page=2&tag=a%20b HTTP/1.1\r\nhost: localhost\r\nCOOKIE: JWT=abc; theme=\"dark\"\r\nContent-Type: application/x-www-form-urlencoded\r\nAccept: text/html\r\nAccept: */*\r\n\r\ntitle=Hello+World&draft=")
+        self.assertEqual((request.method, request.path, request.query, request.version), ("POST", "/posts/", "page=2&tag=a%20b", "HTTP/1.1"))
+        self.assertEqual(request.headers["Host"], "localhost")
+        self.assertIn("cookie", request.headers)
+        self.assertEqual(request.headers.get("accept"), "text/html, */*")
+        self.assertEqual(request.body, b"title=Hello+World&draft=")
+
+        self.assertNotIn("cookies", request.__dict__)
+        self.assertNotIn("data", request.__dict__)
+        self.assertEqual(request.args, {"page": "2", "tag": "a b"})
+        self.assertEqual(request.cookies, {"JWT": "abc", "theme": "dark"})
+        self.assertEqual(request.form, {"title": "Hello World", "draft": ""})
+        self.assertEqual(request.data, {"GET": "page=2&tag=a%20b", "POST": "title=Hello+World&draft=", "COOKIE": {"JWT": "abc", "theme": "dark"}})
+
+        self.assertEqual(Request(memoryview(b"GET / HTTP/1.0\r\n\r\n")).version, "HTTP/1.0")
+        self.assertEqual(Request("GET / HTTP/1.1\r\n\r\n").data["COOKIE"], {})
+        self.assertRaises(ValueError, Request, b"GET /\r\n\r\n")
+        self.assertRaises(ValueError, Request, b"GET / HTTP/1.1\r\nHost localhost\r\n\r\n")
+
+    def test_request_headers(self):
+        headers = Headers([(b"Content-Type", b"text/html"), ("x-custom", "1")])
+        headers["X-CUSTOM"] = "2"
+        self.assertEqual(dict(headers), {"Content-Type": "text/html", "X-CUSTOM": "2"})
+        del headers["content-type"]
+        self.assertNotIn("Content-Type", headers)
+        self.assertEqual(len(headers), 1)
+
+    def test_request_parser(self):
+        parser = RequestParser()
+        data = b"POST /a HTTP/1.1\r\nContent-Length: 5\r\n\r\nhelloPOST /b HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n5;ext=1\r\nHello\r\n8\r\n, World!\r\n0\r\nX-Trailer: 1\r\n\r\nGET /c HTTP/1.1\r\n\r\nGET /d"
+        requests = []
+        for i in range(len(data)):
+            parser.feed(data[i:i + 1])
+            request = parser.next()
+            while request is not None:
+                requests.append(request)
+                request = parser.next()
+        self.assertEqual([(request.path, request.body) for request in requests], [("/a/", b"hello"), ("/b/", b"Hello, World!"), ("/c/", b"")])
+        self.assertEqual(requests[1].headers["Content-Length"], "13")
+        self.assertNotIn("Transfer-Encoding", requests[1].headers)
+        self.assertEqual(bytes(parser.buffer), b"GET /d")
+
+        parser = RequestParser(max_head_size=16)
+        parser.feed(b"GET / HTTP/1.1\r\nHost: localhost")
+        self.assertRaises(ValueError, parser.next)
+        parser = RequestParser()
+        parser.feed(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n")
+        self.assertRaises(ValueError, parser.next)
+
+    def test_request_parser_lengths(self):
+        for length in [b"-5", b"+5", b"0x5", b"5_0", b"5 5", "\u0665".encode("utf-8")]:
+            parser = RequestParser()
+            parser.feed(b"POST / HTTP/1.1\r\nContent-Length: %s\r\n\r\nhelloGET / HTTP/1.1\r\n\r\n" % length)
+            self.assertRaises(ValueError, parser.next)
+        for size in [b"-5", b"+5", b"0x5", b""]:
+            parser = RequestParser()
+            parser.feed(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n%s\r\nhello\r\n0\r\n\r\n" % size)
+            self.assertRaises(ValueError, parser.next)
+        parser = RequestParser()
+        parser.feed(b"POST / HTTP/1.1\r\nContent-Length:  5 \r\n\r\nhelloGET /next HTTP/1.1\r\n\r\n")
+        self.assertEqual(parser.next().body, b"hello")
+        self.assertEqual(parser.next().path, "/next/")
+
+    def runTest(self):
+        print("Running Request tests...")
+        fails = 0
+        with Halo(text="Running Request.request_parse", spinner="dots2") as spinner:
+            try:
+                self.test_request_parse()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Request.request_headers", spinner="dots2") as spinner:
+            try:
+                self.test_request_headers()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Request.request_parser", spinner="dots2") as spinner:
+            try:
+                self.test_request_parser()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Request.request_parser_lengths", spinner="dots2") as spinner:
+            try:
+                self.test_request_parser_lengths()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+
+        if fails == 0:
+            print("All Request tests passed.")
+        else:
+            print(f"{fails} Request tests failed.")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
-from sapphirecms.routing import Router, Route, ProxyRouter
+from sapphirecms.routing import Router, Route, ProxyRouter, register_converter
+from sapphirecms.routing.upstream import UpstreamPool
 from sapphirecms.networking import Request
 import unittest
 from halo import Halo
@@ -41,6 +42,234 @@ class TestRouting(unittest.TestCase):
         
         self.assertEqual(handler(request, **params), f"Hello, {n}!")
         
+    def test_router_tree(self):
+        router = Router()
+        router.logger.disabled = True
+        
+        router.add_route("/posts/<int:id>", "GET")(lambda request, id: ("int", id))
+        router.add_route("/posts/<slug>", ["GET", "POST"])(lambda request, slug: ("string", slug))
+        router.add_route("/posts/new", "GET")(lambda request: ("static",))
+        router.add_route("/files/<path:path>", "GET")(lambda request, path: ("path", path))
+        for i in range(1000):
+            router.add_route(f"/section{i}/<int:id>/edit", "POST")(lambda request, id, i=i: (i, id))
+        
+        def resolve(method, path):
+            request = Request(f"{method} {path} HTTP/1.1\r\n\r\n")
+            handler, _, _, params = router.route(request)
+            return handler(request, **params) if handler else None
+        
+        self.assertEqual(resolve("GET", "/posts/42"), ("int", 42))
+        self.assertEqual(resolve("GET", "/posts/hello"), ("string", "hello"))
+        self.assertEqual(resolve("GET", "/posts/new"), ("static",))
+        self.assertEqual(resolve("POST", "/posts/42"), ("string", "42"))
+        self.assertEqual(resolve("GET", "/files/css/site.css"), ("path", "css/site.css"))
+        self.assertEqual(resolve("POST", "/section999/7/edit"), (999, 7))
+        self.assertIsNone(resolve("GET", "/section999/7/edit"))
+        self.assertIsNone(resolve("GET", "/files/"))
+        self.assertIsNone(resolve("DELETE", "/posts/42"))
+        self.assertRaises(ValueError, router.add_route("/<unknown:x>", "GET"), lambda request, x: x)
+        
+    def test_router_converters(self):
+        import uuid
+        
+        router = Router()
+        router.logger.disabled = True
+        
+        register_converter("year", r"[0-9]{4}", int)
+        router.add_route("/archive/<year:year>", "GET")(lambda request, year: year)
+        router.add_route("/price/<float:price>", "GET")(lambda request, price: price)
+        router.add_route("/users/<uuid:id>", "GET")(lambda request, id: id)
+        router.add_route("/posts/<slug:slug>", "GET")(lambda request, slug: slug)
+        router.add_route("/posts/<name>", "GET")(lambda request, name: "fallback:" + name)
+        router.add_route("/offset/<int:n>", "GET")(lambda request, n: n)
+        
+        def resolve(path):
+            request = Request(f"GET {path} HTTP/1.1\r\n\r\n")
+            handler, _, _, params = router.route(request)
+            return handler(request, **params) if handler else None
+        
+        self.assertEqual(resolve("/archive/2024"), 2024)
+        self.assertIsNone(resolve("/archive/24"))
+        self.assertEqual(resolve("/price/9.99"), 9.99)
+        self.assertIsNone(resolve("/price/nan"))
+        self.assertEqual(resolve("/users/12345678-1234-5678-1234-567812345678"), uuid.UUID("12345678-1234-5678-1234-567812345678"))
+        self.assertIsNone(resolve("/users/12345678"))
+        self.assertEqual(resolve("/posts/hello-world_2"), "hello-world_2")
+        self.assertEqual(resolve("/posts/hello%20world"), "fallback:hello%20world")
+        self.assertEqual(resolve("/offset/-3"), -3)
+        self.assertIsNone(resolve("/offset/+3"))
+        self.assertRaises(ValueError, register_converter, "not-valid")
+        
+    def test_router_cache(self):
+        router = Router()
+        router.logger.disabled = True
+        subrouter = Router(prefix="/sub")
+        subrouter.logger.disabled = True
+        custom = Router(name="CUSTOM")
+        custom.logger.disabled = True
+        
+        router.add_route("/posts/<name>", "GET")(lambda request, name: "param")
+        router.add_subrouter(subrouter)
+        router.add_subrouter(custom, rule=lambda request: request.headers.get("Host") == "custom.example.com")
+        custom.add_route("/custom", "GET")(lambda request: "custom")
+        
+        def resolve(path, host="localhost"):
+            request = Request(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n")
+            handler, _, _, params = router.route(request)
+            return handler(request, **params) if handler else None
+        
+        self.assertEqual(resolve("/posts/new"), "param")
+        self.assertEqual(resolve("/posts/new"), "param")
+        self.assertEqual(router.cache_info(), {"hits": 1, "misses": 1, "size": 1, "maxsize": 1024})
+        
+        router.add_route("/posts/new", "GET")(lambda request: "static")
+        self.assertEqual(router.cache_info()["size"], 0)
+        self.assertEqual(resolve("/posts/new"), "static")
+        
+        self.assertIsNone(resolve("/sub/page"))
+        subrouter.add_route("/page", "GET")(lambda request: "page")
+        self.assertEqual(resolve("/sub/page"), "page")
+        self.assertEqual(resolve("/sub/page"), "page")
+        
+        self.assertEqual(resolve("/custom", "custom.example.com"), "custom")
+        self.assertIsNone(resolve("/custom"))
+        self.assertNotIn(("GET", "/custom/", ""), router.cache.entries)
+        
+    def test_subrouter_prefix_index(self):
+        router = Router()
+        router.logger.disabled = True
+        
+        for prefix in ["/web1", "/web10", "/web1/admin", ""]:
+            subrouter = Router(name=prefix or "ROOT", prefix=prefix)
+            subrouter.logger.disabled = True
+            subrouter.add_route("/<path:rest>", "GET")(lambda request, rest, prefix=prefix: (prefix, rest))
+            router.add_subrouter(subrouter)
+        custom = Router(name="CUSTOM")
+        custom.logger.disabled = True
+        custom.add_route("/", "GET")(lambda request: "custom")
+        router.add_subrouter(custom, rule=lambda request: request.method == "GET")
+        proxy = ProxyRouter(name="PR1", internal_path="/web1/proxy", external_url="http://localhost:1/")
+        proxy.logger.disabled = True
+        router.add_proxy(proxy)
+        
+        def resolve(path):
+            request = Request(f"GET {path} HTTP/1.1\r\n\r\n")
+            handler, _, _, params = router.route(request)
+            return handler(request, **params) if handler else None
+        
+        self.assertEqual(resolve("/web1/page"), ("/web1", "page"))
+        self.assertEqual(resolve("/web10/page"), ("/web10", "page"))
+        self.assertEqual(resolve("/web1/admin/users"), ("/web1/admin", "users"))
+        self.assertEqual(resolve("/other/page"), ("", "other/page"))
+        self.assertIs(router.prefixes.longest("/web1/proxy/1/")[1], proxy)
+        
+        router = Router()
+        router.logger.disabled = True
+        router.add_subrouter(custom, rule=lambda request: request.method == "GET")
+        self.assertEqual(resolve("/"), "custom")
+        
+    def test_static_cache(self):
+        import tempfile, os
+        from sapphirecms.networking.response import FileResponse
+        
+        static_dir = tempfile.mkdtemp()
+        with open(os.path.join(static_dir, "site.css"), "wb") as f:
+            f.write(b"body { color: red; }")
+        with open(os.path.join(static_dir, "video.mp4"), "wb") as f:
+            f.write(os.urandom(512 * 1024))
+        router = Router(static_dir=static_dir)
+        router.logger.disabled = True
+        
+        def get(path, headers=""):
+            request = Request(f"GET {path} HTTP/1.1\r\n{headers}\r\n")
+            handler, _, _, params = router.route(request)
+            return handler(request, **params)
+        
+        response = get("/static/site.css")
+        self.assertEqual(response.body, b"body { color: red; }")
+        self.assertEqual(response.headers["Content-Type"], "text/css")
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+        etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+        self.assertEqual(get("/static/site.css").body, b"body { color: red; }")
+        self.assertEqual(router.static_cache.info()["hits"], 1)
+        
+        response = get("/static/site.css", f"If-None-Match: W/\"x\", {etag}\r\n")
+        self.assertEqual(response.status, "304 Not Modified")
+        self.assertEqual(response.body, b"")
+        self.assertNotIn("Content-Length", response.build().decode())
+        self.assertEqual(get("/static/site.css", f"If-Modified-Since: {last_modified}\r\n").status, "304 Not Modified")
+        self.assertEqual(get("/static/site.css", "If-Modified-Since: Thu, 01 Jan 1970 00:00:00 GMT\r\n").status, "200 OK")
+        self.assertEqual(get("/static/site.css", f"If-None-Match: \"x\"\r\nIf-Modified-Since: {last_modified}\r\n").status, "200 OK")
+        
+        with open(os.path.join(static_dir, "site.css"), "wb") as f:
+            f.write(b"body { color: blue; }")
+        os.utime(os.path.join(static_dir, "site.css"), (1700000000, 1700000000))
+        response = get("/static/site.css", f"If-None-Match: {etag}\r\n")
+        self.assertEqual(response.status, "200 OK")
+        self.assertEqual(response.body, b"body { color: blue; }")
+        self.assertNotEqual(response.headers["ETag"], etag)
+        
+        response = get("/static/video.mp4")
+        self.assertIsInstance(response, FileResponse)
+        self.assertIn("ETag", response.headers)
+        self.assertEqual(router.static_cache.size, len(b"body { color: blue; }"))
+        self.assertEqual(get("/static/missing.css").status, 404)
+        self.assertEqual(get("/static/../routing_test.py").status, 404)
+        
+    def test_static_ranges(self):
+        import tempfile, os
+        from sapphirecms.networking.response import FileResponse
+        
+        static_dir = tempfile.mkdtemp()
+        content = os.urandom(512 * 1024)
+        for name in ["clip.mp3", "track.mp3"]:
+            with open(os.path.join(static_dir, name), "wb") as f:
+                f.write(content[:1000] if name == "clip.mp3" else content)
+        router = Router(static_dir=static_dir)
+        router.logger.disabled = True
+        
+        def get(path, headers=""):
+            request = Request(f"GET {path} HTTP/1.1\r\n{headers}\r\n")
+            handler, _, _, params = router.route(request)
+            return handler(request, **params)
+        
+        response = get("/static/clip.mp3")
+        self.assertEqual(response.status, "200 OK")
+        self.assertEqual(response.headers["Accept-Ranges"], "bytes")
+        
+        for path, data in [("/static/clip.mp3", content[:1000]), ("/static/track.mp3", content)]:
+            response = get(path, "Range: bytes=100-199\r\n")
+            self.assertEqual(response.status, "206 Partial Content")
+            self.assertEqual(response.headers["Content-Range"], f"bytes 100-199/{len(data)}")
+            self.assertEqual(b"".join(response.iter_body()), data[100:200])
+            self.assertEqual(b"".join(get(path, "Range: bytes=-10\r\n").iter_body()), data[-10:])
+            self.assertEqual(b"".join(get(path, "Range: bytes=990-\r\n").iter_body()), data[990:])
+            
+            response = get(path, "Range: bytes=0-9, 500-509, 5-14\r\n")
+            self.assertEqual(response.status, "206 Partial Content")
+            boundary = response.headers["Content-Type"].split("boundary=")[1]
+            body = b"".join(response.iter_body())
+            self.assertEqual(len(body), response.headers["Content-Length"])
+            self.assertEqual(body, (
+                f"\r\n--{boundary}\r\nContent-Type: audio/mpeg\r\nContent-Range: bytes 0-14/{len(data)}\r\n\r\n".encode() + data[0:15] +
+                f"\r\n--{boundary}\r\nContent-Type: audio/mpeg\r\nContent-Range: bytes 500-509/{len(data)}\r\n\r\n".encode() + data[500:510] +
+                f"\r\n--{boundary}--\r\n".encode()
+            ))
+            
+            response = get(path, f"Range: bytes={len(data)}-\r\n")
+            self.assertEqual(response.status, "416 Range Not Satisfiable")
+            self.assertEqual(response.headers["Content-Range"], f"bytes */{len(data)}")
+            self.assertEqual(get(path, "Range: bytes=9-1\r\n").status, "200 OK")
+            self.assertEqual(get(path, "Range: items=0-9\r\n").status, "200 OK")
+        
+        response = get("/static/track.mp3", "Range: bytes=0-9\r\n")
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual((response.offset, response.count), (0, 10))
+        etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+        self.assertEqual(get("/static/track.mp3", f"Range: bytes=0-9\r\nIf-Range: {etag}\r\n").status, "206 Partial Content")
+        self.assertEqual(get("/static/track.mp3", f"Range: bytes=0-9\r\nIf-Range: {last_modified}\r\n").status, "206 Partial Content")
+        self.assertEqual(get("/static/track.mp3", "Range: bytes=0-9\r\nIf-Range: \"stale\"\r\n").status, "200 OK")
+        
     def test_request_mod(self):
         router = Router()
         router.logger.disabled = True
@@ -162,13 +391,773 @@ class TestRouting(unittest.TestCase):
         
         response = handler(request, **params)
         
-        json_response = json.loads(response.body)
+        json_response = json.loads(b"".join(response.iter_body()))
         
         self.assertIn("userId", json_response)
         self.assertIn("id", json_response)
         self.assertIn("title", json_response)
         self.assertIn("completed", json_response)
         
+    def test_proxy_stream(self):
+        import gzip, threading, time
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        
+        peers = []
+        class Upstream(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_GET(self):
+                peers.append(self.client_address)
+                if self.path.startswith("/chunks/"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for chunk in [b"one ", b"two ", b"three"]:
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    self.wfile.write(b"0\r\n\r\n")
+                elif self.path.startswith("/gzip/"):
+                    body = gzip.compress(b"compressed " * 100)
+                    self.send_response(200)
+                    self.send_header("Content-Encoding", "gzip")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path.startswith("/slow/"):
+                    time.sleep(1)
+                    self.send_response(204)
+                    self.end_headers()
+                else:
+                    body = ("%s %s %s" % (self.path, self.headers.get("X-Token"), self.headers.get("Host"))).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.send_header("Keep-Alive", "timeout=5")
+                    self.end_headers()
+                    self.wfile.write(body)
+            
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                self.send_response(201)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass
+        
+        upstream = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+        threading.Thread(target=upstream.serve_forever, daemon=True).start()
+        try:
+            router = Router()
+            router.logger.disabled = True
+            proxy = ProxyRouter(name="PR2", internal_path="/api", external_url=f"http://127.0.0.1:{upstream.server_port}", request_headers={"*": {"X-Token": "secret"}}, read_timeout=0.5, retries=0)
+            proxy.logger.disabled = True
+            router.add_proxy(proxy)
+            
+            def get(request):
+                request = Request(request)
+                handler, _, _, params = router.route(request)
+                return handler(request, **params)
+            
+            for _ in range(3):
+                response = get("GET /api/echo?page=2 HTTP/1.1\r\nHost: cms.example.com\r\nConnection: keep-alive\r\n\r\n")
+                self.assertTrue(response.streaming)
+                self.assertEqual(b"".join(response.iter_body()), f"/echo/?page=2 secret 127.0.0.1:{upstream.server_port}".encode())
+                self.assertNotIn("Keep-Alive", response.headers)
+            self.assertEqual(len(set(peers)), 1)
+            
+            response = get("GET /api/chunks HTTP/1.1\r\n\r\n")
+            self.assertEqual(response.headers["Content-Type"], "text/plain")
+            self.assertNotIn("Transfer-Encoding", response.headers)
+            self.assertEqual(b"".join(response.iter_body()), b"one two three")
+            
+            response = get("GET /api/gzip HTTP/1.1\r\nAccept-Encoding: gzip\r\n\r\n")
+            self.assertEqual(response.headers["Content-Encoding"], "gzip")
+            self.assertEqual(gzip.decompress(b"".join(response.iter_body())), b"compressed " * 100)
+            
+            response = get("POST /api/echo HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello")
+            self.assertEqual(response.status, "201 Created")
+            self.assertEqual(b"".join(response.iter_body()), b"hello")
+            
+            self.assertEqual(get("GET /api/slow HTTP/1.1\r\n\r\n").status, "504 Gateway Timeout")
+        finally:
+            upstream.shutdown()
+            upstream.server_close()
+        self.assertEqual(get("GET /api/echo HTTP/1.1\r\n\r\n").status, "502 Bad Gateway")
+        
+    def test_proxy_cache(self):
+        import os, tempfile, threading, time
+        from email.utils import formatdate
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        
+        counts = {}
+        class Upstream(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            wbufsize = -1
+            
+            def do_GET(self):
+                path = self.path.strip("/")
+                counts[path] = counts.get(path, 0) + 1
+                headers = {
+                    "fresh": {"Cache-Control": "max-age=60", "ETag": '"v1"'},
+                    "expires": {"Expires": formatdate(time.time() + 60, usegmt=True)},
+                    "etag": {"Cache-Control": "no-cache", "ETag": '"v1"'},
+                    "swr": {"Cache-Control": "max-age=0, stale-while-revalidate=60"},
+                    "vary": {"Cache-Control": "max-age=60", "Vary": "Accept-Language"},
+                    "private": {"Cache-Control": "private, max-age=60"},
+                }[path]
+                if path == "etag" and self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    self.send_header("ETag", '"v1"')
+                    self.end_headers()
+                    return
+                body = ("%s %d %s" % (path, counts[path], self.headers.get("Accept-Language"))).encode()
+                self.send_response(200)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def do_POST(self):
+                self.send_response(204)
+                self.end_headers()
+            
+            def log_message(self, *args):
+                pass
+        
+        upstream = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+        threading.Thread(target=upstream.serve_forever, daemon=True).start()
+        cache_dir = tempfile.mkdtemp()
+        
+        def proxy_router(**kwargs):
+            router = Router()
+            router.logger.disabled = True
+            proxy = ProxyRouter(name="PR3", internal_path="/api", external_url=f"http://127.0.0.1:{upstream.server_port}", retries=0, **kwargs)
+            proxy.logger.disabled = True
+            router.add_proxy(proxy)
+            def get(path, headers="", method="GET"):
+                request = Request(f"{method} {path} HTTP/1.1\r\n{headers}\r\n")
+                handler, _, _, params = router.route(request)
+                response = handler(request, **params)
+                return response, b"".join(response.iter_body())
+            return proxy, get
+        
+        try:
+            proxy, get = proxy_router(cache_size=1024 * 1024, cache_dir=cache_dir)
+            
+            self.assertEqual(get("/api/fresh")[1], b"fresh 1 None")
+            response, body = get("/api/fresh")
+            self.assertEqual(body, b"fresh 1 None")
+            self.assertIn("Age", response.headers)
+            self.assertEqual(get("/api/fresh", 'If-None-Match: "v1"\r\n')[0].status, "304 Not Modified")
+            self.assertEqual(get("/api/expires")[1], get("/api/expires")[1])
+            self.assertEqual(counts["expires"], 1)
+            
+            self.assertEqual(get("/api/etag")[1], b"etag 1 None")
+            self.assertEqual(get("/api/etag")[1], b"etag 1 None")
+            self.assertEqual(counts["etag"], 2)
+            self.assertEqual(proxy.cache_info()["revalidated"], 1)
+            
+            self.assertEqual(get("/api/swr")[1], b"swr 1 None")
+            self.assertEqual(get("/api/swr")[1], b"swr 1 None")
+            for _ in range(50):
+                if counts["swr"] == 2 and not proxy.http_cache.revalidating:
+                    break
+                time.sleep(0.05)
+            self.assertEqual(get("/api/swr")[1], b"swr 2 None")
+            
+            self.assertEqual(get("/api/vary", "Accept-Language: en\r\n")[1], b"vary 1 en")
+            self.assertEqual(get("/api/vary", "Accept-Language: fr\r\n")[1], b"vary 2 fr")
+            self.assertEqual(get("/api/vary", "Accept-Language: en\r\n")[1], b"vary 1 en")
+            
+            self.assertEqual(get("/api/private")[1], b"private 1 None")
+            self.assertEqual(get("/api/private")[1], b"private 2 None")
+            self.assertEqual(get("/api/fresh", "Authorization: Bearer token\r\n")[1], b"fresh 2 None")
+            self.assertEqual(get("/api/fresh", "Cache-Control: no-cache\r\n")[1], b"fresh 3 None")
+            
+            get("/api/fresh", method="POST")
+            self.assertEqual(get("/api/fresh")[1], b"fresh 4 None")
+            
+            info = proxy.cache_info()
+            self.assertEqual((info["hits"], info["misses"], info["stale"]), (4, 9, 2))
+            self.assertGreater(info["disk_size"], 0)
+            
+            _, get = proxy_router(cache_dir=cache_dir)
+            self.assertEqual(get("/api/fresh")[1], b"fresh 4 None")
+            self.assertEqual(counts["fresh"], 4)
+            
+            files = os.listdir(cache_dir)
+            self.assertTrue(files and all(file.endswith((".json", ".body")) for file in files))
+            for file in files:
+                path = os.path.join(cache_dir, file)
+                with open(path, "rb") as f:
+                    tamper = file.endswith(".json") and b"/fresh" in f.read()
+                if tamper:
+                    with open(path, "wb") as f:
+                        f.write(b"\x80\x04\x95 not json")
+            _, reload = proxy_router(cache_dir=cache_dir)
+            self.assertEqual(reload("/api/fresh")[1], b"fresh 5 None")
+        finally:
+            upstream.shutdown()
+            upstream.server_close()
+        self.assertEqual(get("/api/etag")[1], b"etag 1 None")
+        self.assertEqual(get("/api/private")[0].status, "502 Bad Gateway")
+        
+    def test_proxy_balance(self):
+        import socket, threading, time
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        
+        def upstream_server(name, health=200, delay=0):
+            class Upstream(BaseHTTPRequestHandler):
+                protocol_version = "HTTP/1.1"
+                wbufsize = -1
+                
+                def do_GET(self):
+                    self.server.hits.append(self.path)
+                    time.sleep(delay)
+                    body = name.encode()
+                    self.send_response(health if self.path == "/health" else 200)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                do_POST = do_PUT = do_GET
+                
+                def log_message(self, *args):
+                    pass
+            server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+            server.hits = []
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            return server
+        
+        pool = UpstreamPool(["http://a", "http://b"], strategy="least_outstanding")
+        pool.upstreams[1].latency = 0.01
+        picks = []
+        for _ in range(10):
+            picks.append(pool.select().url)
+            pool.acquire(pool.upstreams[picks[-1] == "http://b"])
+        self.assertEqual(picks.count("http://a"), 5)
+        
+        servers = [upstream_server("a"), upstream_server("b"), upstream_server("c", health=500)]
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            dead = f"http://127.0.0.1:{s.getsockname()[1]}"
+        urls = [f"http://127.0.0.1:{server.server_port}" for server in servers]
+        
+        def proxy_router(external_url, **kwargs):
+            router = Router()
+            router.logger.disabled = True
+            kwargs.setdefault("retries", 0)
+            proxy = ProxyRouter(name="PR4", internal_path="/api", external_url=external_url, **kwargs)
+            proxy.logger.disabled = True
+            router.add_proxy(proxy)
+            def get(path, method="GET", consume=True):
+                request = Request(f"{method} {path} HTTP/1.1\r\n\r\n")
+                handler, _, _, params = router.route(request)
+                response = handler(request, **params)
+                return b"".join(response.iter_body()).decode() if consume else response
+            return proxy, get
+        
+        try:
+            proxy, get = proxy_router(urls)
+            self.assertEqual([get(f"/api/{i}") for i in range(6)], ["a", "b", "c", "a", "b", "c"])
+            
+            proxy, get = proxy_router(urls, balance="consistent_hash")
+            owners = {path: get(path) for path in [f"/api/posts/{i}" for i in range(30)]}
+            self.assertTrue(all(get(path) == owner for path, owner in owners.items()))
+            self.assertEqual(set(owners.values()), {"a", "b", "c"})
+            
+            proxy, get = proxy_router(urls[:2], balance="least_outstanding")
+            held = get("/api/slow", consume=False)
+            self.assertEqual([upstream.outstanding for upstream in proxy.upstreams], [1, 0])
+            b"".join(held.iter_body())
+            self.assertEqual([upstream.outstanding for upstream in proxy.upstreams], [0, 0])
+            self.assertGreater(proxy.upstreams.upstreams[0].latency, 0)
+            proxy.upstreams.upstreams[0].latency, proxy.upstreams.upstreams[1].latency = 0.045, 0.01
+            self.assertEqual([get("/api/x") for _ in range(3)], ["b", "b", "b"])
+            proxy.upstreams.upstreams[0].latency, proxy.upstreams.upstreams[1].latency = 0.045, 0.01
+            held = [get("/api/slow", consume=False) for _ in range(5)]
+            self.assertEqual([upstream.outstanding for upstream in proxy.upstreams], [1, 4])
+            for response in held:
+                b"".join(response.iter_body())
+            
+            proxy, get = proxy_router([dead] + urls[:2], max_fails=2)
+            self.assertEqual([get(f"/api/{i}") for i in range(4)], ["a", "b", "a", "b"])
+            self.assertGreater(proxy.upstreams.upstreams[0].ejected_until, time.monotonic())
+            self.assertEqual([get(f"/api/{i}") for i in range(4)], ["a", "b", "a", "b"])
+            
+            proxy, get = proxy_router([dead] + urls[:1], upstream_retries=0)
+            self.assertEqual(get("/api/", method="POST"), "502 Bad Gateway")
+            proxy, get = proxy_router([dead] + urls[:1])
+            self.assertEqual(get("/api/", method="POST"), "502 Bad Gateway")
+            self.assertEqual(get("/api/", method="PUT"), "a")
+            
+            servers.append(upstream_server("slow", delay=0.5))
+            proxy, get = proxy_router([f"http://127.0.0.1:{servers[-1].server_port}", urls[0]], retries=2, read_timeout=0.2)
+            start = time.monotonic()
+            self.assertEqual(get("/api/"), "a")
+            self.assertLess(time.monotonic() - start, 0.45)
+            self.assertEqual(len(servers[-1].hits), 1)
+            
+            proxy, get = proxy_router(urls, health_check="/health", health_check_interval=60)
+            self.assertEqual(get("/api/"), "a")
+            for _ in range(50):
+                if not proxy.upstreams.upstreams[2].healthy:
+                    break
+                time.sleep(0.05)
+            self.assertEqual([get(f"/api/{i}") for i in range(4)], ["b", "a", "b", "a"])
+            proxy.upstreams.stop()
+            
+            with self.assertRaises(ValueError):
+                ProxyRouter(name="PR5", internal_path="/api", external_url=urls, balance="random")
+        finally:
+            for server in servers:
+                server.shutdown()
+                server.server_close()
+        
+    def test_route_coalesce(self):
+        import asyncio, threading, time
+        from concurrent.futures import ThreadPoolExecutor
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from sapphirecms.networking.response import Response
+        
+        router = Router()
+        router.logger.disabled = True
+        calls = []
+        
+        @router.add_route("/posts/<slug>", ["GET", "POST"], coalesce=True, vary=["Accept-Language"])
+        def post(request, slug):
+            calls.append((request.method, slug, request.headers.get("Accept-Language")))
+            time.sleep(0.2)
+            if slug == "broken":
+                raise RuntimeError("database unavailable")
+            return Response((f"{slug} {len(calls)}".encode() for _ in range(2)), headers={"X-Render": str(len(calls))})
+        
+        @router.add_route("/async", "GET", coalesce=True)
+        async def page(request):
+            calls.append(("async",))
+            await asyncio.sleep(0.1)
+            return {"calls": len(calls)}, 200
+        
+        def get(path, method="GET", headers=""):
+            request = Request(f"{method} {path} HTTP/1.1\r\n{headers}\r\n")
+            handler, _, _, params = router.route(request)
+            return handler(request, **params)
+        
+        with ThreadPoolExecutor(8) as executor:
+            responses = list(executor.map(lambda _: get("/posts/hello"), range(8)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({response.body for response in responses}, {b"hello 1hello 1"})
+        self.assertEqual(len({id(response.headers) for response in responses}), 8)
+        responses[0].headers["X-Render"] = "changed"
+        self.assertEqual(responses[1].headers["X-Render"], "1")
+        
+        calls.clear()
+        with ThreadPoolExecutor(6) as executor:
+            list(executor.map(lambda i: get("/posts/hello", headers=f"Accept-Language: {'en' if i % 2 else 'fr'}\r\n"), range(6)))
+            list(executor.map(lambda i: get("/posts/hello", "POST"), range(3)))
+            list(executor.map(lambda i: self.assertRaises(RuntimeError, get, "/posts/broken"), range(3)))
+        self.assertEqual(sorted(calls), sorted([("GET", "hello", "en"), ("GET", "hello", "fr")] + [("POST", "hello", None)] * 3 + [("GET", "broken", None)]))
+        self.assertEqual(router.routes[0].handler.flights.info(), {"executions": 4, "coalesced": 13, "in_flight": 0})
+        self.assertEqual(get("/posts/hello").body, b"hello 7hello 7")
+        
+        @router.add_route("/me", "GET", coalesce=True)
+        def me(request):
+            time.sleep(0.2)
+            return "%s %s" % (request.headers.get("Cookie"), request.headers.get("Authorization"))
+        with ThreadPoolExecutor(4) as executor:
+            users = list(executor.map(lambda header: get("/me", headers=f"{header}\r\n"), ["Cookie: session=alice", "Cookie: session=bob", "Authorization: Bearer alice", "Authorization: Bearer bob"]))
+        self.assertEqual(users, ["session=alice None", "session=bob None", "None Bearer alice", "None Bearer bob"])
+        self.assertEqual(router.route(Request("GET /me HTTP/1.1\r\n\r\n"))[0].flights.info()["executions"], 0)
+        
+        calls.clear()
+        async def concurrently():
+            request = Request("GET /async HTTP/1.1\r\n\r\n")
+            handler, _, _, params = router.route(request)
+            return await asyncio.gather(*[handler(request, **params) for _ in range(5)])
+        results = asyncio.run(concurrently())
+        self.assertEqual(results, [({"calls": 1}, 200)] * 5)
+        self.assertIsNot(results[0][0], results[1][0])
+        
+        requests_seen = []
+        class Upstream(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            wbufsize = -1
+            
+            def do_GET(self):
+                requests_seen.append(self.path)
+                time.sleep(0.2)
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"ok")
+            
+            def log_message(self, *args):
+                pass
+        upstream = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+        threading.Thread(target=upstream.serve_forever, daemon=True).start()
+        try:
+            proxy = ProxyRouter(name="PR6", internal_path="/api", external_url=f"http://127.0.0.1:{upstream.server_port}", coalesce=True)
+            proxy.logger.disabled = True
+            router.add_proxy(proxy)
+            with ThreadPoolExecutor(5) as executor:
+                responses = list(executor.map(lambda _: get("/api/feed"), range(5)))
+            self.assertEqual(requests_seen, ["/feed/"])
+            self.assertEqual([response.body for response in responses], [b"ok"] * 5)
+        finally:
+            upstream.shutdown()
+            upstream.server_close()
+        
+    def test_page_cache(self):
+        import asyncio, time
+        from sapphirecms.routing import cache_tags, invalidate_tags
+        from sapphirecms.networking.response import Response
+        
+        router = Router()
+        router.logger.disabled = True
+        posts = {"1": "First", "2": "Second"}
+        renders = []
+        
+        @router.add_route("/posts/<id>", "GET", cache=60, vary=["Accept-Language"], vary_cookies=["theme"])
+        def post(request, id):
+            renders.append(id)
+            cache_tags(f"Posts:{id}")
+            return Response(f"<h1>{posts[id]}</h1>", headers={"X-Render": str(len(renders))})
+        
+        @router.add_route("/", "GET", cache=60)
+        def home(request):
+            renders.append("home")
+            cache_tags("Posts")
+            return "".join(f"<li>{title}</li>" for title in posts.values())
+        
+        @router.add_route("/login", "GET", cache=60)
+        def login(request):
+            renders.append("login")
+            return Response("form", cookies={"csrf": "token"})
+        
+        @router.add_route("/feed", "GET", cache=0.2, coalesce=True)
+        async def feed(request):
+            renders.append("feed")
+            await asyncio.sleep(0.05)
+            return {"posts": len(posts)}, 200
+        
+        def get(path, headers=""):
+            request = Request(f"GET {path} HTTP/1.1\r\n{headers}\r\n")
+            handler, _, _, params = router.route(request)
+            return handler(request, **params)
+        
+        first = get("/posts/1")
+        self.assertEqual(get("/posts/1").body, "<h1>First</h1>")
+        self.assertEqual(renders, ["1"])
+        cached = get("/posts/1")
+        cached.headers["X-Render"] = "changed"
+        self.assertEqual(get("/posts/1").headers["X-Render"], "1")
+        self.assertIsNot(first, cached)
+        
+        get("/posts/1?page=2")
+        get("/posts/1", "Accept-Language: fr\r\n")
+        get("/posts/1", "Cookie: theme=dark\r\n")
+        get("/posts/1", "Cookie: theme=light; other=1\r\n")
+        get("/posts/1", "Cookie: other=2\r\n")
+        self.assertEqual(renders, ["1"] * 5)
+        get("/posts/1", "Cookie: JWT=token\r\n")
+        get("/posts/1", "Authorization: Bearer token\r\n")
+        self.assertEqual(renders, ["1"] * 7)
+        
+        get("/posts/2")
+        self.assertEqual(get("/"), "<li>First</li><li>Second</li>")
+        posts["2"] = "Edited"
+        invalidate_tags("Posts:2")
+        self.assertEqual(get("/posts/2").body, "<h1>Edited</h1>")
+        self.assertEqual(get("/posts/1").body, "<h1>First</h1>")
+        self.assertEqual(get("/"), "<li>First</li><li>Second</li>")
+        invalidate_tags("Posts")
+        self.assertEqual(get("/"), "<li>First</li><li>Edited</li>")
+        self.assertEqual(renders, ["1"] * 7 + ["2", "home", "2", "home"])
+        
+        get("/login")
+        get("/login")
+        self.assertEqual(renders.count("login"), 2)
+        
+        async def concurrently():
+            return await asyncio.gather(*[router.route(Request("GET /feed HTTP/1.1\r\n\r\n"))[0](Request("GET /feed HTTP/1.1\r\n\r\n")) for _ in range(4)])
+        self.assertEqual(asyncio.run(concurrently()), [({"posts": 2}, 200)] * 4)
+        self.assertEqual(asyncio.run(concurrently()), [({"posts": 2}, 200)] * 4)
+        self.assertEqual(renders.count("feed"), 1)
+        time.sleep(0.25)
+        asyncio.run(concurrently())
+        self.assertEqual(renders.count("feed"), 2)
+        info = router.page_cache.info()
+        self.assertEqual((info["bypassed"], info["invalidated"]), (2, 2))
+        
+    def test_router_middleware(self):
+        import asyncio, inspect
+        from concurrent.futures import ThreadPoolExecutor
+        from sapphirecms.networking.response import Response
+        
+        router = Router()
+        router.logger.disabled = True
+        subrouter = Router("MWSUB", prefix="/blog")
+        subrouter.logger.disabled = True
+        trace = []
+        
+        @router.use
+        def timing(request, call_next):
+            trace.append("timing")
+            response = call_next(request)
+            response.headers["X-Timing"] = "1"
+            return response
+        
+        @router.use
+        def not_modified(request, call_next):
+            trace.append("not_modified")
+            if request.headers.get("If-None-Match") == '"v1"':
+                return Response("", status="304 Not Modified")
+            return call_next(request)
+        
+        @subrouter.use
+        def blog(request, call_next):
+            trace.append("blog")
+            request.headers["X-Blog"] = "yes"
+            return call_next(request)
+        
+        @router.add_route("/", "GET", request_mod=[lambda request: trace.append("request_mod") or request])
+        def home(request):
+            trace.append("home")
+            return "home"
+        
+        @subrouter.add_route("/<slug>", "GET")
+        def post(request, slug):
+            trace.append(slug)
+            return {"slug": slug, "blog": request.headers.get("X-Blog")}, 200
+        router.add_subrouter(subrouter)
+        
+        def get(path, headers=""):
+            return router.dispatch(Request(f"GET {path} HTTP/1.1\r\n{headers}\r\n"))
+        
+        response = get("/")
+        self.assertEqual((response.body, response.headers["X-Timing"]), ("home", "1"))
+        self.assertEqual(trace, ["timing", "not_modified", "request_mod", "home"])
+        trace.clear()
+        response = get("/", 'If-None-Match: "v1"\r\n')
+        self.assertEqual((response.status, response.headers["X-Timing"]), ("304 Not Modified", "1"))
+        self.assertEqual(trace, ["timing", "not_modified"])
+        trace.clear()
+        response = get("/blog/hello")
+        self.assertEqual(response.body, '{"slug": "hello", "blog": "yes"}')
+        self.assertEqual(trace, ["timing", "not_modified", "blog", "hello"])
+        trace.clear()
+        self.assertEqual(get("/missing").status, 404)
+        self.assertEqual(trace, ["timing", "not_modified"])
+        
+        pipelines = dict(router.pipelines)
+        get("/blog/again")
+        get("/")
+        self.assertEqual(router.pipelines, pipelines)
+        self.assertEqual(len(pipelines), 2)
+        subrouter.use(lambda request, call_next: Response("maintenance", status=503))
+        self.assertEqual(router.pipelines, {})
+        self.assertEqual(get("/blog/hello").status, 503)
+        self.assertEqual(get("/").body, "home")
+        subrouter.middleware.pop()
+        subrouter.invalidate()
+        
+        @router.use
+        def rewrite(request, call_next):
+            if request.path.startswith("/old/"):
+                request.set_path("/blog/" + request.path[len("/old/"):])
+            return call_next(request)
+        trace.clear()
+        self.assertEqual(get("/old/moved").body, '{"slug": "moved", "blog": null}')
+        self.assertEqual(trace, ["timing", "not_modified", "moved"])
+        self.assertEqual(get("/blog/hello").body, '{"slug": "hello", "blog": "yes"}')
+        
+        @router.use
+        async def server_header(request, call_next):
+            response = await call_next(request)
+            response.headers["Server"] = "SapphireCMS"
+            return response
+        
+        executor = ThreadPoolExecutor(4)
+        async def call(function, *args, **kwargs):
+            if asyncio.iscoroutinefunction(function):
+                return await function(*args, **kwargs)
+            result = await asyncio.get_running_loop().run_in_executor(executor, lambda: function(*args, **kwargs))
+            return await result if inspect.isawaitable(result) else result
+        
+        @subrouter.add_route("/async/<slug>", "GET")
+        async def async_post(request, slug):
+            return f"async {slug} {request.headers.get('X-Blog')}"
+        
+        async def aget(path, headers=""):
+            return await router.adispatch(Request(f"GET {path} HTTP/1.1\r\n{headers}\r\n"), call)
+        try:
+            trace.clear()
+            response = asyncio.run(aget("/blog/async/hi"))
+            self.assertEqual((response.body, response.headers["X-Timing"], response.headers["Server"]), ("async hi yes", "1", "SapphireCMS"))
+            self.assertEqual(trace, ["timing", "not_modified", "blog"])
+            self.assertEqual(asyncio.run(aget("/old/async/moved")).body, "async moved None")
+            response = asyncio.run(aget("/", 'If-None-Match: "v1"\r\n'))
+            self.assertEqual(response.status, "304 Not Modified")
+            self.assertNotIn("Server", response.headers)
+        finally:
+            executor.shutdown()
+        
+    def test_compression(self):
+        import gzip, zlib, tempfile, os, time
+        from sapphirecms.routing import Compression, negotiate
+        from sapphirecms.routing.assets import compress_assets
+        from sapphirecms.networking.response import Response, FileResponse
+        
+        self.assertEqual(negotiate("gzip, deflate, br"), "gzip")
+        self.assertEqual(negotiate("deflate;q=1, gzip;q=0.5"), "deflate")
+        self.assertEqual(negotiate("gzip;q=0, *"), "deflate")
+        self.assertEqual(negotiate("identity"), None)
+        self.assertEqual(negotiate(None), None)
+        self.assertRaises(ValueError, Compression, level=0)
+        self.assertRaises(ValueError, Compression, encodings=("br",))
+        
+        static_dir = tempfile.mkdtemp()
+        stylesheet = b"".join(b".post-%d { color: #%06x; }\n" % (i, i) for i in range(200))
+        with open(os.path.join(static_dir, "theme.css"), "wb") as f:
+            f.write(stylesheet)
+        with open(os.path.join(static_dir, "small.css"), "wb") as f:
+            f.write(b"body { margin: 0; }")
+        router = Router(static_dir=static_dir)
+        router.logger.disabled = True
+        router.use(Compression(min_size=256, level=6))
+        page = "".join(f"<article><h2>Post {i}</h2><p>Lorem ipsum dolor sit amet.</p></article>" for i in range(100))
+        
+        router.add_route("/", "GET")(lambda request: Response(page, headers={"ETag": '"home"'}))
+        router.add_route("/short", "GET")(lambda request: "<p>short</p>")
+        router.add_route("/stream", "GET")(lambda request: Response(f"<p>{i}</p>" * 50 for i in range(5)))
+        router.add_route("/logo", "GET")(lambda request: Response(b"\x89PNG" * 1000, content_type="image/png"))
+        router.add_route("/raw", "GET")(lambda request: Response(gzip.compress(page.encode()), headers={"Content-Encoding": "gzip"}))
+        
+        def get(path, headers=""):
+            return router.dispatch(Request(f"GET {path} HTTP/1.1\r\n{headers}\r\n"))
+        
+        response = get("/", "Accept-Encoding: gzip, deflate\r\n")
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual((response.headers["Vary"], response.headers["ETag"]), ("Accept-Encoding", 'W/"home"'))
+        self.assertEqual(gzip.decompress(response.body).decode(), page)
+        self.assertLess(len(response.body), len(page) // 5)
+        response = get("/", "Accept-Encoding: deflate\r\n")
+        self.assertEqual((response.headers["Content-Encoding"], zlib.decompress(response.body).decode()), ("deflate", page))
+        for path, headers in [("/", ""), ("/", "Accept-Encoding: identity\r\n"), ("/short", "Accept-Encoding: gzip\r\n")]:
+            response = get(path, headers)
+            self.assertNotIn("Content-Encoding", response.headers)
+            self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        response = get("/logo", "Accept-Encoding: gzip\r\n")
+        self.assertFalse({"Content-Encoding", "Vary"} & set(response.headers))
+        response = get("/raw", "Accept-Encoding: gzip\r\n")
+        self.assertEqual(gzip.decompress(response.body).decode(), page)
+        response = get("/stream", "Accept-Encoding: gzip\r\n")
+        chunks = list(response.iter_body())
+        self.assertEqual(len(chunks), 6)
+        self.assertEqual(gzip.decompress(b"".join(chunks)).decode(), "".join(f"<p>{i}</p>" * 50 for i in range(5)))
+        self.assertEqual(zlib.decompressobj(31).decompress(chunks[0]), b"<p>0</p>" * 50)
+        
+        response = get("/static/theme.css", "Accept-Encoding: gzip\r\n")
+        sidecar = os.path.join(static_dir, "theme.css.gz")
+        self.assertFalse(os.path.exists(sidecar))
+        self.assertEqual((gzip.decompress(response.body), response.headers["ETag"][:2]), (stylesheet, "W/"))
+        self.assertEqual(compress_assets(static_dir), ["theme.css.gz"])
+        self.assertFalse(os.path.exists(os.path.join(static_dir, "small.css.gz")))
+        response = get("/static/theme.css", "Accept-Encoding: gzip\r\n")
+        self.assertEqual((response.headers["Content-Encoding"], response.headers["Content-Type"], response.headers["Vary"]), ("gzip", "text/css", "Accept-Encoding"))
+        self.assertEqual(gzip.decompress(response.body), stylesheet)
+        written = os.stat(sidecar).st_mtime_ns
+        etag = response.headers["ETag"]
+        self.assertEqual(get("/static/theme.css", f"Accept-Encoding: gzip\r\nIf-None-Match: {etag}\r\n").status, "304 Not Modified")
+        get("/static/theme.css", "Accept-Encoding: gzip\r\n")
+        self.assertEqual(os.stat(sidecar).st_mtime_ns, written)
+        response = get("/static/theme.css")
+        self.assertEqual((response.body, response.headers["Vary"]), (stylesheet, "Accept-Encoding"))
+        self.assertNotEqual(response.headers["ETag"], etag)
+        response = get("/static/theme.css", "Accept-Encoding: gzip\r\nRange: bytes=0-9\r\n")
+        self.assertEqual((response.status, response.body), ("206 Partial Content", stylesheet[:10]))
+        self.assertNotIn("Content-Encoding", response.headers)
+        response = get("/static/small.css", "Accept-Encoding: gzip\r\n")
+        self.assertEqual(response.body, b"body { margin: 0; }")
+        
+        time.sleep(0.01)
+        with open(os.path.join(static_dir, "theme.css"), "ab") as f:
+            f.write(b".footer { color: blue; }\n")
+        response = get("/static/theme.css", "Accept-Encoding: gzip\r\n")
+        self.assertEqual((gzip.decompress(response.body), response.headers["ETag"][:2]), (stylesheet + b".footer { color: blue; }\n", "W/"))
+        self.assertEqual(os.stat(sidecar).st_mtime_ns, written)
+        self.assertEqual(compress_assets(static_dir), ["theme.css.gz"])
+        self.assertEqual(compress_assets(static_dir), [])
+        response = get("/static/theme.css", "Accept-Encoding: gzip\r\n")
+        self.assertEqual(gzip.decompress(response.body), stylesheet + b".footer { color: blue; }\n")
+        self.assertGreater(os.stat(sidecar).st_mtime_ns, written)
+        
+        os.remove(sidecar)
+        router.static_gzip = False
+        response = get("/static/theme.css", "Accept-Encoding: gzip\r\n")
+        self.assertFalse(os.path.exists(sidecar))
+        self.assertTrue(response.headers["ETag"].startswith("W/"))
+        
+    def test_assets(self):
+        import tempfile, os, json, time
+        from sapphirecms.routing.assets import minify_css, minify_js
+        
+        self.assertEqual(minify_css("/* theme */\na > b ,\nc:hover {\n  color : red ;\n  content: \" ; } \";\n}\n"), 'a>b,c:hover{color:red;content: " ; } "}')
+        self.assertEqual(minify_css("@media (max-width: 600px) {\n  .nav a { margin: 0 auto; }\n}"), "@media (max-width: 600px){.nav a{margin:0 auto}}")
+        self.assertEqual(minify_js("// setup\nvar url = 'http://x'; /* a */ var r = /\\/*[/]/g;\n\n    total = a / b / c\nlet s = `// ${x}`\n"), "var url = 'http://x'; var r = /\\/*[/]/g;\ntotal = a / b / c\nlet s = `// ${x}`")
+        
+        static_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(static_dir, "css"))
+        files = {"css/base.css": "body {\n  margin : 0;\n}\n", "css/theme.css": "/* theme */\na { color: red; }\n", "app.js": "// app\nvar x = 1\n", "logo.svg": "<svg></svg>"}
+        for name, content in files.items():
+            with open(os.path.join(static_dir, name), "w") as f:
+                f.write(content)
+        router = Router(static_dir=static_dir)
+        router.logger.disabled = True
+        self.assertEqual(router.asset_url("css/theme.css"), "/static/css/theme.css")
+        
+        manifest = router.build_assets({"bundle.css": ["css/base.css", "css/theme.css"]}, minify=True)
+        self.assertEqual(sorted(manifest), ["app.js", "bundle.css", "css/base.css", "css/theme.css", "logo.svg"])
+        with open(os.path.join(static_dir, "manifest.json")) as f:
+            self.assertEqual(json.load(f), manifest)
+        with open(os.path.join(static_dir, manifest["bundle.css"])) as f:
+            self.assertEqual(f.read(), "body{margin:0}a{color:red}")
+        self.assertFalse(os.path.exists(os.path.join(static_dir, "bundle.css")))
+        self.assertRegex(manifest["css/theme.css"], r"^css/theme\.[0-9a-f]{12}\.css$")
+        self.assertEqual(router.build_assets({"bundle.css": ["css/base.css", "css/theme.css"]}, minify=True), manifest)
+        self.assertRaises(FileNotFoundError, router.build_assets, {"bundle.js": ["missing.js"]})
+        
+        def get(path, headers=""):
+            request = Request(f"GET {path} HTTP/1.1\r\n{headers}\r\n")
+            handler, _, _, params = router.route(request)
+            return handler(request, **params)
+        
+        url = router.asset_url("bundle.css")
+        self.assertEqual(url, "/static/" + manifest["bundle.css"])
+        response = get(url)
+        self.assertEqual((response.body, response.headers["Cache-Control"]), (b"body{margin:0}a{color:red}", "public, max-age=31536000, immutable"))
+        self.assertEqual(get("/static/css/theme.css").headers["Cache-Control"], "no-cache")
+        self.assertEqual(router.asset_url("/missing.png"), "/static/missing.png")
+        
+        time.sleep(0.01)
+        with open(os.path.join(static_dir, "css/theme.css"), "w") as f:
+            f.write("a { color: blue; }\n")
+        old = manifest["css/theme.css"]
+        manifest = router.build_assets({"bundle.css": ["css/base.css", "css/theme.css"]})
+        self.assertNotEqual(manifest["css/theme.css"], old)
+        self.assertFalse(os.path.exists(os.path.join(static_dir, old)))
+        self.assertEqual(router.asset_url("css/theme.css"), "/static/" + manifest["css/theme.css"])
+        self.assertEqual(get("/static/" + manifest["css/theme.css"]).body, b"a { color: blue; }\n")
+        self.assertEqual(len(os.listdir(os.path.join(static_dir, "css"))), 4)
+        
+        with open(os.path.join(static_dir, "css/big.css"), "w") as f:
+            f.write("".join(".post-%d { color: red; }\n" % i for i in range(100)))
+        manifest = router.build_assets(gzip=True)
+        self.assertTrue(os.path.exists(os.path.join(static_dir, manifest["css/big.css"] + ".gz")))
+        self.assertFalse(os.path.exists(os.path.join(static_dir, manifest["css/theme.css"] + ".gz")))
+        self.assertEqual(get("/static/" + manifest["css/big.css"], "Accept-Encoding: gzip\r\n").headers["Content-Encoding"], "gzip")
+        
     def runTest(self):
         print("Running Routing tests...")
         fails = 0
@@ -200,6 +1189,27 @@ class TestRouting(unittest.TestCase):
             except Exception as e:
                 spinner.fail()
                 fails += 1
+        with Halo(text="Running Routing.router_tree", spinner="dots2") as spinner:
+            try:
+                self.test_router_tree()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.router_converters", spinner="dots2") as spinner:
+            try:
+                self.test_router_converters()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.router_cache", spinner="dots2") as spinner:
+            try:
+                self.test_router_cache()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
         with Halo(text="Running Routing.request_mod", spinner="dots2") as spinner:
             try:
                 self.test_request_mod()
@@ -235,6 +1245,83 @@ class TestRouting(unittest.TestCase):
             except Exception as e:
                 spinner.fail()
                 fails += 1
+        with Halo(text="Running Routing.subrouter_prefix_index", spinner="dots2") as spinner:
+            try:
+                self.test_subrouter_prefix_index()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.static_cache", spinner="dots2") as spinner:
+            try:
+                self.test_static_cache()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.static_ranges", spinner="dots2") as spinner:
+            try:
+                self.test_static_ranges()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.proxy_stream", spinner="dots2") as spinner:
+            try:
+                self.test_proxy_stream()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.proxy_cache", spinner="dots2") as spinner:
+            try:
+                self.test_proxy_cache()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.proxy_balance", spinner="dots2") as spinner:
+            try:
+                self.test_proxy_balance()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.route_coalesce", spinner="dots2") as spinner:
+            try:
+                self.test_route_coalesce()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.page_cache", spinner="dots2") as spinner:
+            try:
+                self.test_page_cache()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.router_middleware", spinner="dots2") as spinner:
+            try:
+                self.test_router_middleware()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.compression", spinner="dots2") as spinner:
+            try:
+                self.test_compression()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Routing.assets", spinner="dots2") as spinner:
+            try:
+                self.test_assets()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
 
         if fails == 0:
             print("All Routing tests passed.")
@@ -24,12 +24,103 @@ class TestServing(unittest.TestCase):
         sys.stderr = open(os.devnull, "w")
         server = Server(5, Router())
         
-        server.router.add_route("/", "GET")(lambda request: "Hello, World!")
+        server.router.add_route("/", ["GET", "HEAD"])(lambda request: "Hello, World!")
+        server.router.add_route("/echo", "POST")(lambda request: request.data["POST"])
         
         server.start(sockets)
         sys.stdout = sys.__stdout__
         sys.stderr = sys.__stderr__
         
+    @classmethod
+    def server_run_async(cls, sockets):
+        import sys, os
+        sys.stdout = open(os.devnull, "w")
+        sys.stderr = open(os.devnull, "w")
+        server = Server(5, Router())
+        
+        server.router.add_route("/", ["GET", "HEAD"])(lambda request: "Hello, World!")
+        server.router.add_route("/echo", "POST")(lambda request: request.data["POST"])
+        
+        server.start_async(sockets)
+        sys.stdout = sys.__stdout__
+        sys.stderr = sys.__stderr__
+        
+    @classmethod
+    def server_run_bounded(cls, sockets):
+        import sys, os
+        sys.stdout = open(os.devnull, "w")
+        sys.stderr = open(os.devnull, "w")
+        server = Server(1, Router(), queue_size=1)
+        
+        @server.router.add_route("/", "GET")
+        def slow(request):
+            time.sleep(1)
+            return "Hello, World!"
+        
+        server.start(sockets)
+        
+    @classmethod
+    def server_run_prefork(cls, sockets):
+        import sys, os
+        sys.stdout = open(os.devnull, "w")
+        sys.stderr = open(os.devnull, "w")
+        server = Server(5, Router())
+        
+        server.router.add_route("/", "GET")(lambda request: str(os.getpid()))
+        server.router.add_route("/crash", "GET")(lambda request: os._exit(1))
+        
+        server.start(sockets, workers=2)
+        
+    @classmethod
+    def server_run_crashing(cls, sockets, path):
+        import sys, os
+        sys.stdout = open(os.devnull, "w")
+        sys.stderr = open(os.devnull, "w")
+        server = Server(5, Router())
+        
+        def crash(sockets):
+            with open(path, "a") as f:
+                f.write("%s\n" % os.getpid())
+            raise RuntimeError("Crashed on start")
+        server.serve = crash
+        
+        server.start(sockets, workers=2)
+        
+    @classmethod
+    def server_run_static(cls, sockets, static_dir, mode):
+        import sys, os
+        sys.stdout = open(os.devnull, "w")
+        sys.stderr = open(os.devnull, "w")
+        server = Server(5, Router(static_dir=static_dir))
+        
+        if mode == "async":
+            server.start_async(sockets)
+        else:
+            server.start(sockets)
+        
+    @classmethod
+    def server_run_streaming(cls, sockets, mode):
+        import sys, os
+        from sapphirecms.networking.response import Response
+        sys.stdout = open(os.devnull, "w")
+        sys.stderr = open(os.devnull, "w")
+        server = Server(5, Router())
+        
+        @server.router.add_route("/stream", "GET")
+        def stream(request):
+            yield "first,"
+            time.sleep(1)
+            yield b"second"
+            
+        @server.router.add_route("/sized", "GET")
+        def sized(request):
+            return Response(iter(["12345", "67890"]), headers={"Content-Length": "10"})
+        
+        if mode == "async":
+            server.start_async(sockets)
+        else:
+            server.start(sockets)
+        
     def test_server_start(self):
         p = multiprocessing.Process(target=self.server_run, args=([Socket("0.0.0.0", 4565, 1024)],))
         p.start()
@@ -54,6 +145,521 @@ class TestServing(unittest.TestCase):
     
         p.terminate()
         
+    def test_server_start_async(self):
+        p = multiprocessing.Process(target=self.server_run_async, args=([Socket("0.0.0.0", 4568, 1024)],))
+        p.start()
+        time.sleep(1)
+        
+        try:
+            response = requests.get("http://localhost:4568")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.text, "Hello, World!")
+            
+            response = requests.post("http://localhost:4568/echo", data="Hello, Again!")
+            self.assertEqual(response.text, "Hello, Again!")
+            
+            response = requests.get("http://localhost:4568/missing")
+            self.assertEqual(response.status_code, 404)
+        finally:
+            p.terminate()
+        
+    def test_server_bounded_pool(self):
+        from concurrent.futures import ThreadPoolExecutor
+        
+        p = multiprocessing.Process(target=self.server_run_bounded, args=([Socket("0.0.0.0", 4569, 1024)],))
+        p.start()
+        time.sleep(1)
+        
+        def fetch(_):
+            try:
+                return requests.get("http://localhost:4569").status_code
+            except requests.ConnectionError:
+                return None
+        
+        try:
+            with ThreadPoolExecutor(5) as pool:
+                statuses = list(pool.map(fetch, range(5)))
+            self.assertIn(200, statuses)
+            self.assertIn(503, statuses)
+            self.assertNotIn(None, statuses)
+        finally:
+            p.terminate()
+        
+    def send_raw(self, port, *parts, delay=0):
+        import socket
+        with socket.create_connection(("localhost", port)) as conn:
+            for part in parts:
+                conn.sendall(part)
+                time.sleep(delay)
+            conn.shutdown(socket.SHUT_WR)
+            data = b""
+            while block := conn.recv(1024):
+                data += block
+        return data
+        
+    def test_server_framed_requests(self):
+        p = multiprocessing.Process(target=self.server_run, args=([Socket("0.0.0.0", 4570, 16)],))
+        p.start()
+        q = multiprocessing.Process(target=self.server_run_async, args=([Socket("0.0.0.0", 4571, 16)],))
+        q.start()
+        time.sleep(1)
+        
+        try:
+            for port in [4570, 4571]:
+                start = time.time()
+                self.assertTrue(self.send_raw(port, b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n").endswith(b"Hello, World!"))
+                self.assertLess(time.time() - start, 0.2)
+                
+                slow = self.send_raw(port, b"POST /echo HTTP/1.1\r\nContent-Length: 26\r\n\r\n", b"abcdefghijklm", b"nopqrstuvwxyz", delay=0.3)
+                self.assertTrue(slow.endswith(b"abcdefghijklmnopqrstuvwxyz"))
+                
+                chunked = self.send_raw(port, b"POST /echo HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n", b"5\r\nHello\r\n8;ext=1\r\n, World!\r\n0\r\n\r\n")
+                self.assertTrue(chunked.endswith(b"Hello, World!"))
+        finally:
+            p.terminate()
+            q.terminate()
+        
+    def test_server_keep_alive(self):
+        import http.client
+        
+        p = multiprocessing.Process(target=self.server_run, args=([Socket("0.0.0.0", 4572, 1024)],))
+        p.start()
+        q = multiprocessing.Process(target=self.server_run_async, args=([Socket("0.0.0.0", 4573, 1024)],))
+        q.start()
+        time.sleep(1)
+        
+        try:
+            for port in [4572, 4573]:
+                conn = http.client.HTTPConnection("localhost", port)
+                conn.request("GET", "/")
+                first = conn.getresponse()
+                self.assertEqual(first.read(), b"Hello, World!")
+                self.assertEqual(first.getheader("Connection"), "keep-alive")
+                sock = conn.sock
+                conn.request("POST", "/echo", body="Hello, Again!")
+                second = conn.getresponse()
+                self.assertEqual(second.read(), b"Hello, Again!")
+                self.assertIs(conn.sock, sock)
+                conn.close()
+                
+                pipelined = self.send_raw(port, b"POST /echo HTTP/1.1\r\nContent-Length: 5\r\n\r\nfirstPOST /echo HTTP/1.1\r\nContent-Length: 6\r\n\r\nsecondGET / HTTP/1.1\r\nConnection: close\r\n\r\nGET / HTTP/1.1\r\n\r\n")
+                self.assertEqual(pipelined.count(b"HTTP/1.1 200"), 3)
+                self.assertLess(pipelined.index(b"first"), pipelined.index(b"second"))
+                self.assertIn(b"Connection: close", pipelined.split(b"HTTP/1.1 200")[-1])
+                self.assertTrue(pipelined.endswith(b"Hello, World!"))
+                
+                legacy = self.send_raw(port, b"GET / HTTP/1.0\r\n\r\n")
+                self.assertIn(b"Connection: close", legacy)
+        finally:
+            p.terminate()
+            q.terminate()
+        
+    def test_server_keep_alive_head(self):
+        import http.client
+        
+        p = multiprocessing.Process(target=self.server_run, args=([Socket("0.0.0.0", 4590, 1024)],))
+        p.start()
+        q = multiprocessing.Process(target=self.server_run_async, args=([Socket("0.0.0.0", 4591, 1024)],))
+        q.start()
+        time.sleep(1)
+        
+        try:
+            for port in [4590, 4591]:
+                conn = http.client.HTTPConnection("localhost", port)
+                conn.request("HEAD", "/")
+                head = conn.getresponse()
+                self.assertEqual(head.status, 200)
+                self.assertEqual(head.getheader("Content-Length"), "13")
+                self.assertEqual(head.read(), b"")
+                sock = conn.sock
+                conn.request("GET", "/")
+                get = conn.getresponse()
+                self.assertEqual(get.read(), b"Hello, World!")
+                self.assertIs(conn.sock, sock)
+                conn.close()
+                
+                pipelined = self.send_raw(port, b"HEAD / HTTP/1.1\r\n\r\nGET / HTTP/1.1\r\nConnection: close\r\n\r\n")
+                self.assertEqual(pipelined.count(b"HTTP/1.1 200"), 2)
+                self.assertEqual(pipelined.count(b"Hello, World!"), 1)
+                self.assertTrue(pipelined.endswith(b"Hello, World!"))
+        finally:
+            p.terminate()
+            q.terminate()
+        
+    def test_server_idle_keep_alive(self):
+        import http.client
+        
+        p = multiprocessing.Process(target=self.server_run_bounded, args=([Socket("0.0.0.0", 4592, 1024)],))
+        p.start()
+        time.sleep(1)
+        
+        try:
+            idle = http.client.HTTPConnection("localhost", 4592)
+            idle.request("GET", "/")
+            response = idle.getresponse()
+            self.assertEqual(response.read(), b"Hello, World!")
+            self.assertEqual(response.getheader("Connection"), "keep-alive")
+            start = time.time()
+            self.assertEqual(requests.get("http://localhost:4592").text, "Hello, World!")
+            self.assertLess(time.time() - start, 2)
+            idle.close()
+        finally:
+            p.terminate()
+        
+    def test_server_prefork(self):
+        p = multiprocessing.Process(target=self.server_run_prefork, args=([Socket("0.0.0.0", 4574, 1024, reuse_port=True)],))
+        p.start()
+        q = multiprocessing.Process(target=self.server_run_prefork, args=([Socket("0.0.0.0", 4575, 1024)],))
+        q.start()
+        time.sleep(1.5)
+        
+        try:
+            for port in [4574, 4575]:
+                pids = {requests.get(f"http://localhost:{port}").text for _ in range(30)}
+                self.assertNotIn(str(p.pid), pids)
+                self.assertNotIn(str(q.pid), pids)
+                if port == 4574:
+                    self.assertEqual(len(pids), 2)
+                
+                with self.assertRaises(requests.ConnectionError):
+                    requests.get(f"http://localhost:{port}/crash")
+                time.sleep(0.5)
+                self.assertEqual(requests.get(f"http://localhost:{port}").status_code, 200)
+        finally:
+            p.terminate()
+            q.terminate()
+            p.join(5)
+            q.join(5)
+        self.assertEqual(p.exitcode, 0)
+        self.assertEqual(q.exitcode, 0)
+        
+    def test_server_prefork_backoff(self):
+        import tempfile, os
+        
+        path = os.path.join(tempfile.mkdtemp(), "starts")
+        p = multiprocessing.Process(target=self.server_run_crashing, args=([Socket("0.0.0.0", 4593, 1024, reuse_port=True)], path))
+        p.start()
+        time.sleep(2)
+        
+        try:
+            with open(path) as f:
+                starts = len(f.read().split())
+            self.assertGreater(starts, 2)
+            self.assertLess(starts, 12)
+        finally:
+            p.terminate()
+            p.join(5)
+        self.assertEqual(p.exitcode, 0)
+        
+    def serve_socketpair(self, router, data):
+        import socket, threading
+        from unittest import mock
+        from sapphirecms.networking import Client, Worker
+        
+        responses = []
+        class RecordingClient(Client):
+            def send_response(self, response, head=False):
+                responses.append(response)
+                super().send_response(response, head)
+        
+        server_end, client_end = socket.socketpair()
+        sendfile = socket.socket.sendfile
+        with mock.patch.object(socket.socket, "sendfile", autospec=True, side_effect=sendfile) as patched:
+            worker = threading.Thread(target=Worker, args=(RecordingClient(server_end, ("127.0.0.1", 0)), router, False))
+            worker.start()
+            client_end.sendall(data)
+            received = b""
+            while block := client_end.recv(2 ** 16):
+                received += block
+            worker.join(5)
+        client_end.close()
+        return received, responses, patched.call_count
+        
+    def test_server_file_head(self):
+        import tempfile, os, io, contextlib
+        
+        static_dir = tempfile.mkdtemp()
+        with open(os.path.join(static_dir, "video.mp4"), "wb") as f:
+            f.write(os.urandom(2 * 1024 * 1024))
+        router = Router(static_dir=static_dir)
+        router.logger.disabled = True
+        with contextlib.redirect_stdout(io.StringIO()):
+            received, responses, sendfiles = self.serve_socketpair(router, b"HEAD /static/video.mp4 HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertIn(b"Content-Length: 2097152", received)
+        self.assertTrue(received.endswith(b"\r\n\r\n"))
+        self.assertEqual(sendfiles, 0)
+        self.assertTrue(responses[0].sendable)
+        self.assertFalse(responses[0].streaming)
+        
+    def test_server_static_sendfile(self):
+        import tempfile, os
+        from wsgiref.util import FileWrapper
+        
+        static_dir = tempfile.mkdtemp()
+        content = os.urandom(1024 * 1024)
+        with open(os.path.join(static_dir, "video.mp4"), "wb") as f:
+            f.write(content)
+        
+        p = multiprocessing.Process(target=self.server_run_static, args=([Socket("0.0.0.0", 4576, 1024)], static_dir, "threaded"))
+        p.start()
+        q = multiprocessing.Process(target=self.server_run_static, args=([Socket("0.0.0.0", 4577, 1024)], static_dir, "async"))
+        q.start()
+        time.sleep(1)
+        
+        try:
+            for port in [4576, 4577]:
+                response = requests.get(f"http://localhost:{port}/static/video.mp4")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.headers["Content-Type"], "video/mp4")
+                self.assertEqual(response.content, content)
+                self.assertEqual(requests.get(f"http://localhost:{port}/static/missing.mp4").status_code, 404)
+                response = requests.get(f"http://localhost:{port}/static/video.mp4", headers={"Range": "bytes=1000-1999"})
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response.content, content[1000:2000])
+                response = requests.get(f"http://localhost:{port}/static/video.mp4", headers={"Range": "bytes=0-99,-100"})
+                self.assertEqual(response.status_code, 206)
+                self.assertIn(content[:100], response.content)
+                self.assertTrue(response.content.endswith(content[-100:] + b"\r\n--" + response.headers["Content-Type"].split("boundary=")[1].encode() + b"--\r\n"))
+        finally:
+            p.terminate()
+            q.terminate()
+            
+        server = Server(5, Router(static_dir=static_dir))
+        server.logger.disabled = True
+        started = []
+        body = server({"REQUEST_METHOD": "GET", "PATH_INFO": "/static/video.mp4", "SERVER_PROTOCOL": "HTTP/1.1", "wsgi.file_wrapper": FileWrapper}, lambda status, headers: started.append((status, dict(headers))))
+        self.assertIsInstance(body, FileWrapper)
+        self.assertEqual(started[0][1]["Content-Length"], str(len(content)))
+        self.assertEqual(b"".join(body), content)
+        body.close()
+        started = []
+        body = server({"REQUEST_METHOD": "GET", "PATH_INFO": "/static/video.mp4", "SERVER_PROTOCOL": "HTTP/1.1", "HTTP_RANGE": "bytes=1000-", "wsgi.file_wrapper": FileWrapper}, lambda status, headers: started.append((status, dict(headers))))
+        self.assertEqual(started[0][0], "206 Partial Content")
+        self.assertEqual(b"".join(body), content[1000:])
+        
+        import io, contextlib
+        router = Router(static_dir=static_dir)
+        router.logger.disabled = True
+        with contextlib.redirect_stdout(io.StringIO()):
+            received, responses, sendfiles = self.serve_socketpair(router, b"GET /static/video.mp4 HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertTrue(received.endswith(b"\r\n\r\n" + content))
+        self.assertEqual(sendfiles, 1)
+        self.assertTrue(responses[0].sendable)
+        
+    def test_server_range_sendfile(self):
+        import tempfile, os, io, contextlib
+        
+        static_dir = tempfile.mkdtemp()
+        content = os.urandom(4 * 1024 * 1024)
+        with open(os.path.join(static_dir, "video.mp4"), "wb") as f:
+            f.write(content)
+        router = Router(static_dir=static_dir)
+        router.logger.disabled = True
+        with contextlib.redirect_stdout(io.StringIO()):
+            received, responses, sendfiles = self.serve_socketpair(router, b"GET /static/video.mp4 HTTP/1.1\r\nRange: bytes=1000-2999999\r\nConnection: close\r\n\r\n")
+        self.assertTrue(received.startswith(b"HTTP/1.1 206 Partial Content"))
+        self.assertIn(b"Content-Length: 2999000", received)
+        self.assertTrue(received.endswith(b"\r\n\r\n" + content[1000:3000000]))
+        self.assertEqual(sendfiles, 1)
+        self.assertIsNone(responses[0]._body)
+        
+    def test_server_streaming(self):
+        p = multiprocessing.Process(target=self.server_run_streaming, args=([Socket("0.0.0.0", 4578, 1024)], "threaded"))
+        p.start()
+        q = multiprocessing.Process(target=self.server_run_streaming, args=([Socket("0.0.0.0", 4579, 1024)], "async"))
+        q.start()
+        time.sleep(1)
+        
+        try:
+            for port in [4578, 4579]:
+                start = time.time()
+                response = requests.get(f"http://localhost:{port}/stream", stream=True)
+                self.assertEqual(response.headers["Transfer-Encoding"], "chunked")
+                self.assertNotIn("Content-Length", response.headers)
+                chunks = response.iter_content(chunk_size=None)
+                self.assertEqual(next(chunks), b"first,")
+                self.assertLess(time.time() - start, 0.9)
+                self.assertEqual(b"".join(chunks), b"second")
+                
+                sized = self.send_raw(port, b"GET /sized HTTP/1.1\r\nConnection: close\r\n\r\n")
+                self.assertIn(b"Content-Length: 10\r\n", sized)
+                self.assertNotIn(b"Transfer-Encoding", sized)
+                self.assertTrue(sized.endswith(b"\r\n\r\n1234567890"))
+                
+                legacy = self.send_raw(port, b"GET /stream HTTP/1.0\r\n\r\n")
+                self.assertIn(b"Connection: close\r\n", legacy)
+                self.assertNotIn(b"Transfer-Encoding", legacy)
+                self.assertTrue(legacy.endswith(b"\r\n\r\nfirst,second"))
+        finally:
+            p.terminate()
+            q.terminate()
+            
+        server = Server(5, Router())
+        server.logger.disabled = True
+        server.router.add_route("/stream", "GET")(lambda request: (chunk for chunk in ["a", "b", "c"]))
+        started = []
+        body = server({"REQUEST_METHOD": "GET", "PATH_INFO": "/stream", "SERVER_PROTOCOL": "HTTP/1.1"}, lambda status, headers: started.append((status, dict(headers))))
+        self.assertNotIsInstance(body, list)
+        self.assertNotIn("Transfer-Encoding", started[0][1])
+        self.assertEqual(b"".join(body), b"abc")
+        
+    def test_server_wsgi_environ(self):
+        import io
+        from sapphirecms.networking import Request
+        
+        stream = io.BytesIO(b"title=Hello")
+        environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/echo", "QUERY_STRING": "page=2", "SERVER_PROTOCOL": "HTTP/1.1", "CONTENT_TYPE": "application/x-www-form-urlencoded", "CONTENT_LENGTH": "11", "HTTP_X_FORWARDED_FOR": "10.0.0.1", "wsgi.input": stream}
+        request = Request.from_environ(environ)
+        self.assertEqual((request.method, request.path, request.version, request.query), ("POST", "/echo/", "HTTP/1.1", "page=2"))
+        self.assertEqual(request.headers["X-Forwarded-For"], "10.0.0.1")
+        self.assertEqual(request.headers["Content-Type"], "application/x-www-form-urlencoded")
+        self.assertEqual(stream.tell(), 0)
+        self.assertEqual(request.data["POST"], "title=Hello")
+        self.assertEqual(request.body, b"title=Hello")
+        
+        server = Server(5, Router())
+        server.logger.disabled = True
+        server.router.add_route("/echo", "POST")(lambda request: "%s&%s" % (request.data["GET"], request.data["POST"]))
+        started = []
+        environ["wsgi.input"] = io.BytesIO(b"title=Hello")
+        body = server(environ, lambda status, headers: started.append(status))
+        self.assertEqual(started, ["200 OK"])
+        self.assertEqual(b"".join(body), b"page=2&title=Hello")
+        
+    def asgi_call(self, app, scope, messages=()):
+        import asyncio
+        sent = []
+        incoming = list(messages)
+        
+        async def receive():
+            if incoming:
+                return incoming.pop(0)
+            await asyncio.sleep(3600)
+        
+        async def send(message):
+            sent.append(message)
+            
+        return sent, app(scope, receive, send)
+        
+    def test_server_asgi(self):
+        import asyncio
+        
+        class Database:
+            events = []
+            def connect(self):
+                self.events.append("connect")
+            def close(self):
+                self.events.append("close")
+        
+        server = Server(5, Router(), database=Database())
+        server.logger.disabled = True
+        
+        @server.router.add_route("/sync", "GET")
+        def sync(request):
+            return "query=%s" % request.data["GET"]
+        
+        @server.router.add_route("/sleep", "GET")
+        async def sleep(request):
+            await asyncio.sleep(0.5)
+            return {"slept": True}, 200
+        
+        @server.router.add_route("/echo", "POST")
+        async def echo(request):
+            return request.data["POST"]
+        
+        @server.router.add_route("/stream", "GET")
+        def stream(request):
+            yield "a"
+            yield b"b"
+        
+        def http(method, path, query=b"", messages=({"type": "http.request"},)):
+            return self.asgi_call(server.asgi, {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "path": path, "query_string": query, "headers": [(b"host", b"localhost")]}, messages)
+        
+        def body(sent):
+            return b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+        
+        async def run():
+            lifespan, task = self.asgi_call(server.asgi, {"type": "lifespan"}, [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+            await task
+            self.assertEqual(lifespan, [{"type": "lifespan.startup.complete"}, {"type": "lifespan.shutdown.complete"}])
+            self.assertEqual(Database.events, ["connect", "close"])
+            
+            sent, task = http("GET", "/sync", b"a=1")
+            await task
+            self.assertEqual(sent[0]["status"], 200)
+            self.assertIn((b"content-length", b"9"), sent[0]["headers"])
+            self.assertEqual(body(sent), b"query=a=1")
+            self.assertFalse(sent[-1].get("more_body", False))
+            
+            sleeping = [http("GET", "/sleep") for _ in range(4)]
+            start = time.time()
+            await asyncio.gather(*[task for _, task in sleeping])
+            self.assertLess(time.time() - start, 1.5)
+            self.assertEqual(body(sleeping[0][0]), b'{"slept": true}')
+            
+            sent, task = http("POST", "/echo", messages=[{"type": "http.request", "body": b"Hello, ", "more_body": True}, {"type": "http.request", "body": b"World!"}])
+            await task
+            self.assertEqual(body(sent), b"Hello, World!")
+            
+            sent, task = http("GET", "/stream")
+            await task
+            self.assertEqual([message.get("body") for message in sent[1:]], [b"a", b"b", b""])
+            self.assertNotIn(b"transfer-encoding", dict(sent[0]["headers"]))
+            
+            sent, task = http("GET", "/missing")
+            await task
+            self.assertEqual(sent[0]["status"], 404)
+        
+        asyncio.run(run())
+        
+    def test_server_asgi_sync_middleware(self):
+        import asyncio
+        from sapphirecms.routing import Compression
+        
+        server = Server(1, Router())
+        server.logger.disabled = True
+        
+        @server.router.use
+        def server_header(request, call_next):
+            response = call_next(request)
+            response.headers["Server"] = "SapphireCMS"
+            return response
+        
+        server.router.use(Compression(min_size=16))
+        
+        @server.router.use
+        async def timing(request, call_next):
+            response = await call_next(request)
+            response.headers["X-Async"] = "1"
+            return response
+        
+        @server.router.use
+        def inner(request, call_next):
+            return call_next(request)
+        
+        server.router.add_route("/sync", "GET")(lambda request: "Hello, World! " * 4)
+        
+        @server.router.add_route("/async", "GET")
+        async def page(request):
+            await asyncio.sleep(0.1)
+            return "Hello, Async!"
+        
+        def http(path):
+            return self.asgi_call(server.asgi, {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "path": path, "query_string": b"", "headers": [(b"host", b"localhost"), (b"accept-encoding", b"gzip")]}, [{"type": "http.request"}])
+        
+        async def run():
+            sent, task = http("/sync")
+            await asyncio.wait_for(task, 3)
+            headers = dict(sent[0]["headers"])
+            self.assertEqual(sent[0]["status"], 200)
+            self.assertEqual((headers[b"server"], headers[b"x-async"], headers[b"content-encoding"]), (b"SapphireCMS", b"1", b"gzip"))
+            
+            requests = [http(path) for path in ["/sync", "/async", "/sync", "/async", "/missing"]]
+            await asyncio.wait_for(asyncio.gather(*[task for _, task in requests]), 3)
+            self.assertEqual([sent[0]["status"] for sent, _ in requests], [200, 200, 200, 200, 404])
+        
+        asyncio.run(run())
+        
     def runTest(self):
         print("Running Serving tests...")
         fails = 0
@@ -78,6 +684,111 @@ class TestServing(unittest.TestCase):
             except Exception as e:
                 spinner.fail()
                 fails += 1
+        with Halo(text="Running Serving.server_start_async", spinner="dots2") as spinner:
+            try:
+                self.test_server_start_async()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_bounded_pool", spinner="dots2") as spinner:
+            try:
+                self.test_server_bounded_pool()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_framed_requests", spinner="dots2") as spinner:
+            try:
+                self.test_server_framed_requests()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_keep_alive", spinner="dots2") as spinner:
+            try:
+                self.test_server_keep_alive()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_keep_alive_head", spinner="dots2") as spinner:
+            try:
+                self.test_server_keep_alive_head()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_idle_keep_alive", spinner="dots2") as spinner:
+            try:
+                self.test_server_idle_keep_alive()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_prefork", spinner="dots2") as spinner:
+            try:
+                self.test_server_prefork()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_prefork_backoff", spinner="dots2") as spinner:
+            try:
+                self.test_server_prefork_backoff()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_file_head", spinner="dots2") as spinner:
+            try:
+                self.test_server_file_head()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_static_sendfile", spinner="dots2") as spinner:
+            try:
+                self.test_server_static_sendfile()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_range_sendfile", spinner="dots2") as spinner:
+            try:
+                self.test_server_range_sendfile()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_streaming", spinner="dots2") as spinner:
+            try:
+                self.test_server_streaming()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_wsgi_environ", spinner="dots2") as spinner:
+            try:
+                self.test_server_wsgi_environ()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_asgi", spinner="dots2") as spinner:
+            try:
+                self.test_server_asgi()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
+        with Halo(text="Running Serving.server_asgi_sync_middleware", spinner="dots2") as spinner:
+            try:
+                self.test_server_asgi_sync_middleware()
+                spinner.succeed()
+            except Exception as e:
+                spinner.fail()
+                fails += 1
 
         if fails == 0:
             print("All Serving tests passed.")